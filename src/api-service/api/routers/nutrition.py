@@ -1,22 +1,148 @@
-from fastapi import APIRouter, HTTPException
+import json
+import os
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from api.utils.nutrient_vectors import (
+    aggregate_nutrition_batch,
+    aggregate_nutrition_vectors,
+)
 from api.utils.nutrition_utils import (
-    get_nutrition_info,
-    aggregate_nutrition_info_with_units,
+    fetch_nutrition_info,
+    close_async_client,
+)
+from api.utils.recipe_cache import (
+    cache_recipe,
+    etag_matches,
+    get_cached_recipe,
+    recipe_key,
 )
 
 router = APIRouter()
+router.add_event_handler("shutdown", close_async_client)
+
+MAX_BATCH_RECIPES = int(os.getenv("NUTRITION_BATCH_MAX_RECIPES", "500"))
+# Batches with more recipes than this are streamed as NDJSON, as are
+# batches requested with "Accept: application/x-ndjson"
+STREAM_THRESHOLD = int(os.getenv("NUTRITION_BATCH_STREAM_THRESHOLD", "20"))
+# Recipes aggregated together per streamed chunk
+STREAM_CHUNK_SIZE = 32
+NDJSON = "application/x-ndjson"
 
 
 class NutritionRequest(BaseModel):
     ingredients: list
 
 
+class NutritionBatchRequest(BaseModel):
+    recipes: list[NutritionRequest]
+
+
 @router.post("/nutrition")
-async def get_nutritional_info(request: NutritionRequest):
+async def get_nutritional_info(
+    request: NutritionRequest, http_request: Request
+):
+    """
+    Aggregated nutrition facts of a recipe. Complete results are cached
+    per recipe and carry an ETag; send it back in If-None-Match to get
+    304 while no ingredient's record has changed.
+    """
+    try:
+        key = recipe_key(request.ingredients)
+        recipe = get_cached_recipe(key)
+        if recipe is None:
+            nutrition_data = await fetch_nutrition_info(request.ingredients)
+            overall_nutrition = aggregate_nutrition_vectors(nutrition_data)
+            response = {"nutrition_data": overall_nutrition}
+            # Ingredients whose lookup failed are reported as a partial
+            # result, which is neither cached nor tagged
+            unresolved = getattr(nutrition_data, "unresolved", None)
+            if unresolved:
+                response["unresolved"] = unresolved
+                return response
+            recipe = cache_recipe(
+                key, request.ingredients, nutrition_data, response
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    headers = {"ETag": recipe.etag}
+    if etag_matches(http_request.headers.get("if-none-match"), recipe.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(recipe.body, media_type="application/json",
+                    headers=headers)
+
+
+def batch_result(overall_nutrition, unresolved):
+    result = {"nutrition_data": overall_nutrition}
+    if unresolved:
+        result["unresolved"] = unresolved
+    return result
+
+
+def stream_batch_results(recipe_data, recipe_unresolved):
+    for start in range(0, len(recipe_data), STREAM_CHUNK_SIZE):
+        chunk = recipe_data[start:start + STREAM_CHUNK_SIZE]
+        for index, overall_nutrition in enumerate(
+            aggregate_nutrition_batch(chunk), start
+        ):
+            line = {
+                "index": index,
+                **batch_result(overall_nutrition, recipe_unresolved[index]),
+            }
+            yield json.dumps(line) + "\n"
+
+
+@router.post("/nutrition/batch")
+async def get_batch_nutritional_info(
+    request: NutritionBatchRequest, http_request: Request
+):
+    if len(request.recipes) > MAX_BATCH_RECIPES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BATCH_RECIPES} recipes per batch.",
+        )
     try:
-        nutrition_data = get_nutrition_info(request.ingredients)
-        overall_nutrition = aggregate_nutrition_info_with_units(nutrition_data)
-        return {"nutrition_data": overall_nutrition}
+        # Each distinct ingredient is looked up once for the whole batch
+        nutrition_data = await fetch_nutrition_info([
+            ingredient
+            for recipe in request.recipes
+            for ingredient in recipe.ingredients
+        ])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    recipe_data = [
+        {
+            ingredient: nutrition_data[ingredient]
+            for ingredient in recipe.ingredients
+            if ingredient in nutrition_data
+        }
+        for recipe in request.recipes
+    ]
+    failed = set(getattr(nutrition_data, "unresolved", ()))
+    recipe_unresolved = [
+        list(dict.fromkeys(
+            ingredient for ingredient in recipe.ingredients
+            if ingredient in failed
+        ))
+        for recipe in request.recipes
+    ]
+
+    streamed = len(recipe_data) > STREAM_THRESHOLD or NDJSON in (
+        http_request.headers.get("accept", "")
+    )
+    if streamed:
+        return StreamingResponse(
+            stream_batch_results(recipe_data, recipe_unresolved),
+            media_type=NDJSON,
+        )
+    return {
+        "results": [
+            batch_result(overall_nutrition, unresolved)
+            for overall_nutrition, unresolved in zip(
+                aggregate_nutrition_batch(recipe_data), recipe_unresolved
+            )
+        ]
+    }
@@ -4,61 +4,320 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from fastapi import APIRouter, File, UploadFile
-from api.utils.ner_utils import convert_ner_entities_to_list
-from doctr.io import DocumentFile
-from doctr.models import ocr_predictor
-from transformers import (
-    AutoModelForTokenClassification,
-    AutoTokenizer,
-    pipeline,
+import asyncio
+import hashlib
+import os
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from pydantic import BaseModel
+from api.utils.batching import create_batcher_from_env
+from api.utils.cache_utils import create_cache_from_env
+from api.utils.image_utils import (
+    InvalidImageError,
+    UploadTooLargeError,
+    preprocess_image,
+    read_upload,
 )
+from api.utils.ner_utils import (
+    convert_ner_entities_to_list,
+    merge_window_entities,
+    split_long_lines,
+    split_text_windows,
+)
+from api.utils.metrics import (
+    NER_BATCH_SIZE,
+    register_cache,
+    stage_timer,
+)
+from api.utils.model_registry import ner_backend, ocr_profile, registry
+from api.utils.worker_pool import PoolSaturatedError, create_pool_from_env
 import regex as re
 
 router = APIRouter()
 
-# Initialize OCR and NER models
-ocr_model = ocr_predictor(
-    det_arch="db_resnet50", reco_arch="crnn_vgg16_bn", pretrained=True
-)
-ocr_model.det_predictor.model.postprocessor.bin_thresh = 0.2
+# OCR and NER are CPU-bound, so they run in a bounded worker pool
+# instead of blocking the event loop
+model_pool = create_pool_from_env()
+router.add_event_handler("shutdown", model_pool.shutdown)
 
-ner_tokenizer = AutoTokenizer.from_pretrained("Dizex/InstaFoodRoBERTa-NER")
-ner_model = AutoModelForTokenClassification.from_pretrained(
-    "Dizex/InstaFoodRoBERTa-NER"
-)
-ner_pipeline = pipeline("ner", model=ner_model, tokenizer=ner_tokenizer)
 
+def run_ocr(image_bytes):
+    # Decode, rotate and downscale before OCR to bound memory and latency
+    with stage_timer("decode"):
+        image_array = preprocess_image(image_bytes)
+    result = registry.get("ocr")([image_array])
+    return result.render()
 
-@router.post("/ocr")
-async def extract_ingredients(file: UploadFile = File(...)):
-    # Read the image file
-    image_bytes = await file.read()
-    image_array = DocumentFile.from_images(image_bytes)
 
-    # Perform OCR
-    result = ocr_model(image_array)
-    text = result.render()
+def run_ocr_batch(images):
+    pages = []
+    for i, image_bytes in enumerate(images):
+        try:
+            with stage_timer("decode"):
+                pages.append(preprocess_image(image_bytes))
+        except InvalidImageError as e:
+            raise InvalidImageError(f"Image {i + 1}: {e}") from e
 
-    # Extract words and remove numbers and special characters
+    # Every image becomes one page, so detection and recognition are batched
+    result = registry.get("ocr")(pages)
+    return [page.render() for page in result.pages]
+
+
+def to_http_error(e):
+    if isinstance(e, UploadTooLargeError):
+        return HTTPException(status_code=413, detail=str(e))
+    if isinstance(e, InvalidImageError):
+        return HTTPException(status_code=400, detail=str(e))
+    return HTTPException(status_code=503, detail=str(e))
+
+
+# RoBERTa sees at most 512 tokens, so longer receipts are split into
+# overlapping windows of whole lines instead of being truncated
+NER_WINDOW_TOKENS = int(os.getenv("NER_WINDOW_TOKENS", "500"))
+NER_WINDOW_OVERLAP = int(os.getenv("NER_WINDOW_OVERLAP", "2"))
+
+
+def ner_windows(text, tokenizer):
+    # Byte-level BPE never yields more tokens than characters, so short
+    # texts fit in a single window without tokenizing them first
+    if len(text) <= NER_WINDOW_TOKENS:
+        return [{"start": 0, "end": len(text),
+                 "own_start": 0, "own_end": float("inf")}]
+
+    def count_tokens(texts):
+        return [
+            len(ids)
+            for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]
+        ]
+
+    lines = text.split(", ")
+    # Lines after the first, like words inside a line, are counted with
+    # the leading space they have inside a window. A pasted paragraph is
+    # a single line, so long lines are split on words rather than
+    # overflowing the model input.
+    spaced = lines[:1] + [" " + line for line in lines[1:]]
+    pieces, token_counts, offsets = split_long_lines(
+        lines, count_tokens(spaced),
+        lambda words: count_tokens([" " + word for word in words]),
+        NER_WINDOW_TOKENS,
+    )
+    return split_text_windows(
+        pieces, token_counts, NER_WINDOW_TOKENS, NER_WINDOW_OVERLAP,
+        offsets=offsets,
+    )
+
+
+def run_ner_batch(texts):
+    NER_BATCH_SIZE.observe(len(texts))
+    ner_pipeline = registry.get("ner")
+    with stage_timer("ner"):
+        windows = [
+            ner_windows(text, ner_pipeline.tokenizer) for text in texts
+        ]
+        chunks = [
+            text[w["start"]:w["end"]]
+            for text, text_windows in zip(texts, windows)
+            for w in text_windows
+        ]
+
+        # Windows from every text in the batch share one forward pass
+        chunk_entities = ner_pipeline(
+            chunks, aggregation_strategy="simple", batch_size=len(chunks)
+        )
+
+        results = []
+        position = 0
+        for text_windows in windows:
+            results.append(merge_window_entities(
+                text_windows,
+                chunk_entities[position:position + len(text_windows)],
+            ))
+            position += len(text_windows)
+    return results
+
+
+# NER inputs from concurrent requests share one forward pass
+ner_batcher = create_batcher_from_env(run_ner_batch, runner=model_pool.run)
+
+MAX_BATCH_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "16"))
+
+# OCR text and ingredients keyed by a hash of the image bytes, so
+# re-uploads of the same photo skip both models
+ocr_cache = create_cache_from_env("OCR", maxsize=512, ttl=24 * 3600)
+register_cache("ocr", ocr_cache)
+
+
+# Ingredients keyed by a hash of the cleaned text passed to NER, so
+# different photos of the same product and /ingredients requests with
+# text seen before skip RoBERTa
+ner_cache = create_cache_from_env("NER", maxsize=2048, ttl=24 * 3600)
+register_cache("ner", ner_cache)
+
+# Longest text accepted by /ingredients
+MAX_TEXT_CHARS = int(os.getenv("INGREDIENTS_MAX_TEXT_CHARS", "20000"))
+
+
+def image_cache_key(image_bytes):
+    # Cached results depend on the models that produced them, and the
+    # disk tier outlives a change of OCR_PROFILE or NER_BACKEND
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"{ocr_profile()}:{ner_backend()}:{digest}"
+
+
+def text_cache_key(result_string):
+    digest = hashlib.sha256(result_string.encode()).hexdigest()
+    return f"{ner_backend()}:{digest}"
+
+
+def clean_ocr_text(text):
+    """
+    Drop numbers and special characters from the OCR output and join
+    the remaining lines into the string passed to NER. Runs of
+    whitespace are collapsed, so texts differing only in spacing share
+    one NER cache entry.
+    """
     word_values = []
     for line in text.split("\n"):
         non_numeric_line = re.sub(r"\b\d+(\.\d+)?\b", "", line).strip()
         non_numeric_line = re.sub(r"[^a-zA-Z\s]", "", non_numeric_line).strip()
         if non_numeric_line:
-            word_values.append(non_numeric_line)
+            word_values.append(" ".join(non_numeric_line.split()))
 
-    result_string = ", ".join(word_values)
+    return ", ".join(word_values)
 
-    # Perform NER
-    ner_entity_results = ner_pipeline(
-        result_string, aggregation_strategy="simple"
-    )
+
+async def extract_ingredients_from_text(result_string):
+    if not result_string:
+        return []
+    cache_key = text_cache_key(result_string)
+    cached = ner_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    ner_entity_results = await ner_batcher.submit(result_string)
     # Debug: Print the NER results to check scores and entity groups
     # print("NER Entity Results:", ner_entity_results)
 
-    ingredients = convert_ner_entities_to_list(
-        result_string, ner_entity_results
-    )
+    with stage_timer("merge"):
+        ingredients = convert_ner_entities_to_list(
+            result_string, ner_entity_results
+        )
+    ner_cache.set(cache_key, ingredients)
+    return ingredients
+
+
+class IngredientsRequest(BaseModel):
+    text: str
+
+
+async def extract_ingredients_from_image(image_bytes):
+    """
+    Ingredients of a receipt or recipe photo, from the OCR cache or from
+    OCR and then NER. Shared by /ocr and /scan.
+    """
+    cache_key = image_cache_key(image_bytes)
+    cached = ocr_cache.get(cache_key)
+    if cached is not None:
+        return cached["ingredients"]
+
+    # Perform OCR
+    text = await model_pool.run(run_ocr, image_bytes)
+
+    # Extract words and remove numbers and special characters
+    with stage_timer("cleanup"):
+        result_string = clean_ocr_text(text)
 
+    # Perform NER
+    ingredients = await extract_ingredients_from_text(result_string)
+    ocr_cache.set(cache_key, {"text": text, "ingredients": ingredients})
+    return ingredients
+
+
+@router.post("/ocr")
+async def extract_ingredients(file: UploadFile = File(...)):
+    try:
+        # Read the image file
+        with stage_timer("read"):
+            image_bytes = await read_upload(file)
+    except UploadTooLargeError as e:
+        raise to_http_error(e)
+
+    try:
+        ingredients = await extract_ingredients_from_image(image_bytes)
+    except (InvalidImageError, PoolSaturatedError) as e:
+        raise to_http_error(e)
     return {"ingredients": ingredients}
+
+
+@router.post("/ingredients")
+async def extract_ingredients_from_plain_text(request: IngredientsRequest):
+    """
+    Ingredients in text a client already has (e.g. from on-device OCR):
+    the /ocr pipeline without the OCR step.
+    """
+    if len(request.text) > MAX_TEXT_CHARS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_TEXT_CHARS} characters of text.",
+        )
+    with stage_timer("cleanup"):
+        result_string = clean_ocr_text(request.text)
+    try:
+        ingredients = await extract_ingredients_from_text(result_string)
+    except PoolSaturatedError as e:
+        raise to_http_error(e)
+    return {"ingredients": ingredients}
+
+
+@router.post("/ocr/batch")
+async def extract_ingredients_batch(files: list[UploadFile] = File(...)):
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BATCH_FILES} images per batch.",
+        )
+    try:
+        with stage_timer("read"):
+            images = [await read_upload(file) for file in files]
+    except UploadTooLargeError as e:
+        raise to_http_error(e)
+    cache_keys = [image_cache_key(image) for image in images]
+    ingredient_lists = [
+        (ocr_cache.get(key) or {}).get("ingredients") for key in cache_keys
+    ]
+
+    # Only the images that missed the cache go through the models
+    misses = [i for i, found in enumerate(ingredient_lists) if found is None]
+    if misses:
+        try:
+            texts = await model_pool.run(
+                run_ocr_batch, [images[i] for i in misses]
+            )
+            with stage_timer("cleanup"):
+                result_strings = [clean_ocr_text(text) for text in texts]
+            extracted = await asyncio.gather(
+                *(extract_ingredients_from_text(s) for s in result_strings)
+            )
+        except (InvalidImageError, PoolSaturatedError) as e:
+            raise to_http_error(e)
+
+        for i, text, ingredients in zip(misses, texts, extracted):
+            ingredient_lists[i] = ingredients
+            ocr_cache.set(
+                cache_keys[i], {"text": text, "ingredients": ingredients}
+            )
+
+    # Merge the per-image lists, keeping the first spelling of each item
+    results = []
+    merged = []
+    seen = set()
+    for file, ingredients in zip(files, ingredient_lists):
+        results.append(
+            {"filename": file.filename, "ingredients": ingredients}
+        )
+        for ingredient in ingredients:
+            key = ingredient.lower()
+            if key not in seen:
+                seen.add(key)
+                merged.append(ingredient)
+
+    return {"results": results, "ingredients": merged}
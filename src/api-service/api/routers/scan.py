@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import json
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from api.routers.nutrition import NDJSON
+from api.routers.ocr import extract_ingredients_from_image, to_http_error
+from api.utils.image_utils import (
+    InvalidImageError,
+    UploadTooLargeError,
+    read_upload,
+)
+from api.utils.metrics import stage_timer
+from api.utils.nutrient_vectors import aggregate_nutrition_vectors
+from api.utils.nutrition_utils import UNRESOLVED, fetch_nutrition_info
+from api.utils.worker_pool import PoolSaturatedError
+
+router = APIRouter()
+
+
+def scan_result(ingredients, found):
+    """
+    The response of a scan: the ingredients with the aggregated
+    nutrition facts and, when lookups failed, the unresolved ingredients,
+    in the shape /ocr and /nutrition return them.
+    """
+    result = {
+        "ingredients": ingredients,
+        "nutrition_data": aggregate_nutrition_vectors(found),
+    }
+    if found.unresolved:
+        result["unresolved"] = found.unresolved
+    return result
+
+
+def ingredient_line(ingredient, food):
+    """The NDJSON line for one ingredient whose lookup has settled."""
+    line = {"ingredient": ingredient, "nutrition_data": {}}
+    if food is UNRESOLVED:
+        line["unresolved"] = True
+    elif food is not None:
+        line["nutrition_data"] = aggregate_nutrition_vectors(
+            {ingredient: food}
+        )
+    return line
+
+
+async def stream_scan(ingredients):
+    """
+    NDJSON lines: the ingredients, then the nutrition facts of each
+    ingredient as soon as its lookup settles, then the full scan result.
+    All ingredients share one lookup, so known FDC ids are still fetched
+    in bulk. A failed lookup ends the stream with an error line.
+    """
+    settled = asyncio.Queue()
+
+    async def lookup():
+        try:
+            return await fetch_nutrition_info(
+                ingredients,
+                on_result=lambda *result: settled.put_nowait(result),
+            )
+        finally:
+            settled.put_nowait(None)
+
+    task = asyncio.create_task(lookup())
+    try:
+        yield json.dumps({"ingredients": ingredients}) + "\n"
+        while (result := await settled.get()) is not None:
+            yield json.dumps(ingredient_line(*result)) + "\n"
+        try:
+            found = await task
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        yield json.dumps(scan_result(ingredients, found)) + "\n"
+    finally:
+        # The client went away before the lookup finished
+        task.cancel()
+
+
+@router.post("/scan")
+async def scan(request: Request, file: UploadFile = File(...)):
+    """
+    OCR, NER and nutrition lookup of a photo in one request, returning
+    what /ocr and then /nutrition would. Send
+    "Accept: application/x-ndjson" to stream partial results.
+    """
+    try:
+        with stage_timer("read"):
+            image_bytes = await read_upload(file)
+    except UploadTooLargeError as e:
+        raise to_http_error(e)
+
+    try:
+        ingredients = await extract_ingredients_from_image(image_bytes)
+    except (InvalidImageError, PoolSaturatedError) as e:
+        raise to_http_error(e)
+
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stream_scan(ingredients), media_type=NDJSON
+        )
+
+    try:
+        found = await fetch_nutrition_info(ingredients)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return scan_result(ingredients, found)
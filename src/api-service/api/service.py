@@ -4,13 +4,51 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from api.routers.ocr import router as ocr_router
-from api.routers.nutrition import router as nutrition_router
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+from fastapi.responses import JSONResponse, Response  # noqa: E402
+from api.routers.ocr import (  # noqa: E402
+    MAX_BATCH_FILES,
+    router as ocr_router,
+)
+from api.routers.nutrition import router as nutrition_router  # noqa: E402
+from api.routers.scan import router as scan_router  # noqa: E402
+from api.utils.admission import (  # noqa: E402
+    AdmissionMiddleware,
+    create_limits_from_env,
+)
+from api.utils.body_limit import BodyLimitMiddleware  # noqa: E402
+from api.utils.image_utils import MAX_UPLOAD_BYTES  # noqa: E402
+from api.utils.metrics import MetricsMiddleware, render_metrics  # noqa: E402
+from api.utils.model_registry import (  # noqa: E402
+    WARM_UP_ON_STARTUP,
+    registry,
+)
 
 app = FastAPI()
 
+# Per-route concurrency limits and bounded queues; requests beyond them
+# get 503 with Retry-After. Added first so CORS headers and metrics also
+# cover the rejections.
+app.add_middleware(AdmissionMiddleware, limits=create_limits_from_env())
+
+# Cut off oversized uploads while they stream in, before the form parser
+# spools them; a batch may carry up to MAX_BATCH_FILES images. The
+# allowance covers the multipart framing around the files.
+FORM_OVERHEAD_BYTES = 64 * 1024
+app.add_middleware(
+    BodyLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES,
+    path_limits={
+        "/api/ocr/batch":
+            MAX_BATCH_FILES * MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES,
+    },
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -18,16 +56,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend revalidate recipes and back off when rejected
+    expose_headers=["ETag", "Retry-After"],
 )
 
-# Include the OCR, LLM (local fine-tuned model), and Nutrition routers
+# Request counts, latency and in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Include the OCR, LLM (local fine-tuned model), Nutrition and Scan routers
 
 # Kubernetes deployment
 app.include_router(ocr_router, prefix="/api")
 # app.include_router(llm_router, prefix="/api")
 app.include_router(nutrition_router, prefix="/api")
+app.include_router(scan_router, prefix="/api")
 
 # Uncomment for local development
 # app.include_router(ocr_router)
 # app.include_router(llm_router)
 # app.include_router(nutrition_router)
+# app.include_router(scan_router)
+
+# Models are loaded lazily, so importing the app stays fast
+IMPORT_SECONDS = time.perf_counter() - _import_started
+print(f"api.service imported in {IMPORT_SECONDS:.2f}s")
+
+
+def warm_up_models():
+    if WARM_UP_ON_STARTUP:
+        registry.start_warm_up()
+
+
+app.add_event_handler("startup", warm_up_models)
+
+
+# Liveness: the process is up and serving
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+# Readiness: OCR and NER models are loaded (used by the Kubernetes probe).
+# With MODEL_WARMUP=0 nothing loads them until the first OCR request, so
+# the pod is ready as soon as it serves.
+@app.get("/ready")
+async def ready():
+    status = registry.status()
+    status["import_seconds"] = IMPORT_SECONDS
+    status["warm_up"] = WARM_UP_ON_STARTUP
+    ok = status["ready"] or not WARM_UP_ON_STARTUP
+    return JSONResponse(status, status_code=200 if ok else 503)
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    body, media_type = render_metrics()
+    return Response(body, media_type=media_type)
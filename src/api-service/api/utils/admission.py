@@ -0,0 +1,189 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+
+from api.utils.metrics import (
+    ADMISSION_ACTIVE,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_REJECTIONS,
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted: its route's queue is full
+    or it waited longer than the route's queue-time budget.
+    """
+
+    def __init__(self, name, reason, retry_after):
+        super().__init__(
+            f"Too many {name} requests in progress; "
+            f"retry after {retry_after} seconds."
+        )
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimit:
+    """
+    Admits at most ``max_concurrent`` requests at once; up to
+    ``max_queue`` more wait in arrival order for at most ``max_wait``
+    seconds. Anything beyond that is rejected with ``AdmissionRejected``
+    right away rather than held until the client times out.
+
+    The state belongs to the server's event loop, so a limit is shared by
+    the requests of one process (one worker of the pre-fork server).
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, max_wait,
+                 retry_after=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after or max(1, math.ceil(max_wait))
+        self.active = 0
+        self._waiters = deque()
+        # Children are bound once so the hot path skips the label lookup
+        self._active_gauge = ADMISSION_ACTIVE.labels(name)
+        self._queue_gauge = ADMISSION_QUEUE_DEPTH.labels(name)
+        self._queue_wait = ADMISSION_QUEUE_WAIT.labels(name)
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _reject(self, reason):
+        ADMISSION_REJECTIONS.labels(self.name, reason).inc()
+        return AdmissionRejected(self.name, reason, self.retry_after)
+
+    async def acquire(self):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self._active_gauge.set(self.active)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queue_gauge.set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as the wait ended
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+                self._queue_gauge.set(len(self._waiters))
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("timeout") from None
+            raise
+        finally:
+            self._queue_wait.observe(time.perf_counter() - start)
+
+    def release(self):
+        # Hand the slot straight to the next waiter, so a newly arriving
+        # request cannot take it first
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._queue_gauge.set(len(self._waiters))
+                return
+        self._queue_gauge.set(0)
+        self.active -= 1
+        self._active_gauge.set(self.active)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an ``AdmissionLimit`` per route group. Each
+    limit covers the paths under its prefix (e.g. "/api/ocr" covers
+    /api/ocr and /api/ocr/batch); other paths are not limited. Rejected
+    requests get 503 with a Retry-After header.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    def limit_for(self, path):
+        for prefix, limit in self.limits.items():
+            if path == prefix or path.startswith(prefix + "/"):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http":
+            limit = self.limit_for(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limit.acquire()
+        except AdmissionRejected as e:
+            await send_rejection(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+
+async def send_rejection(send, error):
+    body = json.dumps({"detail": str(error)}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(error.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# Route groups with their default concurrency, queue length and queue
+# time budget in seconds. OCR and scans hold a model worker for most of
+# the request, text-only ingredient extraction only for NER; nutrition
+# lookups mostly wait on the USDA API.
+DEFAULT_LIMITS = {
+    "ocr": ("/api/ocr", 4, 16, 10.0),
+    "scan": ("/api/scan", 4, 16, 10.0),
+    "ingredients": ("/api/ingredients", 8, 32, 10.0),
+    "nutrition": ("/api/nutrition", 32, 64, 5.0),
+}
+
+
+def create_limits_from_env():
+    """
+    Build the admission limits from environment variables, e.g.
+    ADMISSION_OCR_CONCURRENCY, ADMISSION_OCR_QUEUE and
+    ADMISSION_OCR_MAX_WAIT for /api/ocr. ADMISSION_CONTROL=0 disables
+    admission control.
+    """
+    if os.getenv("ADMISSION_CONTROL", "1") == "0":
+        return {}
+    limits = {}
+    for name, (prefix, concurrency, queue, max_wait) in DEFAULT_LIMITS.items():
+        env = f"ADMISSION_{name.upper()}_"
+        limits[prefix] = AdmissionLimit(
+            name,
+            max_concurrent=int(os.getenv(env + "CONCURRENCY", concurrency)),
+            max_queue=int(os.getenv(env + "QUEUE", queue)),
+            max_wait=float(os.getenv(env + "MAX_WAIT", max_wait)),
+        )
+    return limits
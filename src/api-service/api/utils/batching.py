@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+
+class MicroBatcher:
+    """
+    Gathers items submitted by concurrent requests and processes them
+    with a single call to ``batch_fn``.
+
+    A batch is flushed as soon as it holds ``max_batch_size`` items or
+    ``max_wait_ms`` after its first item arrived, whichever comes first.
+    ``batch_fn`` takes a list of items and returns a list of results in
+    the same order. When ``runner`` is given (e.g. ``WorkerPool.run``),
+    batches are executed through it so they stay off the event loop.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5,
+                 runner=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.runner = runner
+        self._loop = None
+        self._pending = []
+        self._timer = None
+        # The loop only keeps weak references to tasks, so running batches
+        # are held here until they finish
+        self._tasks = set()
+
+    async def submit(self, item):
+        """Queue ``item`` for the next batch and await its result."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Batches never span event loops (e.g. across test clients)
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._execute(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, batch):
+        batch = [(item, f) for item, f in batch if not f.cancelled()]
+        if not batch:
+            return
+        items = [item for item, _ in batch]
+        try:
+            if self.runner is not None:
+                results = await self.runner(self.batch_fn, items)
+            else:
+                results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"Batch function returned {len(results)} results "
+                    f"for {len(items)} items."
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def create_batcher_from_env(batch_fn, runner=None):
+    """
+    Build a micro-batcher configured by NER_BATCH_SIZE and
+    NER_BATCH_WAIT_MS.
+    """
+    return MicroBatcher(
+        batch_fn,
+        max_batch_size=int(os.getenv("NER_BATCH_SIZE", "8")),
+        max_wait_ms=float(os.getenv("NER_BATCH_WAIT_MS", "5")),
+        runner=runner,
+    )
@@ -0,0 +1,84 @@
+import json
+
+from fastapi import HTTPException
+
+
+class BodyTooLargeError(HTTPException):
+    """
+    Raised from ``receive`` once a request body grows past its limit. It
+    is an HTTPException so FastAPI passes it through form parsing and
+    answers 413 rather than reporting a malformed body.
+    """
+
+    def __init__(self, max_bytes):
+        super().__init__(
+            status_code=413,
+            detail=f"Request body is larger than {max_bytes} bytes.",
+        )
+
+
+class BodyLimitMiddleware:
+    """
+    ASGI middleware capping request bodies at ``max_bytes``, or at
+    ``path_limits[path]`` for the listed paths. Requests declaring a
+    larger Content-Length get 413 without their body being read; bodies
+    without one (chunked) are cut off as soon as they pass the limit.
+    Either way this happens before the form parser spools the upload to
+    memory or disk.
+    """
+
+    def __init__(self, app, max_bytes, path_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope["path"], self.max_bytes)
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > max_bytes:
+            await send_too_large(send, BodyTooLargeError(max_bytes))
+            return
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise BodyTooLargeError(max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except BodyTooLargeError as e:
+            # Apps other than FastAPI routes let the error through
+            if started:
+                raise
+            await send_too_large(send, e)
+
+
+async def send_too_large(send, error):
+    body = json.dumps({"detail": error.detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"connection", b"close"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with an optional time-to-live.
+    ``None`` is used as the miss marker, so it cannot be stored as a value.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# SQLite connections must not be used across fork(), so forked children
+# (pre-fork server workers) reconnect every open SQLiteCache
+_sqlite_caches = weakref.WeakSet()
+# Connections inherited from the parent; kept referenced so they are
+# never closed (and checkpointed) from the child
+_inherited_connections = []
+
+
+def _reconnect_after_fork():
+    for cache in list(_sqlite_caches):
+        _inherited_connections.append(cache._conn)
+        cache._lock = threading.Lock()
+        cache._conn = cache._connect()
+
+
+os.register_at_fork(after_in_child=_reconnect_after_fork)
+
+
+class SQLiteCache:
+    """
+    Persistent cache of JSON-serializable values stored in a SQLite file,
+    so entries survive restarts and can be shared by several workers.
+    When ``maxsize`` is exceeded the oldest entries are dropped. Other
+    values can be stored by passing ``dumps`` and ``loads`` functions that
+    convert them to and from text.
+    """
+
+    def __init__(self, path, ttl=None, maxsize=None,
+                 dumps=json.dumps, loads=json.loads):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.dumps = dumps
+        self.loads = loads
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        _sqlite_caches.add(self)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "stored_at REAL NOT NULL, expires_at REAL)"
+        )
+        return conn
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                value, expires_at = row
+                if expires_at is None or expires_at > time.time():
+                    self.hits += 1
+                    return self.loads(value)
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, self.dumps(value), now, expires_at),
+            )
+            if self.maxsize:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                    "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,),
+                )
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM cache"
+            ).fetchone()[0]
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of an optional persistent tier.
+    Disk hits are promoted to memory; writes go to both tiers.
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+def create_cache_from_env(prefix, maxsize=1024, ttl=None, **disk_options):
+    """
+    Build a tiered cache configured by <PREFIX>_CACHE_SIZE,
+    <PREFIX>_CACHE_TTL (seconds, 0 disables expiry), <PREFIX>_CACHE_DIR
+    and <PREFIX>_CACHE_DISK_SIZE (0 for no limit). The persistent tier is
+    only enabled when <PREFIX>_CACHE_DIR is set; ``disk_options`` are
+    passed on to its SQLiteCache.
+    """
+    maxsize = int(os.getenv(f"{prefix}_CACHE_SIZE", str(maxsize)))
+    ttl = float(os.getenv(f"{prefix}_CACHE_TTL", str(ttl or 0))) or None
+    directory = os.getenv(f"{prefix}_CACHE_DIR")
+    disk_size = int(os.getenv(f"{prefix}_CACHE_DISK_SIZE", "0")) or None
+
+    disk = None
+    if directory:
+        path = os.path.join(directory, f"{prefix.lower()}_cache.sqlite")
+        disk = SQLiteCache(
+            path, ttl=ttl, maxsize=disk_size, **disk_options
+        )
+    return TieredCache(LRUCache(maxsize=maxsize, ttl=ttl), disk)
@@ -0,0 +1,160 @@
+import os
+import re
+import sqlite3
+import threading
+
+from api.utils.metrics import NUTRITION_RESOLUTIONS
+from api.utils.nutrition_cache import normalize_ingredient
+
+# Persisted ingredient -> fdcId mapping; learned entries are kept in
+# memory only when unset
+FDC_ID_INDEX_PATH = os.getenv("FDC_ID_INDEX_PATH")
+
+# Other names for ingredients, mapped to the name they are looked up by
+ALIASES = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "coriander leaves": "cilantro",
+    "garbanzo bean": "chickpea",
+    "aubergine": "eggplant",
+    "courgette": "zucchini",
+    "capsicum": "bell pepper",
+    "icing sugar": "powdered sugar",
+    "confectioners sugar": "powdered sugar",
+    "bicarbonate of soda": "baking soda",
+    "double cream": "heavy cream",
+    "minced beef": "ground beef",
+    "extra virgin olive oil": "olive oil",
+    "evoo": "olive oil",
+}
+
+
+def singularize(name):
+    """Crude singular form of the last word, enough to match plurals."""
+    head, _, last = name.rpartition(" ")
+    if len(last) > 4 and last.endswith("ies"):
+        last = last[:-3] + "y"
+    elif len(last) > 4 and last.endswith(("oes", "ches", "shes")):
+        last = last[:-2]
+    elif len(last) > 3 and last.endswith("s") and not last.endswith("ss"):
+        last = last[:-1]
+    return f"{head} {last}" if head else last
+
+
+def variant_key(name):
+    """
+    Key shared by spelling variants of a name: every word singular, with
+    spaces and hyphens dropped, so "olive-oil" and "olive oils" match
+    "olive oil". Anything else, e.g. "unsalted" vs "salted", stays apart.
+    """
+    return "".join(singularize(word) for word in re.split(r"[\s-]+", name))
+
+
+class FDCIdIndex:
+    """
+    Maps normalized ingredient names to the FoodData Central food chosen
+    for them, so known ingredients can be fetched by id instead of
+    searched. Names are resolved exactly, through singular forms and
+    ALIASES, then through spelling variants (variant_key) of known names.
+    There is no similarity matching: near-identical names such as
+    "salted butter" and "unsalted butter" are different foods. Entries
+    are learned from searches and written through to SQLite when a path
+    is given.
+    """
+
+    def __init__(self, path=None, aliases=None):
+        self.aliases = dict(ALIASES if aliases is None else aliases)
+        self.ids = {}
+        # variant_key -> known name
+        self.variants = {}
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inherited_conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = self._connect()
+            self.ids.update(
+                self._conn.execute("SELECT name, fdc_id FROM fdc_ids")
+            )
+            self.variants.update(
+                (variant_key(name), name) for name in self.ids
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS fdc_ids "
+            "(name TEXT PRIMARY KEY, fdc_id INTEGER NOT NULL)"
+        )
+        return conn
+
+    def after_fork(self):
+        """
+        Reconnect in a forked child. SQLite connections must not be used
+        across fork(), so the parent's is kept aside, never used or closed.
+        """
+        self._lock = threading.Lock()
+        if self._conn is not None:
+            self._inherited_conn = self._conn
+            self._conn = self._connect()
+
+    def _canonical(self, name):
+        name = normalize_ingredient(name)
+        if name in self.aliases:
+            return self.aliases[name]
+        name = singularize(name)
+        return self.aliases.get(name, name)
+
+    def resolve(self, ingredient):
+        """fdcId for an ingredient, or None if it has to be searched."""
+        name = self._canonical(ingredient)
+        fdc_id = self.ids.get(name)
+        if fdc_id is not None:
+            NUTRITION_RESOLUTIONS.labels("known").inc()
+            return fdc_id
+
+        variant = self.variants.get(variant_key(name))
+        fdc_id = None if variant is None else self.ids.get(variant)
+        if fdc_id is not None:
+            NUTRITION_RESOLUTIONS.labels("variant").inc()
+            return fdc_id
+        NUTRITION_RESOLUTIONS.labels("search").inc()
+        return None
+
+    def learn(self, ingredient, fdc_id):
+        name = self._canonical(ingredient)
+        with self._lock:
+            if self.ids.get(name) == fdc_id:
+                return
+            self.ids[name] = fdc_id
+            self.variants[variant_key(name)] = name
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO fdc_ids VALUES (?, ?)",
+                    (name, fdc_id),
+                )
+
+    def forget(self, fdc_id):
+        """Drop every name mapped to a food that no longer exists."""
+        with self._lock:
+            names = [n for n, i in self.ids.items() if i == fdc_id]
+            for name in names:
+                del self.ids[name]
+                self.variants.pop(variant_key(name), None)
+            if self._conn is not None:
+                self._conn.execute(
+                    "DELETE FROM fdc_ids WHERE fdc_id = ?", (fdc_id,)
+                )
+
+    def __len__(self):
+        return len(self.ids)
+
+
+fdc_ids = FDCIdIndex(FDC_ID_INDEX_PATH)
+os.register_at_fork(after_in_child=fdc_ids.after_fork)
@@ -0,0 +1,364 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+FDC_INDEX_PATH = os.getenv("FDC_INDEX_PATH", "/persistent/fdc_index.sqlite")
+# Bytes of the index file SQLite memory-maps; pages are shared between
+# workers through the OS page cache
+FDC_INDEX_MMAP_BYTES = int(
+    os.getenv("FDC_INDEX_MMAP_BYTES", str(1024 * 1024 * 1024))
+)
+
+# Bulk CSV data types kept in the index, with the names the search API
+# reports for them
+DATA_TYPES = {
+    "survey_fndds_food": "Survey (FNDDS)",
+    "sr_legacy_food": "SR Legacy",
+    "foundation_food": "Foundation",
+    "branded_food": "Branded",
+}
+BRANDED = "Branded"
+
+# Bulk JSON nutrient units mapped to the spelling the search API uses
+_UNITS = {"µg": "UG", "kj": "kJ"}
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE foods (
+    fdc_id INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    serving_size REAL,
+    serving_size_unit TEXT
+);
+CREATE TABLE nutrients (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, unit TEXT, rank REAL,
+    number TEXT
+);
+CREATE TABLE food_nutrients (
+    fdc_id INTEGER NOT NULL,
+    nutrient_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (fdc_id, nutrient_id)
+) WITHOUT ROWID;
+"""
+
+
+def search_unit(name):
+    """Nutrient unit as spelled in search API results, e.g. "MG"."""
+    if not name:
+        return ""
+    return _UNITS.get(name.lower(), name.upper())
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _nutrient_number(value):
+    # Some CSV releases spell numbers as floats, e.g. "203.0"; the search
+    # API reports "203"
+    number = _float(value)
+    if number is None:
+        return None
+    return str(int(number)) if number.is_integer() else str(value).strip()
+
+
+def _read_csv(directory, name):
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def import_csv_dump(conn, directory):
+    """
+    Load a FoodData Central CSV download (food.csv, nutrient.csv,
+    food_nutrient.csv and, for Branded foods, branded_food.csv).
+    Rows are streamed, so the full Branded dump fits in little memory.
+    """
+    conn.executemany(
+        "INSERT OR IGNORE INTO nutrients VALUES (?, ?, ?, ?, ?)",
+        (
+            (int(row["id"]), row["name"], search_unit(row["unit_name"]),
+             _float(row.get("rank")),
+             _nutrient_number(row.get("nutrient_nbr")))
+            for row in _read_csv(directory, "nutrient.csv")
+        ),
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO foods VALUES (?, ?, ?, NULL, NULL)",
+        (
+            (int(row["fdc_id"]), row["description"],
+             DATA_TYPES[row["data_type"]])
+            for row in _read_csv(directory, "food.csv")
+            if row["data_type"] in DATA_TYPES
+        ),
+    )
+    conn.executemany(
+        "UPDATE foods SET serving_size = ?, serving_size_unit = ? "
+        "WHERE fdc_id = ?",
+        (
+            (_float(row["serving_size"]), row["serving_size_unit"],
+             int(row["fdc_id"]))
+            for row in _read_csv(directory, "branded_food.csv")
+        ),
+    )
+    # Nutrients of foods that were not kept are skipped
+    conn.executemany(
+        "INSERT OR REPLACE INTO food_nutrients "
+        "SELECT ?1, ?2, ?3 WHERE EXISTS "
+        "(SELECT 1 FROM foods WHERE fdc_id = ?1)",
+        (
+            (int(row["fdc_id"]), int(row["nutrient_id"]),
+             _float(row["amount"]))
+            for row in _read_csv(directory, "food_nutrient.csv")
+            if _float(row["amount"]) is not None
+        ),
+    )
+
+
+def import_json_dump(conn, path):
+    """
+    Load a FoodData Central JSON download, e.g. FoodData_Central_survey_food
+    or FoodData_Central_sr_legacy_food. The file is parsed whole, so the
+    CSV download is the better choice for Branded foods.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    for foods in data.values():
+        for food in foods:
+            if food.get("dataType") not in DATA_TYPES.values():
+                continue
+            fdc_id = int(food["fdcId"])
+            conn.execute(
+                "INSERT OR REPLACE INTO foods VALUES (?, ?, ?, ?, ?)",
+                (fdc_id, food["description"], food["dataType"],
+                 food.get("servingSize"), food.get("servingSizeUnit")),
+            )
+            for food_nutrient in food.get("foodNutrients", []):
+                nutrient = food_nutrient.get("nutrient", {})
+                amount = food_nutrient.get("amount")
+                if "id" not in nutrient or amount is None:
+                    continue
+                conn.execute(
+                    "INSERT OR IGNORE INTO nutrients VALUES (?, ?, ?, ?, ?)",
+                    (nutrient["id"], nutrient["name"],
+                     search_unit(nutrient.get("unitName")),
+                     nutrient.get("rank"),
+                     _nutrient_number(nutrient.get("number"))),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO food_nutrients VALUES (?, ?, ?)",
+                    (fdc_id, nutrient["id"], amount),
+                )
+
+
+def _create_search_tables(conn):
+    # Generic foods (FNDDS, SR Legacy, Foundation) and branded products are
+    # indexed separately so the small generic table is searched first
+    try:
+        for table in ("generic_fts", "branded_fts"):
+            conn.execute(
+                f"CREATE VIRTUAL TABLE {table} USING "
+                "fts5(description, content='', tokenize='trigram')"
+            )
+        tokenizer = "trigram"
+    except sqlite3.OperationalError:
+        # SQLite before 3.34 has no trigram tokenizer; fall back to
+        # prefix matching on words
+        for table in ("generic_fts", "branded_fts"):
+            conn.execute(
+                f"CREATE VIRTUAL TABLE {table} USING "
+                "fts5(description, content='')"
+            )
+        tokenizer = "unicode61"
+
+    conn.execute(
+        "INSERT INTO generic_fts(rowid, description) "
+        "SELECT fdc_id, description FROM foods WHERE data_type != ?",
+        (BRANDED,),
+    )
+    conn.execute(
+        "INSERT INTO branded_fts(rowid, description) "
+        "SELECT fdc_id, description FROM foods WHERE data_type = ?",
+        (BRANDED,),
+    )
+    conn.execute(
+        "INSERT INTO meta VALUES ('tokenizer', ?)", (tokenizer,)
+    )
+
+
+def build_index(output_path, sources):
+    """
+    Build a search index from FoodData Central bulk downloads. Each source
+    is either an extracted CSV download directory or a JSON file. The index
+    is written next to ``output_path`` and moved into place when complete,
+    so running workers never see a partial file.
+    """
+    tmp_path = f"{output_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(SCHEMA)
+        for source in sources:
+            if os.path.isdir(source):
+                import_csv_dump(conn, source)
+            else:
+                import_json_dump(conn, source)
+            print(f"Imported {source}")
+        _create_search_tables(conn)
+        conn.commit()
+        food_count = conn.execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, output_path)
+    print(f"Indexed {food_count} foods into {output_path}")
+    return food_count
+
+
+class FDCIndex:
+    """
+    Read-only search over a local FoodData Central index, returning foods
+    shaped like the USDA search API results. The file is opened immutable
+    and memory-mapped, with one connection per thread.
+    """
+
+    def __init__(self, path, mmap_bytes=None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"FDC index not found at {path}")
+        self.path = path
+        self.mmap_bytes = mmap_bytes or FDC_INDEX_MMAP_BYTES
+        self._uri = Path(path).absolute().as_uri() + "?mode=ro&immutable=1"
+        self._local = threading.local()
+        conn = self._connection()
+        self.tokenizer = conn.execute(
+            "SELECT value FROM meta WHERE key = 'tokenizer'"
+        ).fetchone()[0]
+        # Indexes built before nutrient numbers were imported have none,
+        # so every nutrient of their foods is reported
+        columns = [row[1] for row in conn.execute(
+            "PRAGMA table_info(nutrients)"
+        )]
+        self._number_column = "n.number" if "number" in columns else "NULL"
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            self._local.conn = conn
+        return conn
+
+    def match_query(self, text):
+        """FTS5 query requiring every word of ``text``; None if unusable."""
+        words = text.lower().replace('"', " ").split()
+        if self.tokenizer == "trigram":
+            # Trigram matching needs at least three characters per term
+            terms = [f'"{word}"' for word in words if len(word) >= 3]
+        else:
+            terms = [f'"{word}"*' for word in words]
+        return " ".join(terms) or None
+
+    def search(self, query, limit=3):
+        """
+        Best matching foods for ``query``, generic foods before branded
+        products, each ranked by BM25.
+        """
+        match = self.match_query(query)
+        if match is None:
+            return []
+
+        conn = self._connection()
+        fdc_ids = []
+        for table in ("generic_fts", "branded_fts"):
+            rows = conn.execute(
+                f"SELECT rowid FROM {table} WHERE {table} MATCH ? "
+                "ORDER BY rank LIMIT ?",
+                (match, limit - len(fdc_ids)),
+            ).fetchall()
+            fdc_ids.extend(row[0] for row in rows)
+            if len(fdc_ids) >= limit:
+                break
+        return self.get_foods(fdc_ids)
+
+    def get_foods(self, fdc_ids):
+        """Foods by FDC id in the given order, in search API shape."""
+        if not fdc_ids:
+            return []
+        conn = self._connection()
+        placeholders = ", ".join("?" * len(fdc_ids))
+        foods = {}
+        for row in conn.execute(
+            "SELECT fdc_id, description, data_type, serving_size, "
+            f"serving_size_unit FROM foods WHERE fdc_id IN ({placeholders})",
+            fdc_ids,
+        ):
+            fdc_id, description, data_type, serving_size, unit = row
+            food = {
+                "fdcId": fdc_id,
+                "description": description,
+                "dataType": data_type,
+                "foodNutrients": [],
+            }
+            if serving_size is not None:
+                food["servingSize"] = serving_size
+                food["servingSizeUnit"] = unit
+            foods[fdc_id] = food
+
+        for fdc_id, name, amount, unit, number in conn.execute(
+            "SELECT fn.fdc_id, n.name, fn.amount, n.unit, "
+            f"{self._number_column} FROM food_nutrients fn "
+            "JOIN nutrients n ON n.id = fn.nutrient_id "
+            f"WHERE fn.fdc_id IN ({placeholders}) ORDER BY n.rank, n.id",
+            fdc_ids,
+        ):
+            nutrient = {"nutrientName": name, "value": amount,
+                        "unitName": unit}
+            if number is not None:
+                nutrient["nutrientNumber"] = number
+            foods[fdc_id]["foodNutrients"].append(nutrient)
+        return [foods[fdc_id] for fdc_id in fdc_ids if fdc_id in foods]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_fdc_index():
+    """The shared index at FDC_INDEX_PATH, opened on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = FDCIndex(FDC_INDEX_PATH)
+    return _index
+
+
+def _reset_after_fork():
+    # Forked children open their own connections rather than sharing
+    # the parent's
+    global _index, _index_lock
+    _index = None
+    _index_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,210 @@
+import array
+import os
+import sys
+from collections.abc import Mapping
+
+import orjson
+
+# Nutrients on a nutrition facts label, by USDA nutrient number.
+# Records keep every nutrient by default, as the frontend lists them all,
+# so by default USDA responses and cached records are no smaller than
+# before. NUTRITION_NUTRIENTS=label keeps only these, which also lets bulk
+# /foods requests ask for only these (the API accepts at most 25); it
+# also takes a comma-separated list of numbers.
+LABEL_NUTRIENTS = {
+    "208": "Energy",
+    "203": "Protein",
+    "204": "Total lipid (fat)",
+    "606": "Fatty acids, total saturated",
+    "605": "Fatty acids, total trans",
+    "645": "Fatty acids, total monounsaturated",
+    "646": "Fatty acids, total polyunsaturated",
+    "601": "Cholesterol",
+    "307": "Sodium, Na",
+    "205": "Carbohydrate, by difference",
+    "291": "Fiber, total dietary",
+    "269": "Sugars, total including NLEA",
+    "539": "Sugars, added",
+    "255": "Water",
+    "328": "Vitamin D (D2 + D3)",
+    "301": "Calcium, Ca",
+    "303": "Iron, Fe",
+    "306": "Potassium, K",
+    "320": "Vitamin A, RAE",
+    "401": "Vitamin C, total ascorbic acid",
+    "323": "Vitamin E (alpha-tocopherol)",
+    "430": "Vitamin K (phylloquinone)",
+    "415": "Vitamin B-6",
+    "418": "Vitamin B-12",
+    "435": "Folate, DFE",
+}
+
+
+def _reported_nutrients(setting):
+    setting = setting.strip().lower()
+    if setting == "all":
+        return None
+    if setting == "label":
+        return frozenset(LABEL_NUTRIENTS)
+    numbers = [number.strip() for number in setting.split(",")]
+    return frozenset(number for number in numbers if number)
+
+
+# Nutrient numbers kept in records, or None to keep all of them
+REPORTED_NUTRIENTS = _reported_nutrients(
+    os.getenv("NUTRITION_NUTRIENTS", "all")
+)
+
+
+def is_reported(number):
+    """Whether a nutrient is kept; nutrients without a number always are."""
+    return (
+        number is None
+        or REPORTED_NUTRIENTS is None
+        or str(number) in REPORTED_NUTRIENTS
+    )
+
+
+# Nutrient names and units of the records seen so far. Foods of the same
+# kind report the same nutrients, so most records share one pair of
+# tuples of interned strings.
+_layouts = {}
+MAX_LAYOUTS = 4096
+
+_FIELDS = {
+    "description": "description",
+    "dataType": "data_type",
+    "servingSize": "serving_size",
+    "servingSizeUnit": "serving_size_unit",
+}
+
+
+class FoodRecord(Mapping):
+    """
+    Compact nutrition record of a food. Nutrient values are packed in a
+    float array next to shared tuples of names and units, instead of a
+    dict per nutrient. It reads like the record dict it replaces, with
+    description, dataType, servingSize, servingSizeUnit and nutrients
+    ({name: {"value": ..., "unit": ...}}) keys, and compares equal to it.
+    """
+
+    __slots__ = (
+        "description",
+        "data_type",
+        "serving_size",
+        "serving_size_unit",
+        "names",
+        "units",
+        "amounts",
+    )
+
+    def __init__(self, description, data_type, serving_size,
+                 serving_size_unit, nutrients):
+        """``nutrients`` maps nutrient names to (value, unit) pairs."""
+        self.description = description
+        self.data_type = data_type
+        self.serving_size = serving_size
+        self.serving_size_unit = serving_size_unit
+        nutrients = {
+            name: (value, unit)
+            for name, (value, unit) in nutrients.items()
+            if value is not None
+        }
+        names = tuple(nutrients)
+        units = tuple(unit for _, unit in nutrients.values())
+        layout = _layouts.get((names, units))
+        if layout is None:
+            layout = (
+                tuple(sys.intern(name) for name in names),
+                tuple(sys.intern(unit) for unit in units),
+            )
+            if len(_layouts) < MAX_LAYOUTS:
+                _layouts[layout] = layout
+        self.names, self.units = layout
+        self.amounts = array.array(
+            "d", [value for value, _ in nutrients.values()]
+        )
+
+    @classmethod
+    def from_dict(cls, record):
+        """FoodRecord from a record dict of the same shape."""
+        return cls(
+            record["description"],
+            record["dataType"],
+            record.get("servingSize"),
+            record.get("servingSizeUnit", ""),
+            {
+                name: (info["value"], info["unit"])
+                for name, info in record["nutrients"].items()
+            },
+        )
+
+    @property
+    def nutrients(self):
+        return {
+            name: {"value": value, "unit": unit}
+            for name, value, unit in zip(
+                self.names, self.amounts.tolist(), self.units
+            )
+        }
+
+    def __getitem__(self, key):
+        if key == "nutrients":
+            return self.nutrients
+        try:
+            return getattr(self, _FIELDS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        yield from _FIELDS
+        yield "nutrients"
+
+    def __len__(self):
+        return len(_FIELDS) + 1
+
+    def __repr__(self):
+        return (
+            f"FoodRecord({self.description!r}, {len(self.names)} nutrients)"
+        )
+
+    def to_list(self):
+        """Flat JSON-serializable form, read back by from_list."""
+        return [
+            self.description,
+            self.data_type,
+            self.serving_size,
+            self.serving_size_unit,
+            self.names,
+            self.units,
+            self.amounts.tolist(),
+        ]
+
+    @classmethod
+    def from_list(cls, fields):
+        (description, data_type, serving_size, serving_size_unit,
+         names, units, amounts) = fields
+        return cls(
+            description,
+            data_type,
+            serving_size,
+            serving_size_unit,
+            dict(zip(names, zip(amounts, units))),
+        )
+
+
+def dumps_record(value):
+    """Serialize a cached nutrition value for the persistent cache tier."""
+    if isinstance(value, FoodRecord):
+        value = value.to_list()
+    return orjson.dumps(value).decode()
+
+
+def loads_record(text):
+    value = orjson.loads(text)
+    if isinstance(value, list):
+        return FoodRecord.from_list(value)
+    # Record dicts cached before records were compact
+    if "nutrients" in value:
+        return FoodRecord.from_dict(value)
+    return value
@@ -0,0 +1,70 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Uploaded files above this size are rejected with 413. Request bodies
+# are capped by BodyLimitMiddleware while they stream in, before form
+# parsing spools them; read_upload then checks each file on its own.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+# Longest image side passed to OCR; receipts stay legible well below
+# the resolution of a phone camera
+MAX_IMAGE_SIDE = int(os.getenv("OCR_MAX_IMAGE_SIDE", "2048"))
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
+
+class InvalidImageError(ValueError):
+    """Raised when uploaded bytes cannot be decoded as an image."""
+
+
+async def read_upload(file, max_bytes=None):
+    """
+    Read an UploadFile chunk by chunk from its spooled buffer, aborting as
+    soon as it grows past ``max_bytes`` instead of loading it whole. The
+    file has already been spooled by then; BodyLimitMiddleware bounds how
+    much that can be.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(
+            f"{file.filename} is larger than {max_bytes} bytes."
+        )
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLargeError(
+                f"{file.filename} is larger than {max_bytes} bytes."
+            )
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def preprocess_image(image_bytes, max_side=None):
+    """
+    Decode an image, apply its EXIF orientation and downscale it so the
+    longest side is at most ``max_side``. Returns an RGB uint8 array
+    ready for the OCR predictor.
+    """
+    max_side = max_side or MAX_IMAGE_SIDE
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        # JPEGs can be decoded directly at a reduced scale, which saves
+        # most of the decode time and memory for large photos
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(f"Could not decode image: {e}") from e
+
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return np.asarray(image)
@@ -0,0 +1,129 @@
+import os
+
+# smaps_rollup fields reported for each process, in kB
+_SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+    "Swap": "swap",
+}
+
+# cgroup v2 and v1 files holding the memory charged to the container
+_CGROUP_MEMORY_FILES = (
+    "/sys/fs/cgroup/memory.current",
+    "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+)
+
+
+def process_memory(pid="self"):
+    """
+    Memory of a process in bytes from /proc/<pid>/smaps_rollup: ``rss``,
+    ``pss`` (shared pages divided among the processes mapping them),
+    ``private`` (pages no other process maps) and ``shared``. Falls back
+    to RSS from /proc/<pid>/statm on kernels without smaps_rollup.
+    Returns None when the process does not exist.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        lines = None
+    except (PermissionError, ProcessLookupError):
+        return None
+
+    if lines is None:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                pages = int(f.read().split()[1])
+        except (FileNotFoundError, ProcessLookupError):
+            return None
+        return {"rss": pages * os.sysconf("SC_PAGE_SIZE")}
+
+    memory = dict.fromkeys(_SMAPS_FIELDS.values(), 0)
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in _SMAPS_FIELDS:
+            memory[_SMAPS_FIELDS[name]] = int(value.split()[0]) * 1024
+    memory["private"] = memory["private_clean"] + memory["private_dirty"]
+    memory["shared"] = memory["shared_clean"] + memory["shared_dirty"]
+    return memory
+
+
+def child_pids(pid):
+    """Pids of the live child processes of ``pid``."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        # The command name is in parentheses and may contain spaces
+        fields = stat[stat.rindex(")") + 2:].split()
+        if int(fields[1]) == pid and fields[0] != "Z":
+            children.append(int(entry))
+    return sorted(children)
+
+
+def pod_memory():
+    """Memory charged to the container's cgroup in bytes, or None."""
+    for path in _CGROUP_MEMORY_FILES:
+        try:
+            with open(path) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            continue
+    return None
+
+
+def server_memory(master_pid):
+    """
+    Memory of a pre-fork server: the master, each worker and the total
+    PSS of all of them, which unlike summed RSS counts shared model
+    weights once.
+    """
+    master = process_memory(master_pid)
+    workers = {}
+    for pid in child_pids(master_pid):
+        memory = process_memory(pid)
+        if memory is not None:
+            workers[pid] = memory
+    processes = list(workers.values())
+    if master is not None:
+        processes.append(master)
+    return {
+        "master_pid": master_pid,
+        "master": master,
+        "workers": workers,
+        "total_pss": sum(memory.get("pss", 0) for memory in processes),
+        "total_rss": sum(memory["rss"] for memory in processes),
+        "pod": pod_memory(),
+    }
+
+
+def format_server_memory(report):
+    mib = 1024 * 1024
+    rows = [("worker", pid, m) for pid, m in report["workers"].items()]
+    if report["master"]:
+        rows.insert(0, ("master", report["master_pid"], report["master"]))
+
+    summary = (
+        f"Server memory: {len(report['workers'])} workers, total PSS "
+        f"{report['total_pss'] / mib:.0f} MiB (summed RSS "
+        f"{report['total_rss'] / mib:.0f} MiB)"
+    )
+    if report["pod"] is not None:
+        summary += f", pod {report['pod'] / mib:.0f} MiB"
+    lines = [summary]
+    for role, pid, memory in rows:
+        lines.append(
+            f"  {role} {pid}: RSS {memory['rss'] / mib:.0f} MiB, "
+            f"PSS {memory.get('pss', 0) / mib:.0f} MiB, "
+            f"private {memory.get('private', 0) / mib:.0f} MiB"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from api.utils.memory import pod_memory, process_memory, server_memory
+
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by path and status",
+    ["path", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by path",
+    ["path"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being processed", ["path"]
+)
+
+OCR_STAGES = (
+    "read", "decode", "detection", "recognition", "cleanup", "ner", "merge"
+)
+OCR_STAGE_LATENCY = Histogram(
+    "ocr_stage_duration_seconds",
+    "Time spent in each stage of the OCR pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+NER_BATCH_SIZE = Histogram(
+    "ner_batch_size",
+    "Number of texts per batched NER forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+RECIPE_CACHE_REQUESTS = Counter(
+    "recipe_cache_requests_total",
+    "Recipe result cache lookups; stale entries had a changed ingredient",
+    ["result"],
+)
+NUTRITION_COALESCED = Counter(
+    "nutrition_coalesced_lookups_total",
+    "Nutrition lookups that joined an identical lookup already in flight",
+)
+USDA_REQUESTS = Counter(
+    "usda_requests_total",
+    "USDA API requests by response status, or error for failed requests",
+    ["status"],
+)
+USDA_RETRIES = Counter(
+    "usda_retries_total", "USDA requests retried after a transient failure"
+)
+NUTRITION_UNRESOLVED = Counter(
+    "nutrition_unresolved_ingredients_total",
+    "Ingredients left out of a response because their lookup failed",
+)
+NUTRITION_RESOLUTIONS = Counter(
+    "nutrition_id_resolutions_total",
+    "Uncached ingredients by how their FoodData Central id was found",
+    ["method"],
+)
+ADMISSION_ACTIVE = Gauge(
+    "admission_active_requests",
+    "Requests admitted and being processed by route group",
+    ["route"],
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for admission by route group",
+    ["route"],
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Time requests waited for admission by route group",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests rejected with 503 by route group and reason",
+    ["route", "reason"],
+)
+
+# Children are bound once so the hot path skips the label lookup
+_stage_histograms = {
+    stage: OCR_STAGE_LATENCY.labels(stage) for stage in OCR_STAGES
+}
+
+
+@contextmanager
+def stage_timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stage_histograms[stage].observe(time.perf_counter() - start)
+
+
+def instrument_module(module, stage):
+    """
+    Time every forward call of a torch module (e.g. the doctr detection
+    and recognition predictors) with hooks, without wrapping the model.
+    In a process worker pool these are recorded in the worker process.
+    """
+    started = threading.local()
+    histogram = _stage_histograms[stage]
+
+    def before(*args):
+        started.time = time.perf_counter()
+
+    def after(*args):
+        histogram.observe(time.perf_counter() - started.time)
+
+    module.register_forward_pre_hook(before)
+    module.register_forward_hook(after)
+
+
+class CacheCollector:
+    """
+    Reports hit/miss counters and sizes of registered TieredCaches when
+    metrics are scraped, so cache lookups carry no metrics overhead.
+    """
+
+    def __init__(self):
+        self.caches = {}
+
+    def collect(self):
+        hits = CounterMetricFamily(
+            "cache_hits",
+            "Cache hits by cache and tier",
+            labels=["cache", "tier"],
+        )
+        misses = CounterMetricFamily(
+            "cache_misses", "Cache misses", labels=["cache"]
+        )
+        entries = GaugeMetricFamily(
+            "cache_entries", "Entries in the in-memory tier", labels=["cache"]
+        )
+        hit_ratio = GaugeMetricFamily(
+            "cache_hit_ratio",
+            "Share of lookups served from either tier since startup",
+            labels=["cache"],
+        )
+        for name, cache in self.caches.items():
+            hits.add_metric([name, "memory"], cache.hits - cache.disk_hits)
+            hits.add_metric([name, "disk"], cache.disk_hits)
+            misses.add_metric([name], cache.misses)
+            entries.add_metric([name], len(cache.memory))
+            lookups = cache.hits + cache.misses
+            if lookups:
+                hit_ratio.add_metric([name], cache.hits / lookups)
+        yield hits
+        yield misses
+        yield entries
+        yield hit_ratio
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def register_cache(name, cache):
+    cache_collector.caches[name] = cache
+
+
+class MemoryCollector:
+    """
+    Reports process memory from /proc when metrics are scraped. Under the
+    pre-fork server (PREFORK_MASTER_PID set) every worker reports the
+    master and all workers, so whichever worker answers the scrape shows
+    per-worker memory and the server total.
+    """
+
+    KINDS = ("rss", "pss", "private")
+
+    def collect(self):
+        memory = GaugeMetricFamily(
+            "server_process_memory_bytes",
+            "Memory of the server processes by role, pid and kind",
+            labels=["role", "pid", "kind"],
+        )
+        master_pid = os.getenv("PREFORK_MASTER_PID")
+        if master_pid:
+            report = server_memory(int(master_pid))
+            processes = [
+                ("worker", pid, m) for pid, m in report["workers"].items()
+            ]
+            if report["master"]:
+                processes.append(
+                    ("master", report["master_pid"], report["master"])
+                )
+            yield GaugeMetricFamily(
+                "server_memory_pss_bytes",
+                "Total PSS of the master and workers, shared pages once",
+                value=report["total_pss"],
+            )
+        else:
+            processes = [("single", os.getpid(), process_memory())]
+
+        for role, pid, process in processes:
+            if process is None:
+                continue
+            for kind in self.KINDS:
+                if kind in process:
+                    memory.add_metric([role, str(pid), kind], process[kind])
+        yield memory
+
+        pod = pod_memory()
+        if pod is not None:
+            yield GaugeMetricFamily(
+                "pod_memory_bytes",
+                "Memory charged to the container's cgroup",
+                value=pod,
+            )
+
+
+REGISTRY.register(MemoryCollector())
+
+
+def render_metrics():
+    """
+    Current metrics in the Prometheus text format and its media type.
+    Under the pre-fork server these are the answering worker's only.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, latency and in-flight
+    requests per route. Unknown paths are grouped under "other" to keep
+    label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.paths is None:
+            self.paths = {route.path for route in scope["app"].routes}
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(path)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            HTTP_LATENCY.labels(path).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(path, str(status["code"])).inc()
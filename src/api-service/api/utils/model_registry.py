@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+
+
+# Detection/recognition architectures per OCR_PROFILE, from the lightest
+# to the heaviest (and most accurate) doctr models
+OCR_PROFILES = {
+    "fast": {
+        "det_arch": "db_mobilenet_v3_large",
+        "reco_arch": "crnn_mobilenet_v3_small",
+    },
+    "balanced": {
+        "det_arch": "db_mobilenet_v3_large",
+        "reco_arch": "crnn_mobilenet_v3_large",
+    },
+    "accurate": {
+        "det_arch": "db_resnet50",
+        "reco_arch": "crnn_vgg16_bn",
+    },
+}
+
+
+def ocr_profile():
+    return os.getenv("OCR_PROFILE", "accurate")
+
+
+def ner_backend():
+    # NER_BACKEND=quantized opts into int8 inference on CPU-only pods
+    return os.getenv("NER_BACKEND", "torch")
+
+
+def build_ocr_model(profile="accurate"):
+    # doctr pulls in torch, so it is only imported when the model is needed
+    from doctr.models import ocr_predictor
+
+    if profile not in OCR_PROFILES:
+        raise ValueError(f"Unknown OCR profile: {profile}")
+    ocr_model = ocr_predictor(**OCR_PROFILES[profile], pretrained=True)
+    ocr_model.det_predictor.model.postprocessor.bin_thresh = 0.2
+    return ocr_model
+
+
+def load_ocr_model(profile=None):
+    from api.utils.metrics import instrument_module
+
+    ocr_model = build_ocr_model(profile or ocr_profile())
+    # Detection and recognition run inside one predictor call, so they
+    # are timed separately through forward hooks
+    instrument_module(ocr_model.det_predictor, "detection")
+    instrument_module(ocr_model.reco_predictor, "recognition")
+    return ocr_model
+
+
+NER_MODEL_NAME = "Dizex/InstaFoodRoBERTa-NER"
+NER_BACKENDS = ("torch", "quantized")
+
+
+def quantize_ner_model(ner_model):
+    """
+    Dynamically quantize the Linear layers of the NER model to int8.
+    Weights are stored as int8 and activations are quantized on the fly,
+    so no calibration data is needed.
+    """
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(
+        ner_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def build_ner_pipeline(ner_model, ner_tokenizer, backend="torch"):
+    from transformers import pipeline
+
+    if backend not in NER_BACKENDS:
+        raise ValueError(f"Unknown NER backend: {backend}")
+    if backend == "quantized":
+        ner_model = quantize_ner_model(ner_model)
+    return pipeline("ner", model=ner_model, tokenizer=ner_tokenizer)
+
+
+def load_ner_pipeline(backend=None):
+    from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+    ner_tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_NAME)
+    ner_model = AutoModelForTokenClassification.from_pretrained(
+        NER_MODEL_NAME
+    )
+    return build_ner_pipeline(
+        ner_model, ner_tokenizer, backend or ner_backend()
+    )
+
+
+class ModelRegistry:
+    """
+    Loads models on first use, or ahead of time in a background warm-up
+    thread, and reports which of them are ready to serve.
+    """
+
+    def __init__(self, loaders):
+        self.loaders = loaders
+        self.models = {}
+        self.errors = {}
+        self.load_seconds = {}
+        self.warm_up_seconds = None
+        self._locks = {name: threading.Lock() for name in loaders}
+        self._warm_up_thread = None
+
+    def get(self, name):
+        model = self.models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            if name in self.models:
+                return self.models[name]
+            start = time.perf_counter()
+            try:
+                model = self.loaders[name]()
+            except Exception as e:
+                self.errors[name] = str(e)
+                raise
+            self.load_seconds[name] = time.perf_counter() - start
+            self.errors.pop(name, None)
+            self.models[name] = model
+            print(f"Loaded {name} model in {self.load_seconds[name]:.2f}s")
+            return model
+
+    def is_ready(self, names=None):
+        return all(name in self.models for name in (names or self.loaders))
+
+    def warm_up(self, names=None):
+        """Load every model, recording failures instead of raising."""
+        start = time.perf_counter()
+        for name in names or self.loaders:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Failed to load {name} model: {e}")
+        self.warm_up_seconds = time.perf_counter() - start
+        print(f"Model warm-up finished in {self.warm_up_seconds:.2f}s")
+
+    def start_warm_up(self, names=None):
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(
+                target=self.warm_up,
+                args=(names,),
+                name="model-warm-up",
+                daemon=True,
+            )
+            self._warm_up_thread.start()
+
+    def status(self):
+        return {
+            "ready": self.is_ready(),
+            "warm_up_seconds": self.warm_up_seconds,
+            "models": {
+                name: {
+                    "loaded": name in self.models,
+                    "load_seconds": self.load_seconds.get(name),
+                    "error": self.errors.get(name),
+                }
+                for name in self.loaders
+            },
+        }
+
+
+registry = ModelRegistry({"ocr": load_ocr_model, "ner": load_ner_pipeline})
+
+# Load models in the background when the app starts (MODEL_WARMUP=0 to
+# defer loading to the first OCR request instead; /ready then reports
+# ready without waiting for them)
+WARM_UP_ON_STARTUP = os.getenv("MODEL_WARMUP", "1") == "1"
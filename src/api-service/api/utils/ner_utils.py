@@ -1,3 +1,6 @@
+import re
+
+
 def convert_ner_entities_to_list(text, entities: list[dict]) -> list[str]:
     ents = []
     for ent in entities:
@@ -17,3 +20,136 @@ def convert_ner_entities_to_list(text, entities: list[dict]) -> list[str]:
             ents.append(e)
 
     return [text[e["start"]: e["end"]] for e in ents]
+
+
+def split_long_lines(lines, token_counts, count_tokens, max_tokens=500,
+                     separator=", "):
+    """
+    Split lines too long for a window on their own into pieces of whole
+    words that fit, so no window holds more tokens than the model sees.
+    ``count_tokens`` maps a list of words to their token counts.
+
+    Returns the pieces, their token counts and their character offsets in
+    ``separator.join(lines)``, as split_text_windows takes them.
+    """
+    pieces, piece_counts, offsets = [], [], []
+    position = 0
+    for line, count in zip(lines, token_counts):
+        # split_text_windows counts one extra token per line
+        if count + 1 <= max_tokens:
+            spans = [(0, len(line), count)]
+        else:
+            spans = word_pieces(line, count_tokens, max_tokens - 1)
+        for start, end, tokens in spans:
+            pieces.append(line[start:end])
+            piece_counts.append(tokens)
+            offsets.append(position + start)
+        position += len(line) + len(separator)
+    return pieces, piece_counts, offsets
+
+
+def word_pieces(line, count_tokens, max_tokens):
+    """
+    (start, end, tokens) of consecutive runs of whole words in ``line``
+    holding at most ``max_tokens`` tokens each. A single word longer than
+    that is cut every ``max_tokens`` characters, which never exceeds the
+    budget for byte-level BPE on the ASCII text NER gets.
+    """
+    words = []
+    for match in re.finditer(r"\S+", line):
+        start, end = match.span()
+        while end - start > max_tokens:
+            words.append((start, start + max_tokens))
+            start += max_tokens
+        words.append((start, end))
+    counts = count_tokens([line[start:end] for start, end in words])
+
+    pieces = []
+    first = last = None
+    tokens = 0
+    for (start, end), count in zip(words, counts):
+        count = min(count, max_tokens)
+        if first is not None and tokens + count > max_tokens:
+            pieces.append((first, last, tokens))
+            first = None
+            tokens = 0
+        if first is None:
+            first = start
+        last = end
+        tokens += count
+    if first is not None:
+        pieces.append((first, last, tokens))
+    return pieces
+
+
+def split_text_windows(lines, token_counts, max_tokens=500, overlap=2,
+                       separator=", ", offsets=None):
+    """
+    Split ``separator.join(lines)`` into windows of whole lines that fit
+    the model, where consecutive windows share ``overlap`` lines. Lines
+    must fit a window on their own (see split_long_lines); ``offsets``
+    gives their positions in the text when they are pieces of it rather
+    than joined by ``separator``.
+
+    Each window is a dict of character offsets into the joined text:
+    ``start``/``end`` delimit the window text, and ``own_start``/``own_end``
+    the part whose entities it reports. The overlap is split down the
+    middle so every entity is reported by exactly one window.
+    """
+    if offsets is None:
+        offsets = []
+        position = 0
+        for line in lines:
+            offsets.append(position)
+            position += len(line) + len(separator)
+
+    spans = []
+    first = 0
+    while first < len(lines):
+        last = first
+        tokens = 0
+        # Count one extra token per line for the separator
+        while last < len(lines) and (
+            last == first or tokens + token_counts[last] + 1 <= max_tokens
+        ):
+            tokens += token_counts[last] + 1
+            last += 1
+        spans.append((first, last))
+        if last == len(lines):
+            break
+        first = max(first + 1, last - overlap)
+
+    windows = []
+    for i, (first, last) in enumerate(spans):
+        windows.append({
+            "start": offsets[first],
+            "end": offsets[last - 1] + len(lines[last - 1]),
+            "own_start": 0,
+            "own_end": float("inf"),
+        })
+        if i > 0:
+            previous_last = spans[i - 1][1]
+            split = first + (previous_last - first + 1) // 2
+            windows[i - 1]["own_end"] = offsets[split]
+            windows[i]["own_start"] = offsets[split]
+
+    return windows
+
+
+def merge_window_entities(windows, window_entities):
+    """
+    Shift per-window entity offsets back into the joined text and drop
+    the duplicates found in the overlap between windows.
+    """
+    merged = []
+    for window, entities in zip(windows, window_entities):
+        for ent in entities:
+            start = ent["start"] + window["start"]
+            if window["own_start"] <= start < window["own_end"]:
+                merged.append({
+                    **ent,
+                    "start": start,
+                    "end": ent["end"] + window["start"],
+                })
+
+    return merged
@@ -0,0 +1,183 @@
+import threading
+
+import numpy as np
+
+from api.utils.cache_utils import LRUCache
+from api.utils.food_record import FoodRecord
+
+# Nutrients reported for most FNDDS and SR Legacy foods. They get the
+# first vector slots; names outside this list are appended on first use.
+COMMON_NUTRIENTS = [
+    "Protein", "Total lipid (fat)", "Carbohydrate, by difference",
+    "Energy", "Alcohol, ethyl", "Water", "Caffeine", "Theobromine",
+    "Sugars, total including NLEA", "Fiber, total dietary", "Calcium, Ca",
+    "Iron, Fe", "Magnesium, Mg", "Phosphorus, P", "Potassium, K",
+    "Sodium, Na", "Zinc, Zn", "Copper, Cu", "Selenium, Se", "Retinol",
+    "Vitamin A, RAE", "Carotene, beta", "Carotene, alpha",
+    "Vitamin E (alpha-tocopherol)", "Vitamin D (D2 + D3)",
+    "Cryptoxanthin, beta", "Lycopene", "Lutein + zeaxanthin",
+    "Vitamin C, total ascorbic acid", "Thiamin", "Riboflavin", "Niacin",
+    "Vitamin B-6", "Folate, total", "Vitamin B-12", "Choline, total",
+    "Vitamin K (phylloquinone)", "Folic acid", "Folate, food", "Folate, DFE",
+    "Vitamin E, added", "Vitamin B-12, added", "Cholesterol",
+    "Fatty acids, total saturated", "Fatty acids, total monounsaturated",
+    "Fatty acids, total polyunsaturated", "SFA 4:0", "SFA 6:0", "SFA 8:0",
+    "SFA 10:0", "SFA 12:0", "SFA 14:0", "SFA 16:0", "SFA 18:0",
+    "MUFA 16:1", "MUFA 18:1", "MUFA 20:1", "MUFA 22:1", "PUFA 18:2",
+    "PUFA 18:3", "PUFA 18:4", "PUFA 20:4", "PUFA 20:5 n-3 (EPA)",
+    "PUFA 22:5 n-3 (DPA)", "PUFA 22:6 n-3 (DHA)",
+]
+
+
+class NutrientVocabulary:
+    """Append-only mapping of nutrient names to vector positions."""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.index = {}
+        self._lock = threading.Lock()
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        with self._lock:
+            position = self.index.get(name)
+            if position is None:
+                position = len(self.names)
+                self.names.append(name)
+                self.index[name] = position
+            return position
+
+    def positions(self, names):
+        index = self.index
+        return np.fromiter(
+            (index[name] if name in index else self.add(name)
+             for name in names),
+            dtype=np.intp,
+            count=len(names),
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+
+vocabulary = NutrientVocabulary(COMMON_NUTRIENTS)
+
+
+class FoodVector:
+    """
+    A nutrition record's nutrients as a dense array indexed by the
+    vocabulary, already scaled to 100 g. ``order`` and ``units`` keep the
+    record's nutrient order and units so aggregates can be rendered
+    exactly like aggregate_nutrition_info_with_units does.
+    """
+
+    __slots__ = ("record", "order", "units", "values")
+
+    def __init__(self, record, order, units, values):
+        self.record = record
+        self.order = order
+        self.units = units
+        self.values = values
+
+    @classmethod
+    def from_record(cls, record):
+        """Vector for a nutrition record, or None if it cannot be scaled."""
+        serving_size = record.get("servingSize", None)
+        serving_size_unit = record.get("servingSizeUnit", "").lower()
+        if not (serving_size and serving_size_unit == "g"):
+            return None
+
+        if isinstance(record, FoodRecord):
+            names, units = record.names, record.units
+            amounts = np.frombuffer(record.amounts)
+        else:
+            nutrients = record["nutrients"]
+            names = list(nutrients)
+            units = [info["unit"] for info in nutrients.values()]
+            amounts = [info["value"] for info in nutrients.values()]
+        order = vocabulary.positions(names)
+        values = np.zeros(order.max() + 1 if len(order) else 0)
+        values[order] = amounts
+        values *= 100 / serving_size
+        return cls(record, order, np.array(units, dtype=object), values)
+
+
+# Vectors of recently used records, so each cached record is converted
+# once rather than on every request
+_vectors = LRUCache(maxsize=4096)
+
+
+def food_vector(ingredient, record):
+    """
+    Vector for ``record``, reused while the nutrition cache keeps handing
+    out the same record object for ``ingredient``.
+    """
+    vector = _vectors.get(ingredient)
+    if vector is None or vector.record is not record:
+        vector = FoodVector.from_record(record)
+        if vector is not None:
+            _vectors.set(ingredient, vector)
+    return vector
+
+
+def aggregate_nutrition_batch(nutrition_info_dicts):
+    """
+    Vectorized aggregate_nutrition_info_with_units over several recipes,
+    returning one aggregate per recipe with identical keys, order, units
+    and values. All recipes are summed in a single cumulative sum, which
+    adds ingredients in the same order as the original loop.
+    """
+    recipes = []
+    for nutrition_info_dict in nutrition_info_dicts:
+        vectors = []
+        for ingredient, info in nutrition_info_dict.items():
+            vector = food_vector(ingredient, info)
+            if vector is None:
+                print(
+                    f"Warning: Cannot scale {ingredient}; "
+                    "serving size is missing."
+                )
+            else:
+                vectors.append(vector)
+        recipes.append(vectors)
+
+    depth = max((len(vectors) for vectors in recipes), default=0)
+    if depth == 0:
+        return [{} for _ in recipes]
+    width = max(
+        len(vector.values) for vectors in recipes for vector in vectors
+    )
+    # Recipes are zero padded; adding zeros leaves the totals unchanged
+    stacked = np.zeros((len(recipes), depth, width))
+    for r, vectors in enumerate(recipes):
+        for i, vector in enumerate(vectors):
+            stacked[r, i, :len(vector.values)] = vector.values
+    totals = np.cumsum(stacked, axis=1)[:, -1]
+
+    names = vocabulary.names
+    results = []
+    for vectors, recipe_totals in zip(recipes, totals):
+        if not vectors:
+            results.append({})
+            continue
+        positions = np.concatenate([vector.order for vector in vectors])
+        units = np.concatenate([vector.units for vector in vectors])
+        # Nutrients in order of first appearance, with the unit first seen
+        unique, first = np.unique(positions, return_index=True)
+        first_seen = np.argsort(first, kind="stable")
+        unique, first = unique[first_seen], first[first_seen]
+        results.append({
+            names[position]: {"value": value, "unit": unit}
+            for position, value, unit in zip(
+                unique.tolist(),
+                recipe_totals[unique].tolist(),
+                units[first].tolist(),
+            )
+        })
+    return results
+
+
+def aggregate_nutrition_vectors(nutrition_info_dict):
+    """Vectorized aggregate_nutrition_info_with_units for one recipe."""
+    return aggregate_nutrition_batch([nutrition_info_dict])[0]
@@ -0,0 +1,95 @@
+import itertools
+
+from api.utils.cache_utils import LRUCache, create_cache_from_env
+from api.utils.food_record import dumps_record, loads_record
+from api.utils.metrics import register_cache
+
+# Selected USDA food records (FoodRecord) keyed by normalized ingredient.
+# USDA data changes rarely, so entries live for a week by default. Set
+# NUTRITION_CACHE_DIR to keep them in SQLite across restarts.
+nutrition_cache = create_cache_from_env(
+    "NUTRITION",
+    maxsize=4096,
+    ttl=7 * 24 * 3600,
+    dumps=dumps_record,
+    loads=loads_record,
+)
+register_cache("nutrition", nutrition_cache)
+
+# (stamp, record) of the record last cached for each ingredient. A new
+# stamp is issued whenever an ingredient's record changes, which
+# invalidates the cached recipes built from the old one.
+record_stamps = LRUCache(
+    maxsize=nutrition_cache.memory.maxsize, ttl=nutrition_cache.memory.ttl
+)
+_stamps = itertools.count(1)
+
+# Stored for ingredients USDA has no usable food for, since None is the
+# cache's miss marker
+NOT_FOUND = {}
+
+# Frequent receipt and recipe ingredients, roughly most common first,
+# used to warm the cache after a deploy
+COMMON_INGREDIENTS = [
+    "salt", "sugar", "butter", "egg", "milk", "flour", "olive oil",
+    "garlic", "onion", "water", "black pepper", "chicken breast",
+    "tomato", "lemon juice", "vanilla extract", "baking powder",
+    "baking soda", "brown sugar", "vegetable oil", "parmesan cheese",
+    "cheddar cheese", "heavy cream", "carrot", "potato", "rice",
+    "ground beef", "bacon", "celery", "green onion", "soy sauce",
+    "honey", "cinnamon", "cream cheese", "sour cream", "mayonnaise",
+    "spinach", "mushroom", "bell pepper", "cucumber", "avocado",
+    "banana", "apple", "strawberries", "bread", "pasta", "oats",
+    "yogurt", "broccoli", "salmon", "shrimp", "tofu", "corn",
+    "black beans", "peanut butter", "orange juice", "ginger",
+    "cilantro", "basil", "lime", "coconut milk",
+]
+
+
+def normalize_ingredient(ingredient):
+    """Cache key for an ingredient: lowercase with collapsed whitespace."""
+    return " ".join(ingredient.lower().split())
+
+
+def get_cached_food(ingredient):
+    """
+    Cached record for an ingredient: the food dict, NOT_FOUND when USDA
+    had nothing usable, or None when the ingredient is not cached.
+    """
+    key = normalize_ingredient(ingredient)
+    food = nutrition_cache.get(key)
+    if food is not None:
+        # Records read back from the persistent tier (e.g. after a
+        # restart) have no stamp yet
+        stamp_food(key, food)
+    return food
+
+
+def cache_food(ingredient, food):
+    key = normalize_ingredient(ingredient)
+    food = food or NOT_FOUND
+    stamp_food(key, food)
+    nutrition_cache.set(key, food)
+
+
+def stamp_food(key, food):
+    stamped = record_stamps.get(key)
+    if stamped is None or stamped[1] != food:
+        stamped = (next(_stamps), food)
+    record_stamps.set(key, stamped)
+
+
+def record_stamp(ingredient, food):
+    """
+    Stamp of the record cached for an ingredient, or None when ``food``
+    is not the record currently cached for it.
+    """
+    stamped = record_stamps.get(normalize_ingredient(ingredient))
+    if stamped is None or stamped[1] != (food or NOT_FOUND):
+        return None
+    return stamped[0]
+
+
+def food_key(fdc_id):
+    """Cache key for the nutrition record of a FoodData Central food."""
+    return f"fdc:{fdc_id}"
@@ -1,113 +1,478 @@
+import asyncio
 import os
+import weakref
+
+import httpx
+import orjson
 import requests
 
+from api.utils.fdc_ids import fdc_ids
+from api.utils.fdc_index import BRANDED, get_fdc_index, search_unit
+from api.utils.food_record import (
+    REPORTED_NUTRIENTS,
+    FoodRecord,
+    is_reported,
+)
+from api.utils.metrics import NUTRITION_COALESCED, NUTRITION_UNRESOLVED
+from api.utils.nutrition_cache import (
+    cache_food,
+    food_key,
+    get_cached_food,
+    normalize_ingredient,
+    nutrition_cache,
+)
+from api.utils.single_flight import SingleFlight
+from api.utils.usda_client import (
+    USDA_TIMEOUT,
+    UpstreamError,
+    get_with_retries_sync,
+    lookup_deadline,
+    request_with_retries,
+)
+
 # Use environment variable for the USDA API key
 USDA_API_KEY = os.getenv("USDA_API_KEY")
+USDA_API_URL = os.getenv("USDA_API_URL", "https://api.nal.usda.gov/fdc/v1")
+USDA_SEARCH_URL = f"{USDA_API_URL}/foods/search"
+USDA_FOODS_URL = f"{USDA_API_URL}/foods"
+# The /foods endpoint accepts at most this many ids per request, and at
+# most this many nutrient numbers to return
+FOODS_PER_REQUEST = 20
+MAX_FOODS_NUTRIENTS = 25
+# "usda" searches the live API, "local" the offline index at FDC_INDEX_PATH
+NUTRITION_BACKEND = os.getenv("NUTRITION_BACKEND", "usda")
+
+# Maximum concurrent USDA lookups
+NUTRITION_CONCURRENCY = int(os.getenv("NUTRITION_CONCURRENCY", "8"))
+
+# One pooled client per event loop; forked children open their own
+_async_clients = weakref.WeakKeyDictionary()
+os.register_at_fork(after_in_child=_async_clients.clear)
+# Concurrent lookups of the same ingredient, or of the same FDC id (keyed
+# ("fdc", id)), share one upstream request
+nutrition_lookups = SingleFlight(NUTRITION_COALESCED)
+# Lookup result for an ingredient whose USDA request failed
+UNRESOLVED = object()
+
+
+class NutritionResults(dict):
+    """
+    Nutrition records by ingredient. ``unresolved`` lists the ingredients
+    left out because their lookup failed, as opposed to ingredients USDA
+    has no data for, so callers can report partial results.
+    """
+
+    def __init__(self, *args, unresolved=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unresolved = list(unresolved)
+        NUTRITION_UNRESOLVED.inc(len(self.unresolved))
+
+
+def choose_food(ingredient, foods):
+    """
+    Pick the most complete food from USDA search results, preferring the
+    FNDDS database. Returns the food with its serving size and unit, or
+    None when no usable food was found.
+    """
+    if not foods:
+        return None
+
+    fndds_foods = [
+        food
+        for food in foods
+        if food.get("dataType") == "Survey (FNDDS)"
+    ]
+
+    if fndds_foods:
+        sorted_foods = sorted(
+            fndds_foods,
+            key=lambda x: len(x.get("foodNutrients", [])),
+            reverse=True,
+        )
+        most_complete_food = sorted_foods[0]
+
+        serving_size = most_complete_food.get("servingSize")
+        serving_size_unit = most_complete_food.get("servingSizeUnit", "")
+
+        if serving_size is None:
+            serving_size = 100
+            serving_size_unit = "g"
+        print(
+            "Reminder: Raw ingredient data found "
+            f"for {ingredient}. "
+            "The nutrition calculation for this "
+            "ingredient is based "
+            "on the FNDDS database from USDA."
+        )
+
+    else:
+        print(
+            "Reminder: No raw ingredient data "
+            f"found for {ingredient}. "
+            "General USDA nutrition facts search is used for "
+            "nutrition calculation for this ingredient."
+        )
+        non_fndds_foods = [
+            food
+            for food in foods
+            if food.get("dataType") != "Survey (FNDDS)"
+        ]
+
+        if non_fndds_foods:
+            sorted_foods = sorted(
+                non_fndds_foods,
+                key=lambda x: len(x.get("foodNutrients", [])),
+                reverse=True,
+            )
+            most_complete_food = next(
+                (
+                    food
+                    for food in sorted_foods
+                    if food.get("servingSize") is not None
+                ),
+                sorted_foods[0],
+            )
+            serving_size = most_complete_food.get("servingSize")
+            serving_size_unit = most_complete_food.get("servingSizeUnit", "")
+
+            if serving_size is None:
+                serving_size = "N/A"
+        else:
+            print(
+                "Warning: No nutrition data "
+                f"available for {ingredient}. "
+                "This ingredient will not be included "
+                "in the nutrition facts calculation."
+            )
+            return None
+
+    return most_complete_food, serving_size, serving_size_unit
+
+
+def food_record(food, serving_size, serving_size_unit):
+    """
+    Nutrition record for a food chosen by choose_food, with only the
+    reported nutrients (see REPORTED_NUTRIENTS).
+    """
+    return FoodRecord(
+        food["description"],
+        food["dataType"],
+        serving_size,
+        serving_size_unit,
+        {
+            nutrient["nutrientName"]: (
+                nutrient["value"], nutrient.get("unitName", "")
+            )
+            for nutrient in food["foodNutrients"]
+            if is_reported(nutrient.get("nutrientNumber"))
+        },
+    )
+
+
+def select_food(ingredient, foods):
+    """
+    Pick the most complete food from USDA search results and shape it
+    into a nutrition record. Returns None when no usable food was found.
+    """
+    choice = choose_food(ingredient, foods)
+    return None if choice is None else food_record(*choice)
 
 
 def get_nutrition_info(ingredients):
     """
-    Get nutrition info for each ingredient using USDA API.
+    Get nutrition info for each ingredient using USDA API,
+    or the local FoodData Central index when NUTRITION_BACKEND is "local".
     """
     nutrition_data = {}
-    base_url = "https://api.nal.usda.gov/fdc/v1/foods/search"
+    unresolved = []
+    deadline = lookup_deadline()
 
     for ingredient in ingredients:
-        params = {"query": ingredient, "api_key": USDA_API_KEY, "pageSize": 3}
-        response = requests.get(base_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            if data["foods"]:
-                fndds_foods = [
-                    food
-                    for food in data["foods"]
-                    if food.get("dataType") == "Survey (FNDDS)"
-                ]
-
-                if fndds_foods:
-                    sorted_foods = sorted(
-                        fndds_foods,
-                        key=lambda x: len(x.get("foodNutrients", [])),
-                        reverse=True,
+        food = get_cached_food(ingredient)
+        if food is None:
+            if NUTRITION_BACKEND == "local":
+                foods = get_fdc_index().search(ingredient)
+            else:
+                params = {
+                    "query": ingredient,
+                    "api_key": USDA_API_KEY,
+                    "pageSize": 3,
+                }
+                try:
+                    response = get_with_retries_sync(
+                        requests.get, USDA_SEARCH_URL, deadline, params=params
                     )
-                    most_complete_food = sorted_foods[0]
+                except UpstreamError as e:
+                    print(f"Failed to retrieve data for {ingredient}: {e}")
+                    unresolved.append(ingredient)
+                    continue
+                foods = orjson.loads(response.content)["foods"]
+            food = select_food(ingredient, foods)
+            cache_food(ingredient, food)
+        if food:
+            nutrition_data[ingredient] = food
 
-                    serving_size = most_complete_food.get("servingSize")
-                    serving_size_unit = most_complete_food.get(
-                        "servingSizeUnit", ""
-                    )
+    return NutritionResults(nutrition_data, unresolved=unresolved)
 
-                    if serving_size is None:
-                        serving_size = 100
-                        serving_size_unit = "g"
-                    print(
-                        "Reminder: Raw ingredient data found "
-                        f"for {ingredient}. "
-                        "The nutrition calculation for this "
-                        "ingredient is based "
-                        "on the FNDDS database from USDA."
-                    )
 
-                else:
-                    print(
-                        "Reminder: No raw ingredient data "
-                        f"found for {ingredient}. "
-                        "General USDA nutrition facts search is used for "
-                        "nutrition calculation for this ingredient."
+def get_async_client():
+    """
+    Shared connection-pooled HTTP client for the running event loop, so
+    lookups reuse TLS connections across ingredients and requests.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=USDA_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=NUTRITION_CONCURRENCY,
+                max_keepalive_connections=NUTRITION_CONCURRENCY,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def food_from_abridged(food):
+    """
+    Search-result shaped food from a /foods response in abridged format.
+    That format has no serving size; see fetch_foods_by_id.
+    """
+    return {
+        "fdcId": food["fdcId"],
+        "description": food["description"],
+        "dataType": food["dataType"],
+        "foodNutrients": [
+            {
+                "nutrientNumber": nutrient.get("number"),
+                "nutrientName": nutrient["name"],
+                "value": nutrient["amount"],
+                "unitName": search_unit(nutrient.get("unitName")),
+            }
+            for nutrient in food.get("foodNutrients", [])
+            if nutrient.get("amount") is not None
+        ],
+    }
+
+
+async def fetch_foods_by_id(fdc_ids, client, deadline):
+    """
+    Foods by FDC id, in search-result shape, from USDA in bulk /foods
+    requests of up to FOODS_PER_REQUEST ids (or from the local index).
+    Ids USDA does not know are missing from the result. When
+    NUTRITION_NUTRIENTS selects at most 25 nutrients only those are
+    requested; with the default "all" the response is not trimmed.
+
+    The abridged format leaves out serving sizes, which branded foods
+    are scaled by, so those are then read from the full format of just
+    the branded foods.
+    """
+    if NUTRITION_BACKEND == "local":
+        foods = await asyncio.to_thread(get_fdc_index().get_foods, fdc_ids)
+        return {food["fdcId"]: food for food in foods}
+
+    body = {"format": "abridged"}
+    if REPORTED_NUTRIENTS is not None and \
+            len(REPORTED_NUTRIENTS) <= MAX_FOODS_NUTRIENTS:
+        body["nutrients"] = sorted(map(int, REPORTED_NUTRIENTS))
+
+    async def fetch_chunk(chunk, body):
+        response = await request_with_retries(
+            client,
+            "POST",
+            USDA_FOODS_URL,
+            deadline,
+            params={"api_key": USDA_API_KEY},
+            json={"fdcIds": chunk, **body},
+        )
+        return orjson.loads(response.content)
+
+    async def fetch_all(ids, body):
+        chunks = await asyncio.gather(*(
+            fetch_chunk(ids[i:i + FOODS_PER_REQUEST], body)
+            for i in range(0, len(ids), FOODS_PER_REQUEST)
+        ))
+        return [food for chunk in chunks for food in chunk]
+
+    foods = {
+        food["fdcId"]: food_from_abridged(food)
+        for food in await fetch_all(fdc_ids, body)
+    }
+    branded = [
+        fdc_id for fdc_id, food in foods.items()
+        if food["dataType"] == BRANDED
+    ]
+    if branded:
+        for food in await fetch_all(branded, {"format": "full"}):
+            if food.get("servingSize") is not None:
+                shaped = foods[food["fdcId"]]
+                shaped["servingSize"] = food["servingSize"]
+                shaped["servingSizeUnit"] = food.get("servingSizeUnit", "")
+    return foods
+
+
+async def fetch_nutrition_info(ingredients, client=None, on_result=None):
+    """
+    Async counterpart of get_nutrition_info: looks up all ingredients
+    concurrently (at most NUTRITION_CONCURRENCY at a time) over a shared
+    client, with the same food selection and output shape.
+
+    Ingredients are served from the nutrition cache first. Names the FDC
+    id index knows (directly, by alias or by spelling variant) are
+    fetched by id in bulk; only unknown names are searched, and the
+    chosen food is learned for next time. Lookups already in flight for
+    another request are joined rather than repeated. Transient USDA
+    failures are retried within USDA_LATENCY_BUDGET; ingredients that
+    still fail are listed in the result's ``unresolved`` and are retried
+    on the next call.
+
+    ``on_result(ingredient, food)`` is called as each distinct ingredient
+    is settled, with its record, None when USDA has no usable food, or
+    UNRESOLVED when its lookup failed.
+    """
+    client = client or get_async_client()
+    semaphore = asyncio.Semaphore(NUTRITION_CONCURRENCY)
+    deadline = lookup_deadline()
+
+    async def search(ingredient):
+        if NUTRITION_BACKEND == "local":
+            async with semaphore:
+                foods = await asyncio.to_thread(
+                    get_fdc_index().search, ingredient
+                )
+        else:
+            params = {
+                "query": ingredient, "api_key": USDA_API_KEY, "pageSize": 3
+            }
+            async with semaphore:
+                try:
+                    response = await request_with_retries(
+                        client, "GET", USDA_SEARCH_URL, deadline,
+                        params=params,
                     )
-                    non_fndds_foods = [
-                        food
-                        for food in data["foods"]
-                        if food.get("dataType") != "Survey (FNDDS)"
-                    ]
-
-                    if non_fndds_foods:
-                        sorted_foods = sorted(
-                            non_fndds_foods,
-                            key=lambda x: len(x.get("foodNutrients", [])),
-                            reverse=True,
-                        )
-                        most_complete_food = next(
-                            (
-                                food
-                                for food in sorted_foods
-                                if food.get("servingSize") is not None
-                            ),
-                            sorted_foods[0],
-                        )
-                        serving_size = most_complete_food.get("servingSize")
-                        serving_size_unit = most_complete_food.get(
-                            "servingSizeUnit", ""
-                        )
-
-                        if serving_size is None:
-                            serving_size = "N/A"
-                    else:
-                        print(
-                            "Warning: No nutrition data "
-                            f"available for {ingredient}. "
-                            "This ingredient will not be included "
-                            "in the nutrition facts calculation."
-                        )
-                        continue
-
-                nutrition_data[ingredient] = {
-                    "description": most_complete_food["description"],
-                    "dataType": most_complete_food["dataType"],
-                    "servingSize": serving_size,
-                    "servingSizeUnit": serving_size_unit,
-                    "nutrients": {
-                        nutrient["nutrientName"]: {
-                            "value": nutrient["value"],
-                            "unit": nutrient.get("unitName", ""),
-                        }
-                        for nutrient in most_complete_food["foodNutrients"]
-                    },
-                }
+                except UpstreamError as e:
+                    print(f"Failed to retrieve data for {ingredient}: {e}")
+                    return UNRESOLVED
+            foods = orjson.loads(response.content)["foods"]
+
+        choice = choose_food(ingredient, foods)
+        food = None if choice is None else food_record(*choice)
+        if choice is not None and "fdcId" in choice[0]:
+            fdc_id = choice[0]["fdcId"]
+            fdc_ids.learn(ingredient, fdc_id)
+            nutrition_cache.set(food_key(fdc_id), food)
+        cache_food(ingredient, food)
+        return food
+
+    def settle(ingredient, food):
+        results[ingredient] = food
+        if on_result is not None:
+            on_result(ingredient, food)
+
+    async def search_one(ingredient):
+        settle(ingredient, await nutrition_lookups.do(
+            normalize_ingredient(ingredient), search, ingredient
+        ))
+
+    async def search_all(names):
+        await asyncio.gather(*(search_one(ingredient) for ingredient in names))
+
+    # Ids this call fetches itself, in one bulk request; ids another
+    # request is already fetching are joined through nutrition_lookups
+    batch = []
+    bulk = None
+
+    async def fetch_batch():
+        async with semaphore:
+            return await fetch_foods_by_id(batch, client, deadline)
+
+    async def fetch_food(fdc_id):
+        nonlocal bulk
+        batch.append(fdc_id)
+        if bulk is None:
+            # Starts after every id of this call has joined the batch
+            bulk = asyncio.ensure_future(fetch_batch())
+        foods = await asyncio.shield(bulk)
+        return foods.get(fdc_id)
+
+    async def fetch_known(by_id):
+        found = await asyncio.gather(
+            *(
+                nutrition_lookups.do(("fdc", fdc_id), fetch_food, fdc_id)
+                for fdc_id in by_id
+            ),
+            return_exceptions=True,
+        )
+
+        # Foods that disappeared from FDC are searched again
+        missing = []
+        for (fdc_id, names), food in zip(by_id.items(), found):
+            if isinstance(food, UpstreamError):
+                print(f"Failed to retrieve food {fdc_id} by id: {food}")
+                for ingredient in names:
+                    settle(ingredient, UNRESOLVED)
+                continue
+            if isinstance(food, BaseException):
+                raise food
+            if food is None:
+                fdc_ids.forget(fdc_id)
+                missing.extend(names)
+                continue
+            record = select_food(names[0], [food])
+            nutrition_cache.set(food_key(fdc_id), record)
+            for ingredient in names:
+                cache_food(ingredient, record)
+                settle(ingredient, record)
+        if missing:
+            await search_all(missing)
+
+    # Duplicate ingredients are looked up once
+    unique_ingredients = list(dict.fromkeys(ingredients))
+    results = {}
+    by_id = {}
+    unknown = []
+    for ingredient in unique_ingredients:
+        food = get_cached_food(ingredient)
+        if food is not None:
+            settle(ingredient, food or None)
+            continue
+        fdc_id = fdc_ids.resolve(ingredient)
+        record = None if fdc_id is None else nutrition_cache.get(
+            food_key(fdc_id)
+        )
+        if record is not None:
+            cache_food(ingredient, record)
+            settle(ingredient, record)
+        elif fdc_id is not None:
+            by_id.setdefault(fdc_id, []).append(ingredient)
         else:
-            print(f"Failed to retrieve data for {ingredient}")
+            unknown.append(ingredient)
+
+    tasks = [search_all(unknown)]
+    if by_id:
+        tasks.append(fetch_known(by_id))
+    await asyncio.gather(*tasks)
 
-    return nutrition_data
+    foods = [results[ingredient] for ingredient in unique_ingredients]
+    return NutritionResults(
+        {
+            ingredient: food
+            for ingredient, food in zip(unique_ingredients, foods)
+            if food is not None and food is not UNRESOLVED
+        },
+        unresolved=[
+            ingredient
+            for ingredient, food in zip(unique_ingredients, foods)
+            if food is UNRESOLVED
+        ],
+    )
 
 
 def aggregate_nutrition_info_with_units(nutrition_info_dict):
@@ -0,0 +1,196 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from api.utils.memory import format_server_memory, server_memory
+
+# Worker processes forked by the pre-fork server
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", "0"))
+# Seconds between memory reports in the master's log (0 disables them)
+PREFORK_MEMORY_LOG_SECONDS = float(
+    os.getenv("PREFORK_MEMORY_LOG_SECONDS", "300")
+)
+# Workers that exit sooner than this after starting are restarted only
+# after a pause, so a crashing app does not fork in a tight loop
+MIN_WORKER_LIFETIME = 5
+
+
+def load_models(names=None):
+    """Load the models into the master before workers are forked."""
+    from api.utils.model_registry import registry
+
+    registry.warm_up(names)
+
+
+class PreforkServer:
+    """
+    Serves an ASGI app from ``workers`` processes forked from a master
+    that has already imported the app and loaded the models. Workers
+    share the model weights with the master copy-on-write instead of each
+    loading its own copy, so resident memory grows by each worker's
+    private pages rather than by a full set of weights.
+
+    The master binds the listening socket, which every worker accepts
+    from, then only supervises: it restarts workers that exit, stops them
+    on SIGTERM or SIGINT and logs per-worker RSS/PSS and the total.
+    Nothing answers on the port until the models are loaded, so /health
+    is unreachable while they download.
+
+    Prometheus metrics are kept per worker and /metrics is answered by
+    whichever worker accepts the scrape, so request counters and
+    latencies cover that worker only (cache and memory gauges are
+    per-worker too, except the server memory totals). Compare rates
+    across scrapes rather than absolute counts.
+    """
+
+    def __init__(self, app="api.service:app", host="0.0.0.0", port=9000,
+                 workers=2, preload=load_models, log_level="info",
+                 memory_log_seconds=None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload = preload
+        self.log_level = log_level
+        self.memory_log_seconds = (
+            PREFORK_MEMORY_LOG_SECONDS if memory_log_seconds is None
+            else memory_log_seconds
+        )
+        self.children = {}
+        self.should_exit = False
+        self.sock = None
+
+    def bind(self):
+        # asyncio only sets TCP_NODELAY on connections accepted from an
+        # IPPROTO_TCP socket; without it keep-alive responses written in
+        # two parts wait ~40 ms for the client's delayed ACK
+        sock = socket.socket(
+            socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP
+        )
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        # Port 0 binds any free port
+        self.port = sock.getsockname()[1]
+        self.sock = sock
+        return sock
+
+    def prepare(self):
+        """Import the app and load the models in the master."""
+        # Workers report the master's and each other's memory
+        os.environ["PREFORK_MASTER_PID"] = str(os.getpid())
+        if isinstance(self.app, str):
+            self.app = import_from_string(self.app)
+        if self.preload is not None:
+            self.preload()
+        # Move everything allocated so far out of the garbage collector's
+        # reach, so collections in the workers do not write to (and copy)
+        # the pages holding the models' Python objects
+        gc.collect()
+        gc.freeze()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self.run_worker()
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    def run_worker(self):
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        limit_torch_threads(self.workers)
+        config = uvicorn.Config(
+            self.app, lifespan="on", log_level=self.log_level
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def stop(self, *args):
+        self.should_exit = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        """Collect exited workers; returns how many exited."""
+        exited = 0
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                break
+            if pid == 0:
+                break
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            exited += 1
+            if not self.should_exit:
+                print(
+                    f"Worker {pid} exited with status "
+                    f"{os.waitstatus_to_exitcode(status)}; restarting"
+                )
+                if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                    time.sleep(MIN_WORKER_LIFETIME)
+        return exited
+
+    def log_memory(self):
+        print(format_server_memory(server_memory(os.getpid())))
+        sys.stdout.flush()
+
+    def serve(self):
+        self.prepare()
+        self.bind()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(
+            f"Pre-fork server on {self.host}:{self.port} "
+            f"with {self.workers} workers (master {os.getpid()})",
+            flush=True,
+        )
+        for _ in range(self.workers):
+            self.spawn()
+
+        # First report once the workers have started up
+        next_report = time.monotonic() + min(30, self.memory_log_seconds)
+        while self.children:
+            self.reap()
+            if self.should_exit:
+                time.sleep(0.1)
+                continue
+            while len(self.children) < self.workers:
+                self.spawn()
+            if self.memory_log_seconds and time.monotonic() >= next_report:
+                self.log_memory()
+                next_report = time.monotonic() + self.memory_log_seconds
+            time.sleep(0.5)
+        self.sock.close()
+
+
+def limit_torch_threads(workers):
+    """
+    Split the cores between workers, so N workers do not each start a
+    full-size torch thread pool.
+    """
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
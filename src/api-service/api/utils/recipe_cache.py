@@ -0,0 +1,96 @@
+import hashlib
+import os
+
+import orjson
+
+from api.utils.cache_utils import LRUCache
+from api.utils.metrics import RECIPE_CACHE_REQUESTS
+from api.utils.nutrition_cache import (
+    normalize_ingredient,
+    record_stamp,
+    record_stamps,
+)
+
+# Serialized /nutrition responses keyed by recipe. Entries are checked
+# against the stamps of the ingredient records they were built from,
+# which only live in this process, so there is no persistent tier.
+recipe_cache = LRUCache(
+    maxsize=int(os.getenv("RECIPE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("RECIPE_CACHE_TTL", str(24 * 3600))) or None,
+)
+
+
+class CachedRecipe:
+    """A response body with its ETag and the ingredient record stamps."""
+
+    __slots__ = ("body", "etag", "stamps")
+
+    def __init__(self, body, stamps=None):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.stamps = stamps
+
+
+def recipe_key(ingredients):
+    """
+    Cache key for a recipe: the normalized names of its distinct
+    ingredients, sorted. Spellings are deduplicated before normalizing,
+    since "Milk" and "milk" in one recipe are both counted while a
+    repeated "Milk" is counted once.
+
+    Recipes listing the same ingredients in another order share an
+    entry, so their nutrients come back in the order of the first one.
+    """
+    return tuple(sorted(
+        normalize_ingredient(ingredient)
+        for ingredient in dict.fromkeys(ingredients)
+    ))
+
+
+def get_cached_recipe(key):
+    """
+    The cached response for a recipe key, or None when there is none or
+    a record of one of its ingredients changed since it was built.
+    """
+    recipe = recipe_cache.get(key)
+    if recipe is None:
+        RECIPE_CACHE_REQUESTS.labels("miss").inc()
+        return None
+    for ingredient, stamp in zip(key, recipe.stamps):
+        stamped = record_stamps.get(ingredient)
+        if stamped is None or stamped[0] != stamp:
+            recipe_cache.delete(key)
+            RECIPE_CACHE_REQUESTS.labels("stale").inc()
+            return None
+    RECIPE_CACHE_REQUESTS.labels("hit").inc()
+    return recipe
+
+
+def cache_recipe(key, ingredients, nutrition_data, response):
+    """
+    Serialize a response and cache it under ``key``. It is only cached
+    when every ingredient's record in ``nutrition_data`` is still the
+    one in the nutrition cache, so a record replaced during the lookup
+    cannot be paired with the newer stamp.
+    """
+    recipe = CachedRecipe(
+        orjson.dumps(response, option=orjson.OPT_SERIALIZE_NUMPY)
+    )
+    stamps = {}
+    for ingredient in dict.fromkeys(ingredients):
+        stamp = record_stamp(ingredient, nutrition_data.get(ingredient))
+        if stamp is None:
+            return recipe
+        # Spellings normalizing alike share one record and stamp
+        stamps[normalize_ingredient(ingredient)] = stamp
+    recipe.stamps = tuple(stamps[name] for name in key)
+    recipe_cache.set(key, recipe)
+    return recipe
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header lists ``etag`` (or is "*")."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
@@ -0,0 +1,45 @@
+import asyncio
+import weakref
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key: while a call for a key is
+    running, further callers await the same task instead of starting their
+    own, and all of them receive its result or exception.
+
+    The call runs as its own task, so a caller being cancelled (e.g. a
+    client disconnecting) does not cancel it for the others.
+    """
+
+    def __init__(self, coalesced_counter=None):
+        self.coalesced_counter = coalesced_counter
+        self.coalesced = 0
+        # Tasks belong to one event loop, so in-flight calls are per loop
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key, fn, *args):
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        task = calls.get(key)
+        if task is None:
+            task = loop.create_task(fn(*args))
+            calls[key] = task
+            task.add_done_callback(lambda done: self._forget(calls, key, done))
+        else:
+            self.coalesced += 1
+            if self.coalesced_counter is not None:
+                self.coalesced_counter.inc()
+        return await asyncio.shield(task)
+
+    def in_flight(self):
+        calls = self._calls.get(asyncio.get_running_loop(), {})
+        return len(calls)
+
+    @staticmethod
+    def _forget(calls, key, task):
+        if calls.get(key) is task:
+            del calls[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
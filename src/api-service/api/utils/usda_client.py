@@ -0,0 +1,169 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+import requests
+
+from api.utils.metrics import USDA_REQUESTS, USDA_RETRIES
+
+# Per-request timeout in seconds, capped by the remaining latency budget
+USDA_TIMEOUT = float(os.getenv("USDA_TIMEOUT", "10"))
+# Sustained USDA requests per second and burst size. The default matches
+# the API's quota of 1000 requests per hour per key; 0 disables limiting.
+USDA_RATE_LIMIT = float(os.getenv("USDA_RATE_LIMIT", str(1000 / 3600)))
+USDA_RATE_BURST = float(os.getenv("USDA_RATE_BURST", "50"))
+# Retries of transient failures, with jittered exponential backoff
+USDA_MAX_RETRIES = int(os.getenv("USDA_MAX_RETRIES", "3"))
+USDA_BACKOFF_BASE = float(os.getenv("USDA_BACKOFF_BASE", "0.25"))
+USDA_BACKOFF_MAX = float(os.getenv("USDA_BACKOFF_MAX", "4"))
+# Seconds a nutrition request may spend on USDA lookups, waits included
+USDA_LATENCY_BUDGET = float(os.getenv("USDA_LATENCY_BUDGET", "8"))
+
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(RuntimeError):
+    """Raised when a USDA request failed and will not be retried."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by the sync and async clients (and by
+    every event loop in the process). A caller reserves a token and then
+    waits until it becomes available, so waiters are served in order.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        Take a token and return the seconds to wait before using it, or
+        None without taking one if that wait would exceed ``max_wait``.
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated) * self.rate,
+            )
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    async def acquire(self, max_wait=None):
+        wait = self.reserve(max_wait)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait is not None
+
+    def acquire_sync(self, max_wait=None):
+        wait = self.reserve(max_wait)
+        if wait:
+            time.sleep(wait)
+        return wait is not None
+
+
+usda_bucket = TokenBucket(USDA_RATE_LIMIT, USDA_RATE_BURST)
+
+
+def lookup_deadline():
+    """Monotonic time by which a request's USDA lookups must finish."""
+    return time.monotonic() + USDA_LATENCY_BUDGET
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Full-jitter exponential backoff, or the server's Retry-After in
+    seconds when it asks for longer.
+    """
+    delay = random.uniform(
+        0, min(USDA_BACKOFF_MAX, USDA_BACKOFF_BASE * 2 ** attempt)
+    )
+    try:
+        return max(delay, float(retry_after))
+    except (TypeError, ValueError):
+        return delay
+
+
+def _next_delay(attempt, deadline, reason, retry_after=None):
+    """Delay before the next attempt, or UpstreamError if out of budget."""
+    delay = backoff_delay(attempt, retry_after)
+    if attempt >= USDA_MAX_RETRIES or time.monotonic() + delay >= deadline:
+        raise UpstreamError(reason)
+    USDA_RETRIES.inc()
+    return delay
+
+
+def _timeout(deadline):
+    return max(0.001, min(USDA_TIMEOUT, deadline - time.monotonic()))
+
+
+def _check_status(status_code):
+    """True for success; raise for failures that are not worth retrying."""
+    USDA_REQUESTS.labels(str(status_code)).inc()
+    if status_code == 200:
+        return True
+    if status_code not in TRANSIENT_STATUSES:
+        raise UpstreamError(f"USDA returned {status_code}")
+    return False
+
+
+async def request_with_retries(client, method, url, deadline, **kwargs):
+    """
+    Send a USDA request through the rate limiter, retrying 429 and 5xx
+    responses and connection errors until ``deadline``. Returns the
+    successful response or raises UpstreamError.
+    """
+    for attempt in range(USDA_MAX_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        if not await usda_bucket.acquire(max_wait=remaining):
+            raise UpstreamError("USDA rate limit leaves no time in budget")
+        try:
+            response = await client.request(
+                method, url, timeout=_timeout(deadline), **kwargs
+            )
+        except httpx.TransportError as e:
+            USDA_REQUESTS.labels("error").inc()
+            reason, retry_after = f"USDA request failed: {e!r}", None
+        else:
+            if _check_status(response.status_code):
+                return response
+            reason = f"USDA returned {response.status_code}"
+            retry_after = response.headers.get("retry-after")
+        delay = _next_delay(attempt, deadline, reason, retry_after)
+        await asyncio.sleep(delay)
+
+
+def get_with_retries_sync(get, url, deadline, **kwargs):
+    """
+    Blocking counterpart of request_with_retries, sending GET requests
+    with ``get`` (e.g. requests.get).
+    """
+    for attempt in range(USDA_MAX_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        if not usda_bucket.acquire_sync(max_wait=remaining):
+            raise UpstreamError("USDA rate limit leaves no time in budget")
+        try:
+            response = get(url, timeout=_timeout(deadline), **kwargs)
+        except requests.RequestException as e:
+            USDA_REQUESTS.labels("error").inc()
+            reason, retry_after = f"USDA request failed: {e!r}", None
+        else:
+            if _check_status(response.status_code):
+                return response
+            reason = f"USDA returned {response.status_code}"
+            retry_after = response.headers.get("retry-after")
+        time.sleep(_next_delay(attempt, deadline, reason, retry_after))
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolSaturatedError(RuntimeError):
+    """
+    Raised when the worker pool already holds as many jobs as it accepts.
+    """
+
+
+class WorkerPool:
+    """
+    Runs blocking model calls (OCR, NER) in a thread pool so the event
+    loop stays free to serve other requests. The models are shared with
+    the rest of the process; to use more processes, run the pre-fork
+    server (PREFORK_WORKERS), whose workers share one loaded copy.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue``
+    more wait for a worker; anything beyond that is rejected with
+    ``PoolSaturatedError`` instead of piling up in memory.
+    """
+
+    def __init__(self, kind="thread", max_workers=None, max_queue=16):
+        if kind == "process":
+            # Pool processes loaded their own models, which the registry
+            # warm-up, /ready and the stage metrics never saw
+            raise ValueError(
+                "Process worker pools are not supported; "
+                "set PREFORK_WORKERS instead."
+            )
+        if kind != "thread":
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Number of jobs currently running or waiting for a worker."""
+        return self._pending
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="model-worker",
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Run ``fn(*args)`` in the pool and await its result."""
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise PoolSaturatedError(
+                    "Model worker pool is saturated; try again later."
+                )
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def create_pool_from_env():
+    """
+    Build the model worker pool from environment variables:
+    MODEL_POOL_KIND (only "thread"), MODEL_POOL_WORKERS
+    (defaults to the CPU count) and MODEL_POOL_QUEUE.
+    """
+    return WorkerPool(
+        kind=os.getenv("MODEL_POOL_KIND", "thread"),
+        max_workers=int(os.getenv("MODEL_POOL_WORKERS", "0")) or None,
+        max_queue=int(os.getenv("MODEL_POOL_QUEUE", "16")),
+    )
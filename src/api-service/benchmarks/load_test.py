@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+
+"""
+Load test the api-service: start it against a local fake USDA API, drive
+concurrent requests with synthetic receipts and recipes, and report
+latency percentiles, throughput and server memory per endpoint and
+concurrency level.
+
+The service runs in a subprocess under the pre-fork server, so memory
+covers the master and every worker. With --stand-in-models, OCR and NER
+are replaced by lookups of the receipts' known text taking
+--model-latency-ms each, so the test runs offline and measures the
+service around the models rather than the models themselves.
+
+Requests come from a single asyncio client process, which saturates at a
+few hundred requests per second; compare runs on the same machine.
+
+Usage (from src/api-service):
+    python -m benchmarks.load_test --stand-in-models \\
+        --concurrency 1 8 32 --duration 10 --output load.json
+    python -m benchmarks.load_test --stand-in-models --compare load.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.receipts import INGREDIENTS, make_corpus
+
+ENDPOINTS = ("ocr", "nutrition", "scan", "ingredients")
+MIB = 1024 * 1024
+
+
+class StandInPage:
+    def __init__(self, text):
+        self.text = text
+
+    def render(self):
+        return self.text
+
+
+class StandInDocument:
+    def __init__(self, texts):
+        self.pages = [StandInPage(text) for text in texts]
+
+    def render(self):
+        return "\n\n".join(page.render() for page in self.pages)
+
+
+class StandInOCR:
+    """Returns the known text of each receipt after ``latency`` seconds."""
+
+    def __init__(self, corpus, latency):
+        from api.utils.image_utils import preprocess_image
+
+        self.latency = latency
+        # Keyed by the decoded page, since that is what the model gets
+        self.texts = {
+            page_key(preprocess_image(image)): receipt_text(items)
+            for image, items in corpus
+        }
+
+    def __call__(self, pages):
+        time.sleep(self.latency * len(pages))
+        return StandInDocument(
+            self.texts.get(page_key(page), "") for page in pages
+        )
+
+
+class StandInTokenizer:
+    def __call__(self, texts, add_special_tokens=True):
+        return {"input_ids": [text.split() for text in texts]}
+
+
+class StandInNER:
+    """Tags known ingredient names after ``latency`` seconds per batch."""
+
+    tokenizer = StandInTokenizer()
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.known = {name.lower() for name in INGREDIENTS}
+
+    def __call__(self, texts, **kwargs):
+        time.sleep(self.latency)
+        results = []
+        for text in texts:
+            entities, start = [], 0
+            for part in text.split(", "):
+                if part.lower() in self.known:
+                    entities.append({
+                        # Above the cutoff of convert_ner_entities_to_list
+                        "entity_group": "FOOD", "score": 0.999,
+                        "start": start, "end": start + len(part),
+                    })
+                start += len(part) + 2
+            results.append(entities)
+        return results
+
+
+def page_key(page):
+    return hashlib.sha256(page.tobytes()).hexdigest()
+
+
+def receipt_text(items):
+    return "\n".join(f"{item} 3.99" for item in items)
+
+
+def serve(args):
+    """Run the service under the pre-fork server (in the subprocess)."""
+    from api.utils.prefork import PreforkServer, load_models
+
+    def load_stand_in_models():
+        from api.utils.model_registry import registry
+
+        corpus = make_corpus(args.receipts, seed=args.seed)
+        latency = args.model_latency_ms / 1000
+        registry.models["ocr"] = StandInOCR(corpus, latency)
+        registry.models["ner"] = StandInNER(latency)
+
+    PreforkServer(
+        host="127.0.0.1", port=0, workers=args.workers,
+        preload=load_stand_in_models if args.stand_in_models else load_models,
+        log_level="warning", memory_log_seconds=0,
+    ).serve()
+
+
+def start_server(args, usda_url, directory):
+    env = dict(os.environ)
+    env.update({
+        "USDA_API_URL": f"{usda_url}/fdc/v1",
+        "USDA_API_KEY": "load-test",
+        "USDA_RATE_LIMIT": "0",
+        "FDC_ID_INDEX_PATH": os.path.join(directory, "fdc_ids.sqlite"),
+        "MODEL_WARMUP": "0",
+    })
+    if args.no_cache:
+        for prefix in ("OCR", "NER", "NUTRITION", "RECIPE"):
+            env[f"{prefix}_CACHE_SIZE"] = "0"
+    command = [sys.executable, "-m", "benchmarks.load_test", "--serve"]
+    command += ["--workers", str(args.workers), "--receipts",
+                str(args.receipts), "--seed", str(args.seed),
+                "--model-latency-ms", str(args.model_latency_ms)]
+    if args.stand_in_models:
+        command.append("--stand-in-models")
+    server = subprocess.Popen(
+        command, env=env, stdout=subprocess.PIPE, text=True
+    )
+    # Wait for "Pre-fork server on 127.0.0.1:<port> with ..."
+    for line in server.stdout:
+        if line.startswith("Pre-fork server on"):
+            # Keep reading what the workers print, or they block once
+            # the pipe is full
+            threading.Thread(
+                target=drain, args=(server.stdout,), daemon=True
+            ).start()
+            return server, int(line.split(":")[1].split()[0])
+    server.wait()
+    server.stdout.close()
+    raise RuntimeError("The api-service failed to start")
+
+
+def drain(stream):
+    for _ in stream:
+        pass
+    stream.close()
+
+
+class MemorySampler:
+    """Peak total PSS and RSS of the server while it is running."""
+
+    def __init__(self, master_pid, interval=0.2):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak_pss = self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        from api.utils.memory import server_memory
+
+        while True:
+            report = server_memory(self.master_pid)
+            self.peak_pss = max(self.peak_pss, report["total_pss"])
+            self.peak_rss = max(self.peak_rss, report["total_rss"])
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def make_requests(corpus):
+    """One request function per endpoint taking (client, request number)."""
+    recipes = [items for _, items in corpus]
+
+    def found_ingredients(response):
+        # An empty result means the models found nothing, so the run would
+        # only measure the empty path (and scans would skip nutrition)
+        if response.status_code == 200 and \
+                not response.json()["ingredients"]:
+            raise RuntimeError(
+                f"{response.request.url.path} found no ingredients"
+            )
+        return response
+
+    def upload(path):
+        async def request(client, n):
+            image, _ = corpus[n % len(corpus)]
+            return found_ingredients(await client.post(
+                path, files={"file": ("receipt.png", image, "image/png")}
+            ))
+        return request
+
+    def nutrition(client, n):
+        return client.post(
+            "/api/nutrition", json={"ingredients": recipes[n % len(recipes)]}
+        )
+
+    async def ingredients(client, n):
+        text = receipt_text(recipes[n % len(recipes)])
+        return found_ingredients(
+            await client.post("/api/ingredients", json={"text": text})
+        )
+
+    return {
+        "ocr": upload("/api/ocr"),
+        "nutrition": nutrition,
+        "scan": upload("/api/scan"),
+        "ingredients": ingredients,
+    }
+
+
+async def drive(client, request, concurrency, duration):
+    """
+    Send requests from ``concurrency`` clients for ``duration`` seconds;
+    returns (latency, status) per request and the elapsed time.
+    """
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    async def user(n):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = (await request(client, n)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            samples.append((time.perf_counter() - start, status))
+            n += concurrency
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed, memory):
+    statuses = Counter(status for _, status in samples)
+    ok = sorted(latency * 1000 for latency, status in samples
+                if status == 200)
+    stats = {
+        "requests": len(samples),
+        "ok": len(ok),
+        "rejected": statuses[503],
+        "errors": len(samples) - len(ok) - statuses[503],
+        "statuses": {str(status): n for status, n in statuses.items()},
+        "rps": len(ok) / elapsed,
+        "peak_pss_mb": memory.peak_pss / MIB,
+        "peak_rss_mb": memory.peak_rss / MIB,
+    }
+    if len(ok) >= 2:
+        cuts = statistics.quantiles(ok, n=100, method="inclusive")
+        stats.update({
+            "p50_ms": cuts[49], "p95_ms": cuts[94], "p99_ms": cuts[98],
+            "mean_ms": statistics.fmean(ok), "max_ms": ok[-1],
+        })
+    return stats
+
+
+async def run_load(args, port, master_pid, corpus):
+    requests = make_requests(corpus)
+    results = {}
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", timeout=args.timeout,
+        limits=httpx.Limits(max_connections=max(args.concurrency)),
+    ) as client:
+        for endpoint in args.endpoints:
+            results[endpoint] = {}
+            # Untimed pass so first-use costs do not skew the numbers
+            await drive(client, requests[endpoint], 1, args.warmup)
+            for concurrency in args.concurrency:
+                with MemorySampler(master_pid) as memory:
+                    samples, elapsed = await drive(
+                        client, requests[endpoint], concurrency,
+                        args.duration,
+                    )
+                stats = summarize(samples, elapsed, memory)
+                results[endpoint][str(concurrency)] = stats
+                print(format_stats(endpoint, concurrency, stats))
+    return results
+
+
+def format_stats(endpoint, concurrency, stats):
+    latency = "no successful requests"
+    if "p50_ms" in stats:
+        latency = (
+            f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+            f"p99 {stats['p99_ms']:.1f} ms"
+        )
+    return (
+        f"{endpoint:>11} x{concurrency:<3} {stats['rps']:8.1f} req/s, "
+        f"{latency}, {stats['rejected']} rejected, "
+        f"{stats['errors']} errors, peak PSS {stats['peak_pss_mb']:.0f} MiB"
+    )
+
+
+def compare(results, baseline):
+    """Print throughput and p95 changes against an earlier run."""
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for endpoint, levels in results.items():
+        for concurrency, stats in levels.items():
+            before = baseline["results"].get(endpoint, {}).get(concurrency)
+            if not before or "p95_ms" not in before or "p95_ms" not in stats:
+                continue
+            rps = (stats["rps"] / before["rps"] - 1) * 100
+            p95 = (stats["p95_ms"] / before["p95_ms"] - 1) * 100
+            print(
+                f"{endpoint:>11} x{concurrency:<3} req/s {rps:+.1f}%, "
+                f"p95 {p95:+.1f}%"
+            )
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="api-service load test")
+    parser.add_argument(
+        "--endpoints", nargs="+", default=["ocr", "nutrition"],
+        choices=ENDPOINTS,
+    )
+    parser.add_argument(
+        "--concurrency", nargs="+", type=int, default=[1, 8, 32]
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10,
+        help="Seconds of load per endpoint and concurrency level",
+    )
+    parser.add_argument("--warmup", type=float, default=1)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--receipts", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--stand-in-models", action="store_true",
+        help="Replace OCR and NER with offline stand-ins",
+    )
+    parser.add_argument(
+        "--model-latency-ms", type=float, default=50,
+        help="Time each stand-in model call takes",
+    )
+    parser.add_argument(
+        "--usda-latency-ms", type=float, default=50,
+        help="Response time of the fake USDA API",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Disable the OCR, NER, nutrition and recipe caches",
+    )
+    parser.add_argument("--output", help="Write results to a JSON file")
+    parser.add_argument(
+        "--compare", help="Results JSON of an earlier run to compare with"
+    )
+    parser.add_argument("--serve", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    # The fake USDA API lives in tests/ so tests and benchmarks share it
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tests"))
+    from fake_usda import FakeUSDA, serve as serve_fake
+
+    corpus = make_corpus(args.receipts, seed=args.seed)
+    fake = FakeUSDA(latency=args.usda_latency_ms / 1000)
+    with serve_fake(fake.app) as usda_url, \
+            tempfile.TemporaryDirectory() as directory:
+        server, port = start_server(args, usda_url, directory)
+        try:
+            results = asyncio.run(run_load(args, port, server.pid, corpus))
+        finally:
+            server.terminate()
+            server.wait()
+            server.stdout.close()
+
+    output = {
+        "commit": current_commit(),
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "compare", "serve")
+        },
+        "usda_requests": fake.requests + len(fake.bulk_requests),
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
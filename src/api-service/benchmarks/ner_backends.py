@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Compare latency and output parity of the NER backends.
+
+Usage (from src/api-service):
+    python -m benchmarks.ner_backends --repeat 20
+"""
+
+import argparse
+import copy
+import json
+import os
+import statistics
+import time
+
+from api.utils.model_registry import (
+    NER_BACKENDS,
+    NER_MODEL_NAME,
+    build_ner_pipeline,
+)
+from api.utils.ner_utils import convert_ner_entities_to_list
+
+CORPUS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "tests", "data",
+    "ner_corpus.txt",
+)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def time_backend(ner_pipeline, corpus, repeat):
+    # One untimed pass so lazy initialisation does not skew the numbers
+    ner_pipeline(corpus[0], aggregation_strategy="simple")
+    latencies = []
+    outputs = []
+    for _ in range(repeat):
+        for text in corpus:
+            start = time.perf_counter()
+            entities = ner_pipeline(text, aggregation_strategy="simple")
+            latencies.append((time.perf_counter() - start) * 1000)
+            outputs.append(convert_ner_entities_to_list(text, entities))
+    return latencies, outputs[:len(corpus)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NER backend benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+    with open(CORPUS_PATH) as f:
+        corpus = [line.strip() for line in f if line.strip()]
+    tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_NAME)
+    model = AutoModelForTokenClassification.from_pretrained(NER_MODEL_NAME)
+
+    results = {}
+    reference = None
+    for backend in NER_BACKENDS:
+        ner_pipeline = build_ner_pipeline(
+            copy.deepcopy(model), tokenizer, backend
+        )
+        latencies, outputs = time_backend(ner_pipeline, corpus, args.repeat)
+        if reference is None:
+            reference = outputs
+        results[backend] = {
+            "mean_ms": statistics.mean(latencies),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "mismatches": sum(a != b for a, b in zip(outputs, reference)),
+        }
+
+    for backend, stats in results.items():
+        print(
+            f"{backend:>10}: mean {stats['mean_ms']:.1f} ms, "
+            f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+            f"{stats['mismatches']}/{len(corpus)} texts differ"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+"""
+Compare aggregate_nutrition_info_with_units with the vectorized
+aggregation on synthetic recipes, and check the outputs are identical.
+
+Usage (from src/api-service):
+    python -m benchmarks.nutrient_aggregation --ingredients 5 15 30
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import timeit
+
+from api.utils.nutrient_vectors import (
+    COMMON_NUTRIENTS,
+    aggregate_nutrition_batch,
+    aggregate_nutrition_vectors,
+)
+from api.utils.nutrition_utils import aggregate_nutrition_info_with_units
+
+UNITS = ["G", "MG", "UG", "KCAL"]
+
+
+def make_record(rng, n_nutrients):
+    names = rng.sample(COMMON_NUTRIENTS, n_nutrients)
+    return {
+        "description": "Synthetic food",
+        "dataType": "Survey (FNDDS)",
+        "servingSize": rng.choice([100, 28, 85.5, 240, 13.3]),
+        "servingSizeUnit": "g",
+        "nutrients": {
+            name: {
+                "value": round(rng.uniform(0, 500), 3),
+                "unit": rng.choice(UNITS),
+            }
+            for name in names
+        },
+    }
+
+
+def make_recipe(rng, n_ingredients, n_nutrients):
+    # Distinct names per recipe, like distinct cached USDA records
+    recipe_id = rng.randrange(1 << 30)
+    return {
+        f"ingredient {recipe_id}-{i}": make_record(rng, n_nutrients)
+        for i in range(n_ingredients)
+    }
+
+
+def best_of(fn, number, repeat=5):
+    # The scalar version prints nothing for gram-based records, but keep
+    # both quiet in case a record cannot be scaled
+    with contextlib.redirect_stdout(io.StringIO()):
+        times = timeit.repeat(fn, number=number, repeat=repeat)
+    return min(times) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nutrient aggregation")
+    parser.add_argument(
+        "--ingredients", type=int, nargs="+", default=[5, 15, 30]
+    )
+    parser.add_argument("--nutrients", type=int, default=60)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--output", help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    results = {}
+    for n in args.ingredients:
+        recipe = make_recipe(rng, n, args.nutrients)
+        batch = [
+            make_recipe(rng, n, args.nutrients) for _ in range(args.batch)
+        ]
+        if aggregate_nutrition_vectors(recipe) != \
+                aggregate_nutrition_info_with_units(recipe):
+            raise AssertionError(f"Outputs differ for {n} ingredients")
+
+        results[n] = {
+            "dict_us": best_of(
+                lambda: aggregate_nutrition_info_with_units(recipe),
+                args.number,
+            ),
+            "vector_us": best_of(
+                lambda: aggregate_nutrition_vectors(recipe), args.number
+            ),
+            "dict_batch_us": best_of(
+                lambda: [
+                    aggregate_nutrition_info_with_units(r) for r in batch
+                ],
+                max(1, args.number // args.batch),
+            ),
+            "vector_batch_us": best_of(
+                lambda: aggregate_nutrition_batch(batch),
+                max(1, args.number // args.batch),
+            ),
+        }
+
+    for n, stats in results.items():
+        print(
+            f"{n:>3} ingredients: dict {stats['dict_us']:.0f} us, "
+            f"vector {stats['vector_us']:.0f} us; "
+            f"batch of {args.batch}: dict {stats['dict_batch_us']:.0f} us, "
+            f"vector {stats['vector_batch_us']:.0f} us"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
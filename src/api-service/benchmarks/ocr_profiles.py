@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the OCR profiles on synthetic receipts: per-stage latency,
+peak memory and ingredient recall.
+
+Each profile runs in its own process so peak RSS is measured per profile.
+
+Usage (from src/api-service):
+    python -m benchmarks.ocr_profiles --receipts 20 --ner
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import statistics
+import time
+
+from benchmarks.receipts import make_corpus
+
+
+def add_stage_timer(module, stage, timings):
+    """Record the wall time of every forward call of ``module``."""
+    started = {}
+
+    def before(*args):
+        started[stage] = time.perf_counter()
+
+    def after(*args):
+        timings[stage].append(time.perf_counter() - started[stage])
+
+    module.register_forward_pre_hook(before)
+    module.register_forward_hook(after)
+
+
+def recall(expected, found):
+    found = " ".join(found).lower()
+    return sum(item.lower() in found for item in expected) / len(expected)
+
+
+def run_profile(profile, corpus, with_ner):
+    from api.routers.ocr import clean_ocr_text
+    from api.utils.image_utils import preprocess_image
+    from api.utils.model_registry import build_ocr_model, load_ner_pipeline
+    from api.utils.ner_utils import convert_ner_entities_to_list
+
+    start = time.perf_counter()
+    ocr_model = build_ocr_model(profile)
+    ner_pipeline = load_ner_pipeline() if with_ner else None
+    load_seconds = time.perf_counter() - start
+
+    timings = {
+        stage: [] for stage in ("decode", "detection", "recognition",
+                                "cleanup", "ner")
+    }
+    add_stage_timer(ocr_model.det_predictor, "detection", timings)
+    add_stage_timer(ocr_model.reco_predictor, "recognition", timings)
+
+    ocr_recall, ner_recall = [], []
+    for image_bytes, items in corpus:
+        # Decode as the service does, so the stage matches production
+        start = time.perf_counter()
+        image_array = preprocess_image(image_bytes)
+        timings["decode"].append(time.perf_counter() - start)
+
+        text = ocr_model([image_array]).render()
+
+        start = time.perf_counter()
+        result_string = clean_ocr_text(text)
+        timings["cleanup"].append(time.perf_counter() - start)
+        ocr_recall.append(recall(items, [result_string]))
+
+        if ner_pipeline is not None:
+            start = time.perf_counter()
+            entities = ner_pipeline(
+                result_string, aggregation_strategy="simple"
+            )
+            ingredients = convert_ner_entities_to_list(
+                result_string, entities
+            )
+            timings["ner"].append(time.perf_counter() - start)
+            ner_recall.append(recall(items, ingredients))
+
+    return {
+        "load_seconds": load_seconds,
+        "peak_rss_mb": resource.getrusage(
+            resource.RUSAGE_SELF
+        ).ru_maxrss / 1024,
+        "stage_ms": {
+            stage: statistics.mean(values) * 1000
+            for stage, values in timings.items() if values
+        },
+        "ocr_recall": statistics.mean(ocr_recall),
+        "ner_recall": statistics.mean(ner_recall) if ner_recall else None,
+    }
+
+
+def main():
+    from api.utils.model_registry import OCR_PROFILES
+
+    parser = argparse.ArgumentParser(description="OCR profile benchmark")
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(OCR_PROFILES),
+        choices=list(OCR_PROFILES),
+    )
+    parser.add_argument("--receipts", type=int, default=10)
+    parser.add_argument(
+        "--ner", action="store_true",
+        help="Also run NER and report ingredient-extraction recall",
+    )
+    parser.add_argument("--output", help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.receipts)
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for profile in args.profiles:
+        with context.Pool(1) as pool:
+            results[profile] = pool.apply(
+                run_profile, (profile, corpus, args.ner)
+            )
+
+        stats = results[profile]
+        stages = ", ".join(
+            f"{stage} {ms:.1f} ms" for stage, ms in stats["stage_ms"].items()
+        )
+        print(
+            f"{profile:>9}: load {stats['load_seconds']:.1f}s, "
+            f"peak RSS {stats['peak_rss_mb']:.0f} MB, "
+            f"OCR recall {stats['ocr_recall']:.2f}, "
+            f"NER recall {stats['ner_recall']}\n           {stages}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Synthetic grocery receipt images with known ingredient lists, used by the
+benchmarks so they run without real customer photos.
+"""
+
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+INGREDIENTS = [
+    "Bananas", "Whole Milk", "Brown Eggs", "Sourdough Bread",
+    "Chicken Breast", "Jasmine Rice", "Broccoli", "Garlic", "Butter",
+    "Flour", "Sugar", "Tomatoes", "Yellow Onion", "Basil", "Olive Oil",
+    "Ground Beef", "Cheddar Cheese", "Tortillas", "Sour Cream", "Salmon",
+    "Lemons", "Asparagus", "Greek Yogurt", "Blueberries", "Honey", "Oats",
+    "Spinach", "Feta Cheese", "Bell Pepper", "Cucumber", "Spaghetti",
+    "Parmesan", "Potatoes", "Carrots", "Celery", "Tofu", "Soy Sauce",
+    "Ginger", "Avocado", "Limes", "Cilantro", "Black Beans",
+]
+
+
+def make_receipt(seed, n_items=8, width=600, scale=1.0):
+    """
+    Render a receipt with ``n_items`` priced ingredients and return the
+    PNG bytes together with the ingredient names printed on it.
+    ``scale`` enlarges the image to mimic high-resolution phone photos.
+    """
+    rng = random.Random(seed)
+    items = rng.sample(INGREDIENTS, n_items)
+    font = ImageFont.load_default(size=24)
+    line_height = 36
+    lines = ["FRESH MARKET", "Store #0421", ""]
+    lines += [f"{item:<22} {rng.uniform(0.5, 12):6.2f}" for item in items]
+    lines += ["", f"SUBTOTAL {rng.uniform(20, 80):.2f}", "THANK YOU"]
+
+    image = Image.new("RGB", (width, line_height * (len(lines) + 2)), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((30, line_height * (i + 1)), line, fill="black", font=font)
+    if scale != 1.0:
+        image = image.resize(
+            (int(image.width * scale), int(image.height * scale))
+        )
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue(), items
+
+
+def make_corpus(size=10, seed=0, **kwargs):
+    return [make_receipt(seed + i, **kwargs) for i in range(size)]
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+Measure what a USDA nutrition lookup costs with and without trimming:
+response bytes (raw and gzipped, as sent over the wire), JSON parse time
+with json and orjson, and the memory held by cached nutrition records as
+nested dicts versus FoodRecord with every nutrient or only the label set.
+
+Trimming is opt-in: with the default NUTRITION_NUTRIENTS=all, lookups
+cost what the "all nutrients" rows show and only FoodRecord and orjson
+save anything. The "label nutrients" rows are NUTRITION_NUTRIENTS=label.
+
+Payloads are synthetic but shaped like real FoodData Central responses:
+FNDDS foods with ~65 nutrients, search results with their derivation and
+source fields, /foods in abridged format with and without ``nutrients``.
+
+Usage (from src/api-service):
+    python -m benchmarks.usda_payloads --records 4096
+"""
+
+import argparse
+import gc
+import gzip
+import json
+import random
+import timeit
+import tracemalloc
+
+import orjson
+
+from api.utils.food_record import LABEL_NUTRIENTS, FoodRecord
+from api.utils.nutrient_vectors import COMMON_NUTRIENTS
+from api.utils.nutrition_utils import FOODS_PER_REQUEST
+
+UNITS = ["G", "MG", "UG", "KCAL"]
+NUMBERS = {name: number for number, name in LABEL_NUTRIENTS.items()}
+
+
+def make_food(rng, fdc_id):
+    """FNDDS food as the search endpoint returns it."""
+    return {
+        "fdcId": fdc_id,
+        "description": f"Synthetic food {fdc_id}, cooked",
+        "commonNames": "",
+        "additionalDescriptions": "",
+        "dataType": "Survey (FNDDS)",
+        "foodCode": rng.randrange(10_000_000, 99_999_999),
+        "publishedDate": "2020-10-30",
+        "foodCategory": "Vegetables, NFS",
+        "foodCategoryId": rng.randrange(1, 10_000),
+        "allHighlightFields": "",
+        "score": round(rng.uniform(100, 900), 4),
+        "microbes": [],
+        "foodNutrients": [
+            {
+                "nutrientId": 1000 + i,
+                "nutrientName": name,
+                "nutrientNumber": NUMBERS.get(name, str(600 + i)),
+                "unitName": rng.choice(UNITS),
+                "derivationCode": "A",
+                "derivationDescription": "Analytical",
+                "derivationId": 1,
+                "value": round(rng.uniform(0, 500), 3),
+                "foodNutrientSourceId": 1,
+                "foodNutrientSourceCode": "1",
+                "foodNutrientSourceDescription":
+                    "Analytical or derived from analytical",
+                "rank": 100 * i,
+                "indentLevel": 1,
+                "foodNutrientId": rng.randrange(1 << 31),
+            }
+            for i, name in enumerate(COMMON_NUTRIENTS)
+        ],
+        "finalFoodInputFoods": [],
+        "foodMeasures": [],
+        "foodAttributes": [],
+        "foodAttributeTypes": [],
+        "foodVersionIds": [],
+    }
+
+
+def abridged(food, nutrients=None):
+    """The food as POST /foods returns it in abridged format."""
+    return {
+        "fdcId": food["fdcId"],
+        "description": food["description"],
+        "dataType": food["dataType"],
+        "publicationDate": "10/30/2020",
+        "foodCode": str(food["foodCode"]),
+        "foodNutrients": [
+            {
+                "number": nutrient["nutrientNumber"],
+                "name": nutrient["nutrientName"],
+                "amount": nutrient["value"],
+                "unitName": nutrient["unitName"].lower(),
+                "derivationCode": nutrient["derivationCode"],
+                "derivationDescription": nutrient["derivationDescription"],
+            }
+            for nutrient in food["foodNutrients"]
+            if nutrients is None or nutrient["nutrientNumber"] in nutrients
+        ],
+    }
+
+
+def dict_record(food):
+    """Nutrition record as it was cached before FoodRecord."""
+    return {
+        "description": food["description"],
+        "dataType": food["dataType"],
+        "servingSize": 100,
+        "servingSizeUnit": "g",
+        "nutrients": {
+            nutrient["nutrientName"]: {
+                "value": nutrient["value"],
+                "unit": nutrient.get("unitName", ""),
+            }
+            for nutrient in food["foodNutrients"]
+        },
+    }
+
+
+def compact_record(food, nutrients=None):
+    """
+    FoodRecord keeping every nutrient, or those in ``nutrients``, to
+    separate the two savings.
+    """
+    return FoodRecord(
+        food["description"],
+        food["dataType"],
+        100,
+        "g",
+        {
+            nutrient["nutrientName"]: (
+                nutrient["value"], nutrient["unitName"]
+            )
+            for nutrient in food["foodNutrients"]
+            if nutrients is None or nutrient["nutrientNumber"] in nutrients
+        },
+    )
+
+
+def sizes(payload):
+    raw = orjson.dumps(payload)
+    return {"bytes": len(raw), "gzip_bytes": len(gzip.compress(raw))}
+
+
+def parse_us(payload, number):
+    raw = orjson.dumps(payload)
+    text = raw.decode()
+    return {
+        # httpx and requests decode the body to text before json.loads
+        "json_us": min(timeit.repeat(
+            lambda: json.loads(raw.decode()), number=number, repeat=5
+        )) / number * 1e6,
+        "orjson_us": min(timeit.repeat(
+            lambda: orjson.loads(raw), number=number, repeat=5
+        )) / number * 1e6,
+        "text_chars": len(text),
+    }
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="USDA payload costs")
+    parser.add_argument("--records", type=int, default=4096)
+    parser.add_argument("--number", type=int, default=500)
+    parser.add_argument("--output", help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    search = {
+        "totalHits": 3,
+        "foods": [make_food(rng, 2_000_000 + i) for i in range(3)],
+    }
+    foods = [
+        make_food(rng, 3_000_000 + i) for i in range(FOODS_PER_REQUEST)
+    ]
+    payloads = {
+        "search (pageSize 3)": search,
+        "/foods abridged, all nutrients": [abridged(f) for f in foods],
+        "/foods abridged, label nutrients": [
+            abridged(f, LABEL_NUTRIENTS) for f in foods
+        ],
+    }
+
+    results = {"payloads": {}, "memory": {}}
+    for name, payload in payloads.items():
+        stats = {**sizes(payload), **parse_us(payload, args.number)}
+        results["payloads"][name] = stats
+        print(
+            f"{name}: {stats['bytes']} bytes ({stats['gzip_bytes']} "
+            f"gzipped); json {stats['json_us']:.0f} us, "
+            f"orjson {stats['orjson_us']:.0f} us"
+        )
+
+    cached = [make_food(rng, 4_000_000 + i) for i in range(args.records)]
+    memory = {
+        "dicts": retained_bytes(lambda: [dict_record(f) for f in cached]),
+        "FoodRecord, all nutrients": retained_bytes(
+            lambda: [compact_record(f) for f in cached]
+        ),
+        "FoodRecord, label nutrients": retained_bytes(
+            lambda: [compact_record(f, LABEL_NUTRIENTS) for f in cached]
+        ),
+    }
+    results["memory"] = {"records": args.records, **memory}
+    for name, size in memory.items():
+        print(
+            f"{args.records} cached records as {name}: "
+            f"{size / 2**20:.1f} MiB ({size / args.records:.0f} bytes each)"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+
+from api.utils import usda_client
+from api.utils.fdc_index import FDC_INDEX_PATH, build_index
+from api.utils.nutrition_cache import COMMON_INGREDIENTS, nutrition_cache
+from api.utils.nutrition_utils import close_async_client, fetch_nutrition_info
+from api.utils.prefork import PREFORK_WORKERS, PreforkServer
+
+
+def warm_nutrition_cache(ingredients):
+    """
+    Look up ingredients so their USDA records land in the nutrition cache.
+    Point NUTRITION_CACHE_DIR at the same directory as the service so the
+    persistent tier is shared.
+    """
+
+    async def run():
+        try:
+            return await fetch_nutrition_info(ingredients)
+        finally:
+            await close_async_client()
+
+    misses = nutrition_cache.misses
+    found = asyncio.run(run())
+    print(
+        f"Warmed nutrition cache: {len(found)} of {len(ingredients)} "
+        f"ingredients found, {nutrition_cache.misses - misses} "
+        "fetched from USDA."
+    )
+    if found.unresolved:
+        print(f"Failed to retrieve: {', '.join(found.unresolved)}")
+    return found
+
+
+def main(args=None):
+    if args.command == "warm-nutrition-cache":
+        # Warming runs offline, so it can wait out the USDA rate limit
+        usda_client.USDA_LATENCY_BUDGET = args.budget
+        ingredients = COMMON_INGREDIENTS[:args.top]
+        if args.file:
+            with open(args.file) as f:
+                ingredients = [line.strip() for line in f if line.strip()]
+        warm_nutrition_cache(ingredients)
+    elif args.command == "build-fdc-index":
+        build_index(args.output, args.sources)
+    elif args.command == "serve":
+        PreforkServer(
+            host=args.host, port=args.port, workers=args.workers
+        ).serve()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API service CLI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm = subparsers.add_parser(
+        "warm-nutrition-cache",
+        help="Preload USDA records for common ingredients",
+    )
+    warm.add_argument(
+        "--top",
+        type=int,
+        default=len(COMMON_INGREDIENTS),
+        help="Number of built-in common ingredients to preload",
+    )
+    warm.add_argument(
+        "--budget",
+        type=float,
+        default=600,
+        help="Seconds to spend on USDA lookups, rate limit waits included",
+    )
+    warm.add_argument(
+        "--file", help="File with one ingredient per line to preload instead"
+    )
+
+    index = subparsers.add_parser(
+        "build-fdc-index",
+        help="Build the offline FoodData Central search index",
+    )
+    index.add_argument(
+        "sources",
+        nargs="+",
+        help="Extracted FoodData Central CSV directories or JSON files",
+    )
+    index.add_argument(
+        "--output", default=FDC_INDEX_PATH, help="Index file to write"
+    )
+
+    serve = subparsers.add_parser(
+        "serve",
+        help="Serve the API from workers forked after loading the models",
+    )
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=9000)
+    serve.add_argument(
+        "--workers",
+        type=int,
+        default=PREFORK_WORKERS or 2,
+        help="Worker processes sharing the loaded models",
+    )
+
+    main(parser.parse_args())
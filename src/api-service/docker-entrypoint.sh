@@ -10,12 +10,21 @@ uvicorn_server_production() {
     pipenv run uvicorn api.service:app --host 0.0.0.0 --port 9000 --lifespan on
 }
 
+# PREFORK_WORKERS=N loads the models once and forks N workers that share them
+prefork_server_production() {
+    pipenv run python cli.py serve --host 0.0.0.0 --port 9000 --workers "${PREFORK_WORKERS}"
+}
+
 export -f uvicorn_server
 export -f uvicorn_server_production
+export -f prefork_server_production
 
 if [ "${DEV}" = "1" ]; then
   echo "Running in development mode..."
   uvicorn_server
+elif [ -n "${PREFORK_WORKERS}" ] && [ "${PREFORK_WORKERS}" != "0" ]; then
+  echo "Running in production mode with ${PREFORK_WORKERS} pre-forked workers..."
+  prefork_server_production
 else
   echo "Running in production mode..."
   uvicorn_server_production
@@ -0,0 +1,152 @@
+import asyncio
+import io
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.routers.ocr import ner_cache  # noqa: E402
+from api.utils.fdc_ids import fdc_ids  # noqa: E402
+from api.utils.food_record import FoodRecord  # noqa: E402
+from api.utils.nutrition_cache import cache_food, normalize_ingredient, \
+    nutrition_cache, record_stamps  # noqa: E402
+from api.utils.nutrition_utils import UNRESOLVED, \
+    NutritionResults  # noqa: E402
+from api.utils.recipe_cache import recipe_cache  # noqa: E402
+from api.utils.usda_client import usda_bucket  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def unlimited_usda_rate():
+    """The USDA quota bucket is process-wide; tests should not drain it."""
+    with patch.object(usda_bucket, "rate", 0):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def empty_fdc_id_index():
+    """Ingredient ids learned in one test must not leak into others."""
+    with patch.dict(fdc_ids.ids, clear=True):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def empty_ner_cache():
+    """Each test mocks NER its own way, so cached ingredients would leak."""
+    ner_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def empty_recipe_cache():
+    """Cached recipe responses would skip the lookups a test mocks."""
+    recipe_cache.clear()
+    yield
+
+
+def make_image_bytes(color="white", size=(100, 100)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def fake_ner(texts, **kwargs):
+    # Tag every comma-separated line as a FOOD entity
+    results = []
+    for text in texts:
+        entities, start = [], 0
+        for part in text.split(", "):
+            entities.append({
+                "entity_group": "FOOD", "score": 0.999,
+                "start": start, "end": start + len(part),
+            })
+            start += len(part) + 2
+        results.append(entities)
+    return results
+
+
+def record(protein):
+    return FoodRecord(
+        "Food", "Survey (FNDDS)", 100, "g", {"Protein": (protein, "G")}
+    )
+
+
+# Records found by the lookups fixture, by normalized ingredient
+RECORDS = {
+    "rice": record(3.0),
+    "beans": record(9.0),
+    "milk": record(3.0),
+    "bread": record(9.0),
+    "salt": record(0.0),
+}
+
+
+@pytest.fixture
+def lookups():
+    """
+    Ingredients of each nutrition lookup made by /nutrition or /scan.
+    Like the real lookups, they cache the records they find and report
+    each ingredient as it settles; ingredients without a record in
+    RECORDS are unresolved.
+    """
+    calls = []
+
+    async def fetch_nutrition_info(ingredients, on_result=None):
+        calls.append(list(ingredients))
+        found, unresolved = {}, []
+        for ingredient in dict.fromkeys(ingredients):
+            await asyncio.sleep(0)
+            food = RECORDS.get(normalize_ingredient(ingredient))
+            if food is None:
+                unresolved.append(ingredient)
+                food = UNRESOLVED
+            else:
+                cache_food(ingredient, food)
+                found[ingredient] = food
+            if on_result is not None:
+                on_result(ingredient, food)
+        return NutritionResults(found, unresolved=unresolved)
+
+    with patch("api.routers.nutrition.fetch_nutrition_info",
+               fetch_nutrition_info), \
+            patch("api.routers.scan.fetch_nutrition_info",
+                  fetch_nutrition_info), \
+            patch.dict(RECORDS):
+        yield calls
+
+    # Tests of the real lookups must not find these records cached
+    for key in {normalize_ingredient(i) for call in calls for i in call}:
+        nutrition_cache.delete(key)
+        record_stamps.delete(key)
+
+
+@pytest.fixture
+def client():
+    """The /nutrition and /scan routers, served without the middleware."""
+    from api.routers.nutrition import router as nutrition_router
+    from api.routers.scan import router as scan_router
+
+    app = FastAPI()
+    app.include_router(nutrition_router)
+    app.include_router(scan_router)
+    return TestClient(app)
+
+
+def post(client, *ingredients, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.post(
+        "/nutrition", json={"ingredients": list(ingredients)}, headers=headers
+    )
+
+
+def post_scan(client, color="yellow", **kwargs):
+    return client.post(
+        "/scan",
+        files={"file": ("receipt.jpg", make_image_bytes(color), "image/jpeg")},
+        **kwargs,
+    )
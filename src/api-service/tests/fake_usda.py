@@ -0,0 +1,249 @@
+"""
+A local stand-in for the USDA FoodData Central API, so nutrition lookups
+can be tested and load tested without reaching api.nal.usda.gov.
+
+    fake = FakeUSDA()
+    fake.fail_next(503, 429)
+    with serve(fake.app) as base_url:
+        ...  # point USDA_SEARCH_URL at f"{base_url}/fdc/v1/foods/search"
+"""
+
+import asyncio
+import random
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# (number, name, unit); the last two are not on a nutrition label
+NUTRIENTS = [
+    ("203", "Protein", "G"),
+    ("204", "Total lipid (fat)", "G"),
+    ("205", "Carbohydrate, by difference", "G"),
+    ("208", "Energy", "KCAL"),
+    ("255", "Water", "G"),
+    ("269", "Sugars, total including NLEA", "G"),
+    ("291", "Fiber, total dietary", "G"),
+    ("301", "Calcium, Ca", "MG"),
+    ("303", "Iron, Fe", "MG"),
+    ("307", "Sodium, Na", "MG"),
+    ("401", "Vitamin C, total ascorbic acid", "MG"),
+    ("601", "Cholesterol", "MG"),
+    ("262", "Caffeine", "MG"),
+    ("319", "Retinol", "UG"),
+]
+
+
+def make_food(query):
+    """Deterministic FNDDS-style search result for any query."""
+    fdc_id = zlib.crc32(query.lower().encode()) % 10_000_000
+    rng = random.Random(fdc_id)
+    return {
+        "fdcId": fdc_id,
+        "description": query.strip().capitalize(),
+        "dataType": "Survey (FNDDS)",
+        "foodNutrients": [
+            {
+                "nutrientId": 1000 + int(number),
+                "nutrientName": name,
+                "nutrientNumber": number,
+                "value": round(rng.uniform(0, 50), 2),
+                "unitName": unit,
+            }
+            for number, name, unit in NUTRIENTS
+        ],
+    }
+
+
+def to_abridged(food, nutrients=None):
+    """
+    A search result as the /foods endpoint returns it in abridged format,
+    optionally with only the given nutrient numbers. Like the real API,
+    the abridged format has no serving size.
+    """
+    return {
+        "fdcId": food["fdcId"],
+        "description": food["description"],
+        "dataType": food["dataType"],
+        "foodNutrients": [
+            {
+                "number": nutrient["nutrientNumber"],
+                "name": nutrient["nutrientName"],
+                "amount": nutrient["value"],
+                "unitName": nutrient["unitName"].lower(),
+            }
+            for nutrient in food["foodNutrients"]
+            if nutrients is None
+            or int(nutrient["nutrientNumber"]) in nutrients
+        ],
+    }
+
+
+def to_full(food):
+    """A search result as the /foods endpoint returns it in full format."""
+    full = {
+        "fdcId": food["fdcId"],
+        "description": food["description"],
+        "dataType": food["dataType"],
+        "foodNutrients": [
+            {
+                "nutrient": {
+                    "id": nutrient.get("nutrientId"),
+                    "number": nutrient["nutrientNumber"],
+                    "name": nutrient["nutrientName"],
+                    "unitName": nutrient["unitName"].lower(),
+                },
+                "amount": nutrient["value"],
+            }
+            for nutrient in food["foodNutrients"]
+        ],
+    }
+    if "servingSize" in food:
+        full["servingSize"] = food["servingSize"]
+        full["servingSizeUnit"] = food["servingSizeUnit"]
+    return full
+
+
+class FakeUSDA:
+    """
+    Fake FoodData Central search API. Without ``foods`` every query gets a
+    synthesized match, except queries containing "unknown", which match
+    nothing. Foods handed out by search can then be fetched in bulk from
+    POST /foods, which honours its ``nutrients`` filter. Failures can be
+    queued with ``fail_next``, forced for a query with ``fail_queries``,
+    and ``rate_limit`` (requests per second) answers excess requests with
+    429 and Retry-After like the real API.
+    """
+
+    def __init__(self, foods=None, latency=0.0, rate_limit=None):
+        self.foods = foods
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.fail_queries = {}
+        self.queries = []
+        self.bulk_requests = []
+        self._failures = deque()
+        self._lock = threading.Lock()
+        self._window = deque()
+        # Every food handed out, by id, for the /foods endpoint
+        self.by_id = {food["fdcId"]: food for food in foods or []}
+        self.app = FastAPI()
+        self.app.add_api_route("/fdc/v1/foods/search", self.search)
+        self.app.add_api_route(
+            "/fdc/v1/foods", self.foods_by_id, methods=["POST"]
+        )
+
+    @property
+    def requests(self):
+        return len(self.queries)
+
+    def fail_next(self, *status_codes):
+        """Answer the next requests with these status codes, in order."""
+        self._failures.extend(status_codes)
+
+    def match(self, query, page_size):
+        query = query.lower()
+        if self.foods is None:
+            if "unknown" in query:
+                return []
+            food = make_food(query)
+            self.by_id[food["fdcId"]] = food
+            return [food]
+        words = query.split()
+        matches = [
+            food for food in self.foods
+            if all(word in food["description"].lower() for word in words)
+        ]
+        matches.sort(key=lambda food: len(food["description"]))
+        return matches[:page_size]
+
+    def _rate_limited(self):
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            while self._window and self._window[0] <= now - 1:
+                self._window.popleft()
+            if len(self._window) >= self.rate_limit:
+                return True
+            self._window.append(now)
+            return False
+
+    async def _error(self, query):
+        """Injected or rate limit response for a request, if any."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._rate_limited():
+            return JSONResponse(
+                {"error": {"code": "OVER_RATE_LIMIT"}},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+        status_code = self.fail_queries.get(query)
+        if status_code is None and self._failures:
+            status_code = self._failures.popleft()
+        if status_code is not None:
+            return JSONResponse({"error": "injected"}, status_code=status_code)
+        return None
+
+    async def search(self, request: Request):
+        query = request.query_params.get("query", "")
+        page_size = int(request.query_params.get("pageSize", "50"))
+        self.queries.append(query)
+        error = await self._error(query)
+        if error is not None:
+            return error
+        foods = self.match(query, page_size)
+        return {"totalHits": len(foods), "foods": foods}
+
+    async def foods_by_id(self, request: Request):
+        body = await request.json()
+        self.bulk_requests.append(body["fdcIds"])
+        error = await self._error(None)
+        if error is not None:
+            return error
+        if body.get("format") == "full":
+            shape = to_full
+        else:
+            def shape(food):
+                return to_abridged(food, body.get("nutrients"))
+        return [
+            shape(self.by_id[fdc_id])
+            for fdc_id in body["fdcIds"]
+            if fdc_id in self.by_id
+        ]
+
+
+@contextmanager
+def serve(app, host="127.0.0.1"):
+    """Run an ASGI app with uvicorn in a background thread; yields its URL."""
+    # With IPPROTO_TCP asyncio sets TCP_NODELAY on accepted connections
+    sock = socket.socket(
+        socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP
+    )
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(app, log_level="warning", lifespan="off")
+    )
+    thread = threading.Thread(
+        target=server.run, kwargs={"sockets": [sock]}, daemon=True
+    )
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Fake server failed to start")
+        time.sleep(0.01)
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        sock.close()
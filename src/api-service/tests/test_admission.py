@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import os
+import sys
+import httpx
+import pytest
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+
+path_to_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+sys.path.insert(0, path_to_src)
+
+from api.utils.admission import (  # noqa: E402
+    AdmissionLimit,
+    AdmissionMiddleware,
+    AdmissionRejected,
+    create_limits_from_env,
+)
+
+
+def rejections(route, reason):
+    return REGISTRY.get_sample_value(
+        "admission_rejections_total", {"route": route, "reason": reason}
+    ) or 0
+
+
+def make_app(limit):
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, limits={"/api/ocr": limit})
+    app.state.release = asyncio.Event()
+
+    @app.post("/api/ocr/batch")
+    async def ocr():
+        await app.state.release.wait()
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+async def wait_until(condition):
+    while not condition():
+        await asyncio.sleep(0.001)
+
+
+def test_queue_full_is_rejected_with_retry_after():
+    limit = AdmissionLimit("test_full", 1, 1, max_wait=5)
+    app = make_app(limit)
+    before = rejections("test_full", "queue_full")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            first = asyncio.create_task(client.post("/api/ocr/batch"))
+            second = asyncio.create_task(client.post("/api/ocr/batch"))
+            await wait_until(lambda: limit.queued == 1)
+
+            rejected = await client.post("/api/ocr/batch")
+            # Other routes are not limited
+            health = await client.get("/health")
+
+            app.state.release.set()
+            return rejected, health, await first, await second
+
+    rejected, health, first, second = asyncio.run(run())
+
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "5"
+    assert "retry after" in rejected.json()["detail"]
+    assert health.status_code == 200
+    assert first.status_code == second.status_code == 200
+    assert rejections("test_full", "queue_full") == before + 1
+    assert limit.active == 0 and limit.queued == 0
+
+
+def test_queue_time_budget_is_enforced():
+    limit = AdmissionLimit("test_wait", 1, 4, max_wait=0.05)
+    app = make_app(limit)
+    before = rejections("test_wait", "timeout")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            first = asyncio.create_task(client.post("/api/ocr/batch"))
+            await wait_until(lambda: limit.active == 1)
+            waited = await client.post("/api/ocr/batch")
+            app.state.release.set()
+            return waited, await first
+
+    waited, first = asyncio.run(run())
+
+    assert waited.status_code == 503
+    assert waited.headers["retry-after"] == "1"
+    assert first.status_code == 200
+    assert rejections("test_wait", "timeout") == before + 1
+    assert limit.active == 0 and limit.queued == 0
+
+
+def test_slots_are_handed_over_in_arrival_order():
+    limit = AdmissionLimit("test_order", 1, 8, max_wait=5)
+    order = []
+
+    async def request(i):
+        await limit.acquire()
+        order.append(i)
+        await asyncio.sleep(0)
+        limit.release()
+
+    async def run():
+        await limit.acquire()
+        tasks = [asyncio.create_task(request(i)) for i in range(4)]
+        await wait_until(lambda: limit.queued == 4)
+        # A cancelled waiter gives up its place in the queue
+        tasks[1].cancel()
+        limit.release()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(run())
+
+    assert order == [0, 2, 3]
+    assert limit.active == 0 and limit.queued == 0
+
+
+def test_rejected_acquire_raises():
+    limit = AdmissionLimit("test_raise", 1, 0, max_wait=1, retry_after=3)
+
+    async def run():
+        await limit.acquire()
+        with pytest.raises(AdmissionRejected) as error:
+            await limit.acquire()
+        limit.release()
+        return error.value
+
+    error = asyncio.run(run())
+    assert (error.reason, error.retry_after) == ("queue_full", 3)
+
+
+def test_limits_from_env():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("ADMISSION_OCR_CONCURRENCY", "2")
+        mp.setenv("ADMISSION_NUTRITION_MAX_WAIT", "0.5")
+        limits = create_limits_from_env()
+        assert limits["/api/ocr"].max_concurrent == 2
+        assert limits["/api/nutrition"].max_wait == 0.5
+        assert "/api/scan" in limits
+
+        mp.setenv("ADMISSION_CONTROL", "0")
+        assert create_limits_from_env() == {}
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.batching import MicroBatcher  # noqa: E402
+from api.utils.worker_pool import WorkerPool  # noqa: E402
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+
+    def upper_batch(self, items):
+        self.batches.append(list(items))
+        return [item.upper() for item in items]
+
+    def test_concurrent_items_share_a_batch(self):
+        batcher = MicroBatcher(
+            self.upper_batch, max_batch_size=8, max_wait_ms=20
+        )
+
+        async def submit_all():
+            return await asyncio.gather(
+                *(batcher.submit(t) for t in ["salt", "butter", "onion"])
+            )
+
+        result = asyncio.run(submit_all())
+        self.assertEqual(result, ["SALT", "BUTTER", "ONION"])
+        self.assertEqual(self.batches, [["salt", "butter", "onion"]])
+
+    def test_full_batch_flushes_immediately(self):
+        batcher = MicroBatcher(
+            self.upper_batch, max_batch_size=2, max_wait_ms=10000
+        )
+
+        async def submit_all():
+            return await asyncio.wait_for(
+                asyncio.gather(*(batcher.submit(t) for t in "abcd")), 1
+            )
+
+        self.assertEqual(asyncio.run(submit_all()), ["A", "B", "C", "D"])
+        self.assertEqual(self.batches, [["a", "b"], ["c", "d"]])
+
+    def test_runs_through_worker_pool(self):
+        pool = WorkerPool(kind="thread", max_workers=1, max_queue=0)
+        batcher = MicroBatcher(self.upper_batch, runner=pool.run)
+        result = asyncio.run(batcher.submit("rice"))
+        pool.shutdown()
+        self.assertEqual(result, "RICE")
+
+    def test_errors_reach_every_caller(self):
+        def failing_batch(items):
+            raise RuntimeError("model failed")
+
+        batcher = MicroBatcher(failing_batch, max_wait_ms=1)
+
+        async def submit_all():
+            return await asyncio.gather(
+                batcher.submit("a"), batcher.submit("b"),
+                return_exceptions=True,
+            )
+
+        errors = asyncio.run(submit_all())
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(all(isinstance(e, RuntimeError) for e in errors))
+
+    def test_running_batches_are_referenced(self):
+        pool = WorkerPool(kind="thread", max_workers=1, max_queue=0)
+        batcher = MicroBatcher(
+            self.upper_batch, max_batch_size=1, runner=pool.run
+        )
+
+        async def submit():
+            pending = asyncio.ensure_future(batcher.submit("rice"))
+            await asyncio.sleep(0)
+            running = len(batcher._tasks)
+            return running, await pending
+
+        self.assertEqual(asyncio.run(submit()), (1, "RICE"))
+        pool.shutdown()
+        self.assertEqual(batcher._tasks, set())
+
+    def test_missing_results_fail_instead_of_hanging(self):
+        batcher = MicroBatcher(lambda items: [], max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(asyncio.wait_for(batcher.submit("a"), 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
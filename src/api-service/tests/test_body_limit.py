@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import os
+import sys
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+path_to_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+sys.path.insert(0, path_to_src)
+
+from api.utils.body_limit import BodyLimitMiddleware  # noqa: E402
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(
+        BodyLimitMiddleware, max_bytes=1024,
+        path_limits={"/batch": 4096},
+    )
+    app.state.calls = 0
+
+    @app.post("/upload")
+    @app.post("/batch")
+    async def upload(file: UploadFile = File(...)):
+        app.state.calls += 1
+        return {"size": len(await file.read())}
+
+    return app
+
+
+def post(app, path, content, headers=None):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.post(path, content=content, headers=headers)
+
+    return asyncio.run(run())
+
+
+def multipart(size):
+    boundary = "limit"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="r.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + b"x" * size + f"\r\n--{boundary}--\r\n".encode()
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    return body, headers
+
+
+def test_declared_length_over_limit_is_rejected_unread():
+    app = make_app()
+    body, headers = multipart(2000)
+    response = post(app, "/upload", body, headers)
+
+    assert response.status_code == 413
+    assert "1024 bytes" in response.json()["detail"]
+    assert app.state.calls == 0
+
+
+def test_streamed_body_is_cut_off_during_form_parsing():
+    app = make_app()
+    body, headers = multipart(2000)
+    chunks = []
+
+    async def stream():
+        for i in range(0, len(body), 256):
+            chunks.append(i)
+            yield body[i:i + 256]
+
+    response = post(app, "/upload", stream(), headers)
+
+    assert response.status_code == 413
+    assert app.state.calls == 0
+    # Reading stopped at the limit rather than at the end of the body
+    assert len(chunks) < len(body) // 256
+
+
+def test_path_limits_and_small_bodies_pass():
+    app = make_app()
+    body, headers = multipart(2000)
+    assert post(app, "/batch", body, headers).json() == {"size": 2000}
+
+    body, headers = multipart(100)
+    assert post(app, "/upload", body, headers).json() == {"size": 100}
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import tempfile
+import unittest
+from unittest.mock import patch
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.cache_utils import LRUCache, SQLiteCache, \
+    TieredCache  # noqa: E402
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    @patch("api.utils.cache_utils.time.monotonic")
+    def test_ttl_expiry(self, mock_monotonic):
+        cache = LRUCache(ttl=10)
+        mock_monotonic.return_value = 100
+        cache.set("a", 1)
+        mock_monotonic.return_value = 105
+        self.assertEqual(cache.get("a"), 1)
+        mock_monotonic.return_value = 111
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class TestSQLiteCache(unittest.TestCase):
+
+    def test_survives_reopen(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            SQLiteCache(path).set("key", {"ingredients": ["salt"]})
+            cache = SQLiteCache(path)
+            self.assertEqual(cache.get("key"), {"ingredients": ["salt"]})
+            self.assertIsNone(cache.get("other"))
+
+    def test_maxsize_drops_oldest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SQLiteCache(os.path.join(tmp, "c.sqlite"), maxsize=2)
+            with patch("api.utils.cache_utils.time.time") as mock_time:
+                for i, key in enumerate("abc"):
+                    mock_time.return_value = 1000 + i
+                    cache.set(key, i)
+            self.assertEqual(len(cache), 2)
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(cache.get("c"), 2)
+
+
+class TestTieredCache(unittest.TestCase):
+
+    def test_disk_hits_are_promoted(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = SQLiteCache(os.path.join(tmp, "cache.sqlite"))
+            disk.set("key", [1, 2])
+            cache = TieredCache(LRUCache(), disk)
+            self.assertEqual(cache.get("key"), [1, 2])
+            self.assertEqual(cache.memory.get("key"), [1, 2])
+            self.assertIsNone(cache.get("missing"))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            self.assertEqual(cache.disk_hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
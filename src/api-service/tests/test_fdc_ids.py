@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+import httpx
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.dirname(__file__))
+from api.utils.fdc_ids import FDCIdIndex, fdc_ids, singularize  # noqa: E402
+from api.utils.nutrition_cache import nutrition_cache  # noqa: E402
+from api.utils.nutrition_utils import fetch_nutrition_info  # noqa: E402
+from fake_usda import FakeUSDA, make_food, serve  # noqa: E402
+
+
+class TestFDCIdIndex(unittest.TestCase):
+
+    def test_singularize(self):
+        self.assertEqual(singularize("cherry tomatoes"), "cherry tomato")
+        self.assertEqual(singularize("strawberries"), "strawberry")
+        self.assertEqual(singularize("peaches"), "peach")
+        self.assertEqual(singularize("eggs"), "egg")
+        self.assertEqual(singularize("swiss"), "swiss")
+        self.assertEqual(singularize("gas"), "gas")
+
+    def test_resolution(self):
+        index = FDCIdIndex()
+        index.learn("Green Onion", 1)
+        index.learn("parmesan cheese", 2)
+        self.assertEqual(index.resolve("green onions"), 1)
+        self.assertEqual(index.resolve("Scallions"), 1)
+        self.assertEqual(index.resolve("Parmesan-Cheeses"), 2)
+        self.assertIsNone(index.resolve("parmesan chese"))
+        self.assertIsNone(index.resolve("cheddar cheese"))
+        self.assertIsNone(index.resolve("onion"))
+
+        index.forget(1)
+        self.assertIsNone(index.resolve("scallion"))
+
+    def test_opposite_variants_are_not_matched(self):
+        index = FDCIdIndex()
+        index.learn("unsalted butter", 111)
+        index.learn("sweetened almond milk", 222)
+        index.learn("fat free milk", 333)
+        self.assertIsNone(index.resolve("salted butter"))
+        self.assertIsNone(index.resolve("unsweetened almond milk"))
+        self.assertIsNone(index.resolve("nonfat milk"))
+        self.assertIsNone(index.resolve("milk"))
+        self.assertEqual(index.resolve("unsalted  butter"), 111)
+        self.assertEqual(index.resolve("un-salted butter"), 111)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ids", "fdc_ids.sqlite")
+            FDCIdIndex(path).learn("rice", 42)
+            self.assertEqual(FDCIdIndex(path).resolve("Rice"), 42)
+
+
+class TestIdLookups(unittest.TestCase):
+
+    def setUp(self):
+        nutrition_cache.clear()
+        self.fake = FakeUSDA()
+        self.server = serve(self.fake.app)
+        base_url = self.server.__enter__()
+        self.patches = [
+            patch(
+                "api.utils.nutrition_utils.USDA_SEARCH_URL",
+                f"{base_url}/fdc/v1/foods/search",
+            ),
+            patch(
+                "api.utils.nutrition_utils.USDA_FOODS_URL",
+                f"{base_url}/fdc/v1/foods",
+            ),
+            patch("api.utils.nutrition_utils.FOODS_PER_REQUEST", 2),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.__exit__(None, None, None)
+
+    def fetch(self, ingredients):
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await fetch_nutrition_info(ingredients, client=client)
+
+        with patch("builtins.print"):
+            return asyncio.run(run())
+
+    def test_searches_teach_the_index(self):
+        searched = self.fetch(["green onion", "rice", "salt"])
+        self.assertEqual(self.fake.requests, 3)
+        self.assertEqual(len(fdc_ids), 3)
+
+        # Other spellings reuse the cached record of the food
+        result = self.fetch(["Scallions", "green onions"])
+        self.assertEqual(self.fake.requests, 3)
+        self.assertEqual(result["Scallions"], searched["green onion"])
+
+    def test_known_ingredients_are_fetched_in_bulk(self):
+        searched = self.fetch(["green onion", "rice", "salt"])
+        nutrition_cache.clear()
+
+        result = self.fetch(["salt", "rice", "green onion", "pepper"])
+        self.assertEqual(self.fake.queries[3:], ["pepper"])
+        # Three known ids in chunks of two
+        self.assertEqual(
+            sorted(len(ids) for ids in self.fake.bulk_requests), [1, 2]
+        )
+        for ingredient in searched:
+            self.assertEqual(result[ingredient], searched[ingredient])
+
+    def test_concurrent_id_lookups_share_one_request(self):
+        self.fetch(["salt"])
+        nutrition_cache.clear()
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await asyncio.gather(*(
+                    fetch_nutrition_info(["salt", "pepper"], client=client)
+                    for _ in range(20)
+                ))
+
+        with patch("builtins.print"):
+            results = asyncio.run(run())
+        salt_id = make_food("salt")["fdcId"]
+        self.assertEqual(self.fake.bulk_requests, [[salt_id]])
+        self.assertEqual(self.fake.queries, ["salt", "pepper"])
+        self.assertTrue(all(list(r) == ["salt", "pepper"] for r in results))
+
+    def test_branded_foods_keep_their_serving_size(self):
+        bar = dict(make_food("granola bar"), dataType="Branded",
+                   servingSize=40, servingSizeUnit="g")
+        self.fake.foods = [bar]
+        self.fake.by_id[bar["fdcId"]] = bar
+        searched = self.fetch(["granola bar"])
+        nutrition_cache.clear()
+
+        fetched = self.fetch(["granola bar"])
+        self.assertEqual(len(self.fake.bulk_requests), 2)
+        self.assertEqual(fetched["granola bar"]["servingSize"], 40)
+        self.assertEqual(fetched, searched)
+
+    def test_removed_foods_are_searched_again(self):
+        self.fetch(["rice"])
+        nutrition_cache.clear()
+        self.fake.by_id.clear()
+
+        result = self.fetch(["rice"])
+        self.assertEqual(list(result), ["rice"])
+        self.assertEqual(self.fake.queries, ["rice", "rice"])
+        self.assertEqual(len(self.fake.bulk_requests), 1)
+
+    def test_bulk_failures_are_unresolved(self):
+        self.fetch(["rice"])
+        nutrition_cache.clear()
+        self.fake.fail_next(400)
+        result = self.fetch(["rice"])
+        self.assertEqual(result.unresolved, ["rice"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import csv
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.fdc_index import FDCIndex, build_index  # noqa: E402
+from api.utils.nutrition_cache import nutrition_cache  # noqa: E402
+from api.utils.nutrition_utils import get_nutrition_info, \
+    select_food  # noqa: E402
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def write_csv_dump(directory):
+    write_csv(
+        os.path.join(directory, "nutrient.csv"),
+        ["id", "name", "unit_name", "nutrient_nbr", "rank"],
+        [
+            [1003, "Protein", "G", "203", 600],
+            [1008, "Energy", "KCAL", "208.0", 300],
+            [1057, "Caffeine", "MG", "262", 18300],
+        ],
+    )
+    write_csv(
+        os.path.join(directory, "food.csv"),
+        ["fdc_id", "data_type", "description", "food_category_id",
+         "publication_date"],
+        [
+            [1, "sr_legacy_food", "Chicken, broilers, breast, raw", "", ""],
+            [2, "branded_food", "CHICKEN BREAST STRIPS", "", ""],
+            [3, "sub_sample_food", "Chicken breast sample", "", ""],
+            [4, "sr_legacy_food", "Rice, white, cooked", "", ""],
+        ],
+    )
+    write_csv(
+        os.path.join(directory, "branded_food.csv"),
+        ["fdc_id", "serving_size", "serving_size_unit"],
+        [[2, 85, "g"]],
+    )
+    write_csv(
+        os.path.join(directory, "food_nutrient.csv"),
+        ["id", "fdc_id", "nutrient_id", "amount"],
+        [
+            [10, 1, 1003, 22.5],
+            [11, 1, 1008, 120],
+            [12, 2, 1003, 20],
+            [13, 3, 1003, 21],
+            [14, 4, 1008, 130],
+            [15, 4, 1057, 0],
+        ],
+    )
+
+
+def write_json_dump(path):
+    with open(path, "w") as f:
+        json.dump({"SurveyFoods": [{
+            "fdcId": 100,
+            "description": "Chicken breast, baked",
+            "dataType": "Survey (FNDDS)",
+            "foodNutrients": [{
+                "nutrient": {"id": 1003, "name": "Protein", "number": "203",
+                             "unitName": "g", "rank": 600},
+                "amount": 30.1,
+            }, {
+                "nutrient": {"id": 1106, "name": "Vitamin A, RAE",
+                             "unitName": "µg", "rank": 7420},
+                "amount": 5,
+            }],
+        }]}, f)
+
+
+class TestFDCIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        dump = os.path.join(self.tmp.name, "csv")
+        os.makedirs(dump)
+        write_csv_dump(dump)
+        survey = os.path.join(self.tmp.name, "survey.json")
+        write_json_dump(survey)
+        self.path = os.path.join(self.tmp.name, "index", "fdc.sqlite")
+        with patch("builtins.print"):
+            build_index(self.path, [dump, survey])
+        self.index = FDCIndex(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_generic_foods_rank_before_branded(self):
+        foods = self.index.search("Chicken Breast")
+        self.assertEqual(
+            [food["fdcId"] for food in foods][:2], [100, 1]
+        )
+        self.assertEqual(foods[2]["dataType"], "Branded")
+        self.assertEqual(foods[2]["servingSize"], 85)
+        # Data types outside the search API's are not indexed
+        self.assertNotIn(3, [food["fdcId"] for food in foods])
+
+    def test_results_match_search_api_shape(self):
+        food = self.index.search("chicken breast baked", limit=1)[0]
+        self.assertEqual(food, {
+            "fdcId": 100,
+            "description": "Chicken breast, baked",
+            "dataType": "Survey (FNDDS)",
+            "foodNutrients": [
+                {"nutrientName": "Protein", "value": 30.1, "unitName": "G",
+                 "nutrientNumber": "203"},
+                {"nutrientName": "Vitamin A, RAE", "value": 5.0,
+                 "unitName": "UG"},
+            ],
+        })
+        with patch("builtins.print"):
+            record = select_food("chicken breast", [food])
+        self.assertEqual(record["servingSize"], 100)
+        self.assertEqual(record["nutrients"]["Protein"]["unit"], "G")
+
+    def test_substring_and_missing_queries(self):
+        self.assertEqual(self.index.search("broil")[0]["fdcId"], 1)
+        self.assertEqual(self.index.search("quinoa"), [])
+        self.assertEqual(self.index.search("a b"), [])
+
+    @patch("api.utils.nutrition_utils.requests.get")
+    def test_local_backend(self, mock_get):
+        nutrition_cache.clear()
+        with patch("api.utils.nutrition_utils.NUTRITION_BACKEND", "local"), \
+                patch("api.utils.nutrition_utils.get_fdc_index",
+                      return_value=self.index), \
+                patch("builtins.print"):
+            result = get_nutrition_info(["rice", "quinoa"])
+
+        mock_get.assert_not_called()
+        self.assertEqual(list(result), ["rice"])
+        self.assertEqual(result["rice"]["description"], "Rice, white, cooked")
+        self.assertEqual(result["rice"]["nutrients"], {
+            "Energy": {"value": 130.0, "unit": "KCAL"},
+            "Caffeine": {"value": 0.0, "unit": "MG"},
+        })
+
+    def test_local_backend_keeps_reported_nutrients(self):
+        nutrition_cache.clear()
+        with patch("api.utils.nutrition_utils.NUTRITION_BACKEND", "local"), \
+                patch("api.utils.nutrition_utils.get_fdc_index",
+                      return_value=self.index), \
+                patch("api.utils.food_record.REPORTED_NUTRIENTS",
+                      frozenset({"208"})), \
+                patch("builtins.print"):
+            result = get_nutrition_info(["rice"])
+
+        self.assertEqual(
+            result["rice"]["nutrients"], {"Energy": {"value": 130.0,
+                                                     "unit": "KCAL"}}
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
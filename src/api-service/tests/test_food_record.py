@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+import httpx
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.dirname(__file__))
+from api.utils.cache_utils import SQLiteCache  # noqa: E402
+from api.utils.food_record import FoodRecord, LABEL_NUTRIENTS, \
+    _reported_nutrients, dumps_record, is_reported, \
+    loads_record  # noqa: E402
+from api.utils.nutrition_utils import fetch_foods_by_id, \
+    food_from_abridged, select_food  # noqa: E402
+from api.utils.usda_client import lookup_deadline  # noqa: E402
+from fake_usda import make_food, to_abridged  # noqa: E402
+
+LABEL = frozenset(LABEL_NUTRIENTS)
+
+RECORD = {
+    "description": "Chicken, raw",
+    "dataType": "Survey (FNDDS)",
+    "servingSize": 100,
+    "servingSizeUnit": "g",
+    "nutrients": {
+        "Protein": {"value": 27.0, "unit": "G"},
+        "Energy": {"value": 239.0, "unit": "KCAL"},
+    },
+}
+
+
+class TestFoodRecord(unittest.TestCase):
+
+    def test_reads_like_a_record_dict(self):
+        record = FoodRecord.from_dict(RECORD)
+        self.assertEqual(record, RECORD)
+        self.assertEqual(dict(record), RECORD)
+        self.assertEqual(record.get("servingSize"), 100)
+        self.assertIsNone(record.get("fdcId"))
+        self.assertEqual(list(record["nutrients"]), ["Protein", "Energy"])
+
+    def test_records_share_nutrient_names(self):
+        first = FoodRecord.from_dict(RECORD)
+        second = FoodRecord.from_dict(json.loads(json.dumps(RECORD)))
+        self.assertIs(first.names, second.names)
+        self.assertIs(first.units, second.units)
+
+    def test_serialization(self):
+        record = FoodRecord.from_dict(RECORD)
+        self.assertEqual(loads_record(dumps_record(record)), record)
+        self.assertIsInstance(loads_record(dumps_record(record)), FoodRecord)
+        self.assertEqual(loads_record(dumps_record({})), {})
+        # Record dicts stored before records were compact
+        self.assertIsInstance(loads_record(json.dumps(RECORD)), FoodRecord)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SQLiteCache(
+                os.path.join(tmp, "cache.sqlite"),
+                dumps=dumps_record,
+                loads=loads_record,
+            )
+            cache.set("chicken", record)
+            self.assertEqual(cache.get("chicken"), RECORD)
+
+    def test_reported_nutrients_setting(self):
+        self.assertIsNone(_reported_nutrients("all"))
+        self.assertEqual(_reported_nutrients(" Label "), LABEL)
+        self.assertEqual(
+            _reported_nutrients("208, 203,"), frozenset({"208", "203"})
+        )
+
+    @patch("api.utils.food_record.REPORTED_NUTRIENTS", LABEL)
+    def test_reported_nutrients(self):
+        self.assertTrue(is_reported("208"))
+        self.assertTrue(is_reported(208))
+        self.assertFalse(is_reported("262"))
+        self.assertTrue(is_reported(None))
+        with patch("api.utils.food_record.REPORTED_NUTRIENTS", None):
+            self.assertTrue(is_reported("262"))
+
+    def test_records_keep_every_nutrient_by_default(self):
+        with patch("builtins.print"):
+            record = select_food("coffee", [make_food("coffee")])
+        self.assertIn("Caffeine", record["nutrients"])
+
+    @patch("api.utils.food_record.REPORTED_NUTRIENTS", LABEL)
+    def test_records_keep_reported_nutrients(self):
+        food = make_food("coffee")
+        with patch("builtins.print"):
+            searched = select_food("coffee", [food])
+            fetched = select_food(
+                "coffee", [food_from_abridged(to_abridged(food))]
+            )
+        self.assertEqual(searched, fetched)
+        self.assertIn("Energy", searched["nutrients"])
+        self.assertNotIn("Caffeine", searched["nutrients"])
+
+    @patch("api.utils.nutrition_utils.REPORTED_NUTRIENTS", LABEL)
+    def test_bulk_requests_ask_for_reported_nutrients(self):
+        bodies = []
+        food = make_food("coffee")
+
+        def handler(request):
+            body = json.loads(request.content)
+            bodies.append(body)
+            return httpx.Response(
+                200, json=[to_abridged(food, body["nutrients"])]
+            )
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await fetch_foods_by_id(
+                    [food["fdcId"]], client, lookup_deadline()
+                )
+
+        foods = asyncio.run(run())
+        self.assertEqual(
+            sorted(bodies[0]["nutrients"]), sorted(map(int, LABEL_NUTRIENTS))
+        )
+        nutrients = foods[food["fdcId"]]["foodNutrients"]
+        names = [nutrient["nutrientName"] for nutrient in nutrients]
+        self.assertIn("Protein", names)
+        self.assertNotIn("Caffeine", names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import io
+import unittest
+import sys
+import os
+from PIL import Image
+from starlette.datastructures import UploadFile
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.image_utils import InvalidImageError, UploadTooLargeError, \
+    preprocess_image, read_upload  # noqa: E402
+
+
+def encode(image, **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", **kwargs)
+    return buffer.getvalue()
+
+
+class TestPreprocessImage(unittest.TestCase):
+
+    def test_downscales_to_max_side(self):
+        image_bytes = encode(Image.new("RGB", (4000, 3000), "white"))
+        array = preprocess_image(image_bytes, max_side=1000)
+        self.assertEqual(array.shape, (750, 1000, 3))
+
+    def test_small_images_are_not_upscaled(self):
+        image_bytes = encode(Image.new("L", (200, 100)))
+        array = preprocess_image(image_bytes, max_side=1000)
+        self.assertEqual(array.shape, (100, 200, 3))
+
+    def test_applies_exif_rotation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        image_bytes = encode(Image.new("RGB", (400, 200)), exif=exif)
+        array = preprocess_image(image_bytes, max_side=1000)
+        self.assertEqual(array.shape, (400, 200, 3))
+
+    def test_invalid_bytes(self):
+        with self.assertRaises(InvalidImageError):
+            preprocess_image(b"not an image")
+
+
+class TestReadUpload(unittest.TestCase):
+
+    def test_reads_whole_file(self):
+        upload = UploadFile(io.BytesIO(b"x" * 3000), filename="r.jpg")
+        data = asyncio.run(read_upload(upload, max_bytes=5000))
+        self.assertEqual(len(data), 3000)
+
+    def test_rejects_oversized_file(self):
+        upload = UploadFile(io.BytesIO(b"x" * 3000), filename="r.jpg")
+        with self.assertRaises(UploadTooLargeError):
+            asyncio.run(read_upload(upload, max_bytes=1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import sys
+import os
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.metrics import MetricsMiddleware, instrument_module, \
+    stage_timer  # noqa: E402
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_stage_timer(self):
+        before = sample("ocr_stage_duration_seconds_count", stage="cleanup")
+        with stage_timer("cleanup"):
+            pass
+        after = sample("ocr_stage_duration_seconds_count", stage="cleanup")
+        self.assertEqual(after, before + 1)
+
+    def test_instrument_module(self):
+        import torch
+
+        module = torch.nn.Linear(2, 2)
+        instrument_module(module, "detection")
+        before = sample("ocr_stage_duration_seconds_count", stage="detection")
+        module(torch.zeros(1, 2))
+        after = sample("ocr_stage_duration_seconds_count", stage="detection")
+        self.assertEqual(after, before + 1)
+
+    def test_process_memory_metrics(self):
+        rss = sample(
+            "server_process_memory_bytes",
+            role="single", pid=str(os.getpid()), kind="rss",
+        )
+        self.assertGreater(rss, 0)
+
+    def test_cache_hit_ratio(self):
+        from api.utils.cache_utils import LRUCache, TieredCache
+        from api.utils.metrics import register_cache
+
+        cache = TieredCache(LRUCache())
+        register_cache("test", cache)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+        self.assertEqual(sample("cache_hit_ratio", cache="test"), 0.5)
+
+    def test_middleware_labels_known_routes(self):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/known")
+        async def known():
+            return {}
+
+        client = TestClient(app)
+        before = sample("http_requests_total", path="/known", status="200")
+        other = sample("http_requests_total", path="other", status="404")
+        client.get("/known")
+        client.get("/unknown/123")
+
+        self.assertEqual(
+            sample("http_requests_total", path="/known", status="200"),
+            before + 1,
+        )
+        self.assertEqual(
+            sample("http_requests_total", path="other", status="404"),
+            other + 1,
+        )
+        self.assertEqual(sample("http_requests_in_flight", path="/known"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.model_registry import ModelRegistry, \
+    build_ocr_model, load_ocr_model  # noqa: E402
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def test_loads_once_on_first_use(self):
+        loader = Mock(return_value="model")
+        registry = ModelRegistry({"ocr": loader})
+        self.assertFalse(registry.is_ready())
+
+        self.assertEqual(registry.get("ocr"), "model")
+        self.assertEqual(registry.get("ocr"), "model")
+        loader.assert_called_once()
+        self.assertTrue(registry.is_ready())
+        status = registry.status()["models"]["ocr"]
+        self.assertIsNotNone(status["load_seconds"])
+
+    def test_warm_up_records_errors(self):
+        registry = ModelRegistry({
+            "ocr": Mock(return_value="model"),
+            "ner": Mock(side_effect=OSError("download failed")),
+        })
+        registry.warm_up()
+
+        status = registry.status()
+        self.assertFalse(status["ready"])
+        self.assertTrue(registry.is_ready(["ocr"]))
+        self.assertEqual(status["models"]["ner"]["error"], "download failed")
+        self.assertIsNotNone(status["warm_up_seconds"])
+
+    def test_background_warm_up(self):
+        registry = ModelRegistry({"ner": Mock(return_value="model")})
+        registry.start_warm_up()
+        registry._warm_up_thread.join(timeout=5)
+        self.assertTrue(registry.is_ready())
+
+
+class TestOCRProfiles(unittest.TestCase):
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            build_ocr_model("tiny")
+
+    @patch("doctr.models.ocr_predictor")
+    def test_profile_from_environment(self, mock_ocr_predictor):
+        with patch.dict(os.environ, {"OCR_PROFILE": "fast"}):
+            model = load_ocr_model()
+
+        mock_ocr_predictor.assert_called_once_with(
+            det_arch="db_mobilenet_v3_large",
+            reco_arch="crnn_mobilenet_v3_small",
+            pretrained=True,
+        )
+        self.assertEqual(
+            model.det_predictor.model.postprocessor.bin_thresh, 0.2
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import copy
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.model_registry import NER_MODEL_NAME, \
+    build_ner_pipeline  # noqa: E402
+from api.utils.ner_utils import convert_ner_entities_to_list  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "ner_corpus.txt")
+
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def build_toy_model():
+    """Tiny random RoBERTa whose classifier tags every token as FOOD."""
+    import torch
+    from tokenizers import ByteLevelBPETokenizer
+    from transformers import RobertaConfig, RobertaForTokenClassification, \
+        RobertaTokenizerFast
+
+    special_tokens = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(
+        load_corpus(), vocab_size=400, special_tokens=special_tokens
+    )
+    tokenizer = RobertaTokenizerFast(tokenizer_object=bpe._tokenizer)
+
+    torch.manual_seed(0)
+    config = RobertaConfig(
+        vocab_size=tokenizer.vocab_size, hidden_size=32,
+        num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+        id2label={0: "O", 1: "B-FOOD", 2: "I-FOOD"},
+        label2id={"O": 0, "B-FOOD": 1, "I-FOOD": 2},
+    )
+    model = RobertaForTokenClassification(config).eval()
+    with torch.no_grad():
+        model.classifier.bias.copy_(torch.tensor([0.0, 50.0, 0.0]))
+    return model, tokenizer
+
+
+class TestNERBackends(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            build_ner_pipeline(None, None, backend="tpu")
+
+    def test_quantized_pipeline_output_shape(self):
+        import torch
+
+        model, tokenizer = build_toy_model()
+        reference = build_ner_pipeline(copy.deepcopy(model), tokenizer)
+        quantized = build_ner_pipeline(model, tokenizer, "quantized")
+        self.assertIsInstance(
+            quantized.model.classifier,
+            torch.ao.nn.quantized.dynamic.Linear,
+        )
+
+        text = load_corpus()[0]
+        expected = reference(text, aggregation_strategy="simple")
+        result = quantized(text, aggregation_strategy="simple")
+        self.assertTrue(result)
+        for ent in result:
+            self.assertTrue(
+                {"entity_group", "score", "start", "end"} <= set(ent)
+            )
+        self.assertEqual(
+            [(e["entity_group"], e["start"], e["end"]) for e in result],
+            [(e["entity_group"], e["start"], e["end"]) for e in expected],
+        )
+
+    def test_quantized_parity_on_corpus(self):
+        from transformers import AutoModelForTokenClassification, \
+            AutoTokenizer
+
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_NAME)
+            model = AutoModelForTokenClassification.from_pretrained(
+                NER_MODEL_NAME
+            )
+        except OSError:
+            self.skipTest(f"{NER_MODEL_NAME} is not available offline")
+
+        reference = build_ner_pipeline(copy.deepcopy(model), tokenizer)
+        quantized = build_ner_pipeline(model, tokenizer, "quantized")
+        for text in load_corpus():
+            expected = reference(text, aggregation_strategy="simple")
+            result = quantized(text, aggregation_strategy="simple")
+            self.assertEqual(
+                convert_ner_entities_to_list(text, result),
+                convert_ner_entities_to_list(text, expected),
+                text,
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
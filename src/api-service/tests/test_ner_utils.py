@@ -4,11 +4,14 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import re
 import unittest
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from api.utils.ner_utils import convert_ner_entities_to_list  # noqa: E402
+from api.utils.ner_utils import convert_ner_entities_to_list, \
+    merge_window_entities, split_long_lines, \
+    split_text_windows  # noqa: E402
 
 
 class TestNERUtils(unittest.TestCase):
@@ -113,5 +116,99 @@ class TestNERUtils(unittest.TestCase):
         self.assertEqual(result, ["apple", "banana"])
 
 
+def tag_lines(text):
+    # Fake NER: every comma-separated line is a FOOD entity
+    entities, start = [], 0
+    for part in text.split(", "):
+        entities.append({"score": 0.999, "entity_group": "FOOD",
+                         "start": start, "end": start + len(part)})
+        start += len(part) + 2
+    return entities
+
+
+def tag_words(text):
+    # Fake NER: every word is a FOOD entity
+    return [{"score": 0.999, "entity_group": "FOOD",
+             "start": m.start(), "end": m.end()}
+            for m in re.finditer(r"[^\s,]+", text)]
+
+
+def count_words(words):
+    return [1] * len(words)
+
+
+class TestNERWindows(unittest.TestCase):
+
+    def test_short_text_is_one_window(self):
+        lines = ["apple", "banana"]
+        windows = split_text_windows(lines, [1, 1], max_tokens=10)
+        self.assertEqual(len(windows), 1)
+        self.assertEqual((windows[0]["start"], windows[0]["end"]), (0, 13))
+
+    def test_windows_fit_budget_and_overlap(self):
+        lines = [f"item{i}" for i in range(10)]
+        windows = split_text_windows(
+            lines, [3] * 10, max_tokens=16, overlap=1
+        )
+        text = ", ".join(lines)
+        chunks = [text[w["start"]:w["end"]].split(", ") for w in windows]
+        self.assertEqual(chunks[0], ["item0", "item1", "item2", "item3"])
+        self.assertEqual(chunks[1][0], "item3")
+        self.assertEqual(chunks[-1][-1], "item9")
+        self.assertTrue(all(len(chunk) <= 4 for chunk in chunks))
+
+    def test_merged_entities_cover_every_line_once(self):
+        lines = ["green apple", "milk", "rye bread", "eggs", "salt", "cod"]
+        text = ", ".join(lines)
+        windows = split_text_windows(
+            lines, [2, 1, 2, 1, 1, 1], max_tokens=6, overlap=1
+        )
+        self.assertGreater(len(windows), 1)
+
+        entities = merge_window_entities(
+            windows, [tag_lines(text[w["start"]:w["end"]]) for w in windows]
+        )
+        self.assertEqual(
+            [text[e["start"]:e["end"]] for e in entities], lines
+        )
+        self.assertEqual(
+            convert_ner_entities_to_list(text, entities), lines
+        )
+
+    def test_long_line_is_split_on_words(self):
+        words = [f"w{i}" for i in range(30)]
+        lines = ["milk", " ".join(words), "eggs"]
+        text = ", ".join(lines)
+        pieces, counts, offsets = split_long_lines(
+            lines, [1, 30, 1], count_words, max_tokens=8
+        )
+        self.assertEqual((pieces[0], pieces[-1]), ("milk", "eggs"))
+        self.assertTrue(all(count + 1 <= 8 for count in counts))
+        for piece, offset in zip(pieces, offsets):
+            self.assertEqual(text[offset:offset + len(piece)], piece)
+
+        windows = split_text_windows(
+            pieces, counts, max_tokens=8, overlap=1, offsets=offsets
+        )
+        chunks = [text[w["start"]:w["end"]] for w in windows]
+        self.assertTrue(all(len(chunk.split()) <= 7 for chunk in chunks))
+        entities = merge_window_entities(
+            windows, [tag_words(chunk) for chunk in chunks]
+        )
+        self.assertEqual(
+            [text[e["start"]:e["end"]] for e in entities],
+            text.replace(",", "").split(),
+        )
+
+    def test_overlong_word_is_cut(self):
+        pieces, counts, offsets = split_long_lines(
+            ["a" * 20], [20], lambda words: [len(w) for w in words],
+            max_tokens=8,
+        )
+        self.assertEqual(pieces, ["a" * 7, "a" * 7, "a" * 6])
+        self.assertEqual(counts, [7, 7, 6])
+        self.assertEqual(offsets, [0, 7, 14])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import random
+import unittest
+from unittest.mock import patch
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.nutrient_vectors import COMMON_NUTRIENTS, FoodVector, \
+    aggregate_nutrition_batch, aggregate_nutrition_vectors  # noqa: E402
+from api.utils.nutrition_utils import \
+    aggregate_nutrition_info_with_units  # noqa: E402
+
+
+def random_recipe(rng):
+    recipe = {}
+    for i in range(rng.randrange(0, 25)):
+        names = rng.sample(COMMON_NUTRIENTS, rng.randrange(0, 40))
+        # Occasionally nutrients outside the built-in vocabulary
+        names += [f"Rare nutrient {rng.randrange(50)}"] * (rng.random() < .3)
+        recipe[f"ingredient {i}"] = {
+            "description": "Food",
+            "dataType": "Survey (FNDDS)",
+            "servingSize": rng.choice([100, 28, 85.5, 13.3, None]),
+            "servingSizeUnit": rng.choice(["g", "G", "g", "ml"]),
+            "nutrients": {
+                name: {
+                    "value": rng.choice(
+                        [0, rng.randrange(900), rng.uniform(0, 1e3)]
+                    ),
+                    "unit": rng.choice(["G", "MG", "KCAL", "kJ"]),
+                }
+                for name in names
+            },
+        }
+    return recipe
+
+
+class TestNutrientVectors(unittest.TestCase):
+
+    def test_identical_to_dict_aggregation(self):
+        rng = random.Random(7)
+        with patch("builtins.print"):
+            for _ in range(300):
+                recipe = random_recipe(rng)
+                expected = aggregate_nutrition_info_with_units(recipe)
+                result = aggregate_nutrition_vectors(recipe)
+                # Same keys in the same order, units and exact floats
+                self.assertEqual(
+                    list(result.items()), list(expected.items())
+                )
+
+    def test_batch_matches_single_recipes(self):
+        rng = random.Random(11)
+        recipes = [random_recipe(rng) for _ in range(20)]
+        with patch("builtins.print"):
+            expected = [
+                aggregate_nutrition_info_with_units(r) for r in recipes
+            ]
+            self.assertEqual(aggregate_nutrition_batch(recipes), expected)
+            self.assertEqual(aggregate_nutrition_batch([]), [])
+
+    def test_unscalable_records_warn(self):
+        record = {"servingSize": "N/A", "servingSizeUnit": "", "nutrients": {}}
+        self.assertIsNone(FoodVector.from_record(record))
+        with patch("builtins.print") as mock_print:
+            self.assertEqual(aggregate_nutrition_vectors({"x": record}), {})
+        mock_print.assert_called_once_with(
+            "Warning: Cannot scale x; serving size is missing."
+        )
+
+    def test_vectors_are_reused_per_record(self):
+        record = {
+            "servingSize": 50,
+            "servingSizeUnit": "g",
+            "nutrients": {"Protein": {"value": 2, "unit": "G"}},
+        }
+        with patch.object(
+            FoodVector, "from_record", wraps=FoodVector.from_record
+        ) as from_record:
+            aggregate_nutrition_vectors({"egg": record})
+            result = aggregate_nutrition_vectors({"egg": record})
+            from_record.assert_called_once()
+        self.assertEqual(result, {"Protein": {"value": 4.0, "unit": "G"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,10 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from unittest import mock
+import json
 import sys
 import os
 
@@ -13,15 +15,17 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from api.routers.nutrition import router  # noqa: E402
+from api.utils.nutrition_utils import \
+    aggregate_nutrition_info_with_units  # noqa: E402
 
 client = TestClient(router)
 
 
 def test_get_nutritional_info():
     with mock.patch(
-        'api.routers.nutrition.get_nutrition_info'
+        'api.routers.nutrition.fetch_nutrition_info'
     ) as mock_get_nutrition_info, mock.patch(
-        'api.routers.nutrition.aggregate_nutrition_info_with_units'
+        'api.routers.nutrition.aggregate_nutrition_vectors'
     ) as mock_aggregate_nutrition_info:
 
         mock_get_nutrition_info.return_value = {
@@ -54,3 +58,77 @@ def test_get_nutritional_info():
                 "Calcium, Ca": {"value": 0.0, "unit": "MG"}
             }
         }
+
+
+def food_record(protein, serving_size=100):
+    return {
+        "description": "Food",
+        "dataType": "Survey (FNDDS)",
+        "servingSize": serving_size,
+        "servingSizeUnit": "g",
+        "nutrients": {"Protein": {"value": protein, "unit": "G"}},
+    }
+
+
+BATCH_RECORDS = {
+    "chicken": food_record(20),
+    "rice": food_record(3, serving_size=50),
+    "salt": food_record(0),
+}
+
+
+def test_batch_resolves_shared_ingredients_once():
+    with mock.patch(
+        'api.routers.nutrition.fetch_nutrition_info',
+        return_value=BATCH_RECORDS,
+    ) as mock_fetch:
+        response = client.post("/nutrition/batch", json={"recipes": [
+            {"ingredients": ["chicken", "rice"]},
+            {"ingredients": ["rice", "unknown"]},
+            {"ingredients": []},
+        ]})
+
+    mock_fetch.assert_called_once_with(["chicken", "rice", "rice", "unknown"])
+    assert response.status_code == 200
+    assert response.json() == {"results": [
+        {"nutrition_data": aggregate_nutrition_info_with_units(
+            {"chicken": BATCH_RECORDS["chicken"],
+             "rice": BATCH_RECORDS["rice"]}
+        )},
+        {"nutrition_data": {"Protein": {"value": 6.0, "unit": "G"}}},
+        {"nutrition_data": {}},
+    ]}
+
+
+def test_large_batches_stream_ndjson():
+    recipes = [{"ingredients": ["chicken", "salt"]}] * 5
+    with mock.patch(
+        'api.routers.nutrition.fetch_nutrition_info',
+        return_value=BATCH_RECORDS,
+    ), mock.patch('api.routers.nutrition.STREAM_THRESHOLD', 3), \
+            mock.patch('api.routers.nutrition.STREAM_CHUNK_SIZE', 2):
+        response = client.post("/nutrition/batch", json={"recipes": recipes})
+        small = client.post(
+            "/nutrition/batch",
+            json={"recipes": recipes[:1]},
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert lines[4]["nutrition_data"] == {
+        "Protein": {"value": 20.0, "unit": "G"}
+    }
+    assert small.headers["content-type"] == "application/x-ndjson"
+    assert len(small.text.splitlines()) == 1
+
+
+def test_batch_size_limit():
+    app = FastAPI()
+    app.include_router(router)
+    with mock.patch('api.routers.nutrition.MAX_BATCH_RECIPES', 2):
+        response = TestClient(app).post("/nutrition/batch", json={
+            "recipes": [{"ingredients": ["salt"]}] * 3
+        })
+    assert response.status_code == 413
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+import httpx
+import sys
+import os
+from prometheus_client import REGISTRY
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.cache_utils import create_cache_from_env  # noqa: E402
+from api.utils.nutrition_cache import nutrition_cache, \
+    normalize_ingredient  # noqa: E402
+from api.utils.nutrition_utils import fetch_nutrition_info  # noqa: E402
+from cli import warm_nutrition_cache  # noqa: E402
+
+
+def search_handler(queries):
+    def handler(request):
+        query = request.url.params["query"]
+        queries.append(query)
+        if query == "unknown":
+            return httpx.Response(200, json={"foods": []})
+        if query == "flaky":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"foods": [{
+            "description": query.title(),
+            "dataType": "Survey (FNDDS)",
+            "foodNutrients": [
+                {"nutrientName": "Protein", "value": 1.0, "unitName": "G"}
+            ],
+        }]})
+    return handler
+
+
+def fetch(ingredients, handler):
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await fetch_nutrition_info(ingredients, client=client)
+
+    return asyncio.run(run())
+
+
+class TestNutritionCache(unittest.TestCase):
+
+    def setUp(self):
+        nutrition_cache.clear()
+
+    def test_normalize_ingredient(self):
+        self.assertEqual(normalize_ingredient("  Olive   OIL "), "olive oil")
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        queries = []
+        handler = search_handler(queries)
+        first = fetch(["olive oil", "unknown"], handler)
+        second = fetch(["Olive  Oil", "unknown"], handler)
+
+        self.assertEqual(sorted(queries), ["olive oil", "unknown"])
+        self.assertEqual(list(first), ["olive oil"])
+        self.assertEqual(second["Olive  Oil"], first["olive oil"])
+
+    def test_failed_requests_are_not_cached(self):
+        queries = []
+        handler = search_handler(queries)
+        with patch("api.utils.usda_client.USDA_MAX_RETRIES", 0):
+            fetch(["flaky"], handler)
+            fetch(["flaky"], handler)
+        self.assertEqual(queries, ["flaky", "flaky"])
+
+    def test_persistent_tier(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {"NUTRITION_CACHE_DIR": tmp, "NUTRITION_CACHE_TTL": "60"}
+            with patch.dict(os.environ, env):
+                cache = create_cache_from_env("NUTRITION")
+                cache.set("salt", {"description": "Salt"})
+                reopened = create_cache_from_env("NUTRITION")
+
+            self.assertTrue(
+                os.path.exists(os.path.join(tmp, "nutrition_cache.sqlite"))
+            )
+            self.assertEqual(reopened.get("salt"), {"description": "Salt"})
+            self.assertEqual(reopened.disk_hits, 1)
+
+    def test_hit_and_miss_metrics(self):
+        def sample(name, **labels):
+            return REGISTRY.get_sample_value(
+                name, {"cache": "nutrition", **labels}
+            )
+
+        queries = []
+        fetch(["rice"], search_handler(queries))
+        fetch(["rice"], search_handler(queries))
+        self.assertEqual(
+            sample("cache_hits_total", tier="memory"), nutrition_cache.hits
+        )
+        self.assertEqual(sample("cache_misses_total"), nutrition_cache.misses)
+        self.assertEqual(sample("cache_entries"), 1)
+
+    def test_warm_up_command(self):
+        queries = []
+        transport = httpx.MockTransport(search_handler(queries))
+        client = httpx.AsyncClient(transport=transport)
+        with patch(
+            "api.utils.nutrition_utils.get_async_client", return_value=client
+        ):
+            found = warm_nutrition_cache(["salt", "sugar", "unknown"])
+
+        self.assertEqual(list(found), ["salt", "sugar"])
+        self.assertEqual(nutrition_cache.get("sugar")["description"], "Sugar")
+        self.assertEqual(nutrition_cache.get("unknown"), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
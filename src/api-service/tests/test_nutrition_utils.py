@@ -5,17 +5,36 @@
 # LICENSE file in the root directory of this source tree.
 
 
+import asyncio
+import json
 import unittest
 from unittest.mock import patch
+import httpx
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from api.utils.nutrition_utils import get_nutrition_info, \
-    aggregate_nutrition_info_with_units  # noqa: E402
+from api.utils.nutrition_utils import get_nutrition_info, UNRESOLVED, \
+    aggregate_nutrition_info_with_units, fetch_nutrition_info  # noqa: E402
+from api.utils.nutrition_cache import nutrition_cache  # noqa: E402
+
+
+def search_response(description, data_type="Survey (FNDDS)", protein=1.0):
+    return {
+        "foods": [{
+            "description": description,
+            "dataType": data_type,
+            "foodNutrients": [
+                {"nutrientName": "Protein", "value": protein, "unitName": "G"}
+            ],
+        }]
+    }
 
 
 class TestNutritionUtils(unittest.TestCase):
 
+    def setUp(self):
+        nutrition_cache.clear()
+
     @patch('api.utils.nutrition_utils.requests.get')
     def test_get_nutrition_info_success(self, mock_get):
         # Mock response data
@@ -43,7 +62,7 @@ class TestNutritionUtils(unittest.TestCase):
         }
 
         mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_response
+        mock_get.return_value.content = json.dumps(mock_response)
 
         result = get_nutrition_info(['chicken'])
 
@@ -65,7 +84,7 @@ class TestNutritionUtils(unittest.TestCase):
     def test_get_nutrition_info_no_data(self, mock_get):
         mock_response = {"foods": []}
         mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_response
+        mock_get.return_value.content = json.dumps(mock_response)
 
         result = get_nutrition_info(['unknown_ingredient'])
 
@@ -128,7 +147,7 @@ class TestNutritionUtils(unittest.TestCase):
     def test_get_nutrition_info_no_foods(self, mock_get):
         mock_response = {"foods": []}
         mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_response
+        mock_get.return_value.content = json.dumps(mock_response)
 
         result = get_nutrition_info(['unknown_ingredient'])
         self.assertEqual(result, {})
@@ -153,7 +172,7 @@ class TestNutritionUtils(unittest.TestCase):
             ]
         }
         mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_response
+        mock_get.return_value.content = json.dumps(mock_response)
 
         result = get_nutrition_info(['ingredient_with_no_serving_size'])
         expected_result = {
@@ -170,5 +189,87 @@ class TestNutritionUtils(unittest.TestCase):
         self.assertEqual(result, expected_result)
 
 
+class TestFetchNutritionInfo(unittest.TestCase):
+
+    def setUp(self):
+        nutrition_cache.clear()
+
+    def fetch(self, ingredients, handler, on_result=None):
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await fetch_nutrition_info(
+                    ingredients, client=client, on_result=on_result
+                )
+
+        return asyncio.run(run())
+
+    def test_same_records_as_sync_version(self):
+        queries = []
+
+        def handler(request):
+            query = request.url.params["query"]
+            queries.append(query)
+            if query == "unknown":
+                return httpx.Response(200, json={"foods": []})
+            return httpx.Response(200, json=search_response(query.title()))
+
+        result = self.fetch(["chicken", "rice", "unknown", "rice"], handler)
+
+        self.assertEqual(sorted(queries), ["chicken", "rice", "unknown"])
+        self.assertEqual(list(result), ["chicken", "rice"])
+        self.assertEqual(result["rice"], {
+            "description": "Rice",
+            "dataType": "Survey (FNDDS)",
+            "servingSize": 100,
+            "servingSizeUnit": "g",
+            "nutrients": {"Protein": {"value": 1.0, "unit": "G"}},
+        })
+
+    def test_lookups_run_concurrently(self):
+        in_flight = []
+        peak = []
+
+        async def handler(request):
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            return httpx.Response(200, json=search_response("Food"))
+
+        with patch("api.utils.nutrition_utils.NUTRITION_CONCURRENCY", 3):
+            result = self.fetch([f"food {i}" for i in range(6)], handler)
+
+        self.assertEqual(len(result), 6)
+        self.assertEqual(max(peak), 3)
+
+    def test_failures_drop_the_ingredient(self):
+        def handler(request):
+            if request.url.params["query"] == "salt":
+                raise httpx.ConnectTimeout("timed out")
+            return httpx.Response(500)
+
+        self.assertEqual(self.fetch(["salt", "pepper"], handler), {})
+
+    def test_each_ingredient_is_reported_as_it_settles(self):
+        def handler(request):
+            query = request.url.params["query"]
+            if query == "salt":
+                return httpx.Response(500)
+            if query == "unknown":
+                return httpx.Response(200, json={"foods": []})
+            return httpx.Response(200, json=search_response(query.title()))
+
+        settled = {}
+        result = self.fetch(
+            ["rice", "salt", "unknown", "rice"], handler,
+            on_result=settled.__setitem__,
+        )
+
+        self.assertEqual(settled, {
+            "rice": result["rice"], "salt": UNRESOLVED, "unknown": None,
+        })
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,33 +9,32 @@ import os
 import pytest
 from unittest.mock import Mock, patch
 from fastapi.testclient import TestClient
-import numpy as np
+import re
 
 path_to_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
 sys.path.insert(0, path_to_src)
 
+from conftest import fake_ner, make_image_bytes  # noqa: E402
+
 
 @pytest.fixture
 def mock_dependencies():
-    with patch("doctr.io.DocumentFile.from_images") as mock_from_images, patch(
-        "doctr.models.ocr_predictor"
-    ) as mock_ocr_predictor, patch(
-        "api.routers.ocr.pipeline"
-    ) as mock_pipeline:
-        mock_from_images.return_value = [
-            np.zeros((100, 100, 3), dtype=np.uint8)
-        ]
-
-        mock_ocr_result = Mock()
-        mock_ocr_result.render.return_value = "ingredient1\ningredient2"
-        mock_ocr_model = Mock(return_value=mock_ocr_result)
-        mock_ocr_predictor.return_value = mock_ocr_model
-
-        mock_pipeline.return_value = [
-            {"entity_group": "ingredient", "start": 0, "end": 11},
-            {"entity_group": "ingredient", "start": 12, "end": 23},
-        ]
+    from api.utils.model_registry import registry
+
+    mock_ocr_result = Mock()
+    mock_ocr_result.render.return_value = "ingredient1\ningredient2"
+    mock_ocr_model = Mock(return_value=mock_ocr_result)
+
+    entities = [
+        {"entity_group": "FOOD", "score": 0.999, "start": 0, "end": 10},
+        {"entity_group": "FOOD", "score": 0.999, "start": 12, "end": 22},
+    ]
+    mock_ner_pipeline = Mock(
+        side_effect=lambda texts, **kwargs: [entities for _ in texts]
+    )
 
+    with patch.dict(registry.models,
+                    {"ocr": mock_ocr_model, "ner": mock_ner_pipeline}):
         yield
 
 
@@ -46,12 +45,236 @@ def test_client():
     return TestClient(router)
 
 
+@pytest.fixture
+def app_client():
+    # A full app turns HTTPExceptions into error responses
+    from fastapi import FastAPI
+    from api.routers.ocr import router
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
 def test_ocr_extract_ingredients(mock_dependencies, test_client):
     response = test_client.post(
         "/ocr",
-        files={"file": ("test_image.jpg", b"fake_image_data", "image/jpeg")},
+        files={"file": ("test_image.jpg", make_image_bytes(), "image/jpeg")},
     )
 
     print("Response JSON:", response.json())
 
     assert response.status_code == 200
+    assert response.json() == {"ingredients": ["ingredient", "ingredient"]}
+
+
+def test_ocr_batch_extract_ingredients(test_client):
+    from api.utils.model_registry import registry
+
+    page_a, page_b = Mock(), Mock()
+    page_a.render.return_value = "Tomatoes 2.99"
+    page_b.render.return_value = "tomatoes\nBasil $1"
+    ocr_model = Mock()
+    ocr_model.return_value.pages = [page_a, page_b]
+    with patch.dict(registry.models,
+                    {"ocr": ocr_model, "ner": Mock(side_effect=fake_ner)}):
+        response = test_client.post(
+            "/ocr/batch",
+            files=[
+                ("files", ("a.jpg", make_image_bytes("red"), "image/jpeg")),
+                ("files", ("b.jpg", make_image_bytes("blue"), "image/jpeg")),
+            ],
+        )
+
+    assert response.status_code == 200
+    pages = ocr_model.call_args.args[0]
+    assert [page.shape for page in pages] == [(100, 100, 3), (100, 100, 3)]
+    assert response.json() == {
+        "results": [
+            {"filename": "a.jpg", "ingredients": ["Tomatoes"]},
+            {"filename": "b.jpg", "ingredients": ["tomatoes", "Basil"]},
+        ],
+        "ingredients": ["Tomatoes", "Basil"],
+    }
+
+
+def test_ocr_cache_skips_models_on_reupload(test_client):
+    from api.utils.model_registry import registry
+
+    with patch("api.routers.ocr.run_ocr", return_value="Butter 3.49") \
+            as run_ocr, \
+            patch.dict(registry.models, {"ner": Mock(side_effect=fake_ner)}):
+        files = {"file": ("r.jpg", make_image_bytes("green"), "image/jpeg")}
+        first = test_client.post("/ocr", files=files)
+        second = test_client.post("/ocr", files=files)
+
+    assert first.json() == second.json() == {"ingredients": ["Butter"]}
+    run_ocr.assert_called_once()
+
+
+def test_ocr_cache_is_keyed_by_model_settings(test_client):
+    from api.utils.metrics import cache_collector
+    from api.utils.model_registry import registry
+
+    files = {"file": ("r.jpg", make_image_bytes("orange"), "image/jpeg")}
+    with patch("api.routers.ocr.run_ocr", return_value="Butter 3.49") \
+            as run_ocr, \
+            patch.dict(registry.models, {"ner": Mock(side_effect=fake_ner)}):
+        test_client.post("/ocr", files=files)
+        with patch.dict(os.environ, {"OCR_PROFILE": "fast"}):
+            test_client.post("/ocr", files=files)
+        with patch.dict(os.environ, {"NER_BACKEND": "quantized"}):
+            test_client.post("/ocr", files=files)
+
+    assert run_ocr.call_count == 3
+    assert cache_collector.caches["ocr"].misses >= 3
+
+
+def test_ocr_rejects_invalid_image(mock_dependencies, app_client):
+    response = app_client.post(
+        "/ocr",
+        files={"file": ("test_image.jpg", b"not_an_image", "image/jpeg")},
+    )
+    assert response.status_code == 400
+
+
+def test_ocr_rejects_large_upload(mock_dependencies, app_client):
+    with patch("api.utils.image_utils.MAX_UPLOAD_BYTES", 1024):
+        response = app_client.post(
+            "/ocr",
+            files={"file": ("big.jpg", b"0" * 4096, "image/jpeg")},
+        )
+    assert response.status_code == 413
+
+
+def test_long_text_is_windowed_for_ner():
+    from api.routers import ocr
+    from api.utils.model_registry import registry
+
+    lines = [f"ingredient {chr(97 + i % 26)}" for i in range(200)]
+    text = ", ".join(lines)
+
+    class FakeTokenizer:
+        def __call__(self, texts, add_special_tokens=True):
+            return {"input_ids": [t.split() for t in texts]}
+
+    ner_pipeline = Mock(side_effect=fake_ner)
+    ner_pipeline.tokenizer = FakeTokenizer()
+    with patch.dict(registry.models, {"ner": ner_pipeline}), \
+            patch.object(ocr, "NER_WINDOW_TOKENS", 60):
+        [entities] = ocr.run_ner_batch([text])
+
+    chunks = ner_pipeline.call_args.args[0]
+    assert len(chunks) > 1
+    assert all(len(chunk.split(", ")) <= 20 for chunk in chunks)
+    assert [text[e["start"]:e["end"]] for e in entities] == lines
+
+
+def test_ner_windows_count_the_space_before_each_line():
+    from api.routers import ocr
+    from api.utils.model_registry import registry
+
+    lines = [f"ingredient {chr(97 + i % 26)}" for i in range(200)]
+    text = ", ".join(lines)
+
+    class FakeTokenizer:
+        # With byte-level BPE a word preceded by a space can take more
+        # tokens than the bare word; here it takes two
+        def __call__(self, texts, add_special_tokens=True):
+            return {"input_ids": [
+                [0] * sum(
+                    2 if token.startswith(" ") else 1
+                    for token in re.findall(r" ?\w+|,", t)
+                )
+                for t in texts
+            ]}
+
+    ner_pipeline = Mock(side_effect=fake_ner)
+    ner_pipeline.tokenizer = FakeTokenizer()
+    with patch.dict(registry.models, {"ner": ner_pipeline}), \
+            patch.object(ocr, "NER_WINDOW_TOKENS", 60):
+        [entities] = ocr.run_ner_batch([text])
+
+    chunks = ner_pipeline.call_args.args[0]
+    token_counts = [
+        len(ids) for ids in FakeTokenizer()(chunks)["input_ids"]
+    ]
+    assert max(token_counts) <= 60
+    assert [text[e["start"]:e["end"]] for e in entities] == lines
+
+
+def test_long_line_is_split_to_fit_ner_window(test_client):
+    from api.routers import ocr
+    from api.utils.model_registry import registry
+
+    # Clean text has no digits, so words are numbered in letters
+    words = ["".join(chr(97 + int(d)) for d in str(i)) for i in range(500)]
+    text = " ".join(words)
+
+    class FakeTokenizer:
+        def __call__(self, texts, add_special_tokens=True):
+            return {"input_ids": [t.split() for t in texts]}
+
+    ner_pipeline = Mock(side_effect=fake_ner)
+    ner_pipeline.tokenizer = FakeTokenizer()
+    with patch.dict(registry.models, {"ner": ner_pipeline}), \
+            patch.object(ocr, "NER_WINDOW_TOKENS", 60):
+        response = test_client.post("/ingredients", json={"text": text})
+
+    assert response.status_code == 200
+    chunks = ner_pipeline.call_args.args[0]
+    assert len(chunks) > 1
+    assert all(len(chunk.split()) < 60 for chunk in chunks)
+    assert chunks[0].split()[0] == "a" and chunks[-1].split()[-1] == "ejj"
+
+
+def test_ner_cache_is_shared_by_photos_with_the_same_text(test_client):
+    from api.utils.model_registry import registry
+
+    ner_pipeline = Mock(side_effect=fake_ner)
+    with patch("api.routers.ocr.run_ocr",
+               side_effect=["Oat  milk 2.49", "Oat milk\t$2.49"]) as run_ocr, \
+            patch.dict(registry.models, {"ner": ner_pipeline}):
+        first = test_client.post("/ocr", files={
+            "file": ("a.jpg", make_image_bytes("purple"), "image/jpeg")
+        })
+        second = test_client.post("/ocr", files={
+            "file": ("b.jpg", make_image_bytes("teal"), "image/jpeg")
+        })
+
+    assert first.json() == second.json() == {"ingredients": ["Oat milk"]}
+    assert run_ocr.call_count == 2
+    ner_pipeline.assert_called_once()
+
+
+def test_ingredients_from_text_skip_ocr(app_client):
+    from api.routers.ocr import ner_cache
+    from api.utils.model_registry import registry
+
+    ner_pipeline = Mock(side_effect=fake_ner)
+    ocr_model = Mock()
+    hits, misses = ner_cache.hits, ner_cache.misses
+    with patch.dict(registry.models,
+                    {"ocr": ocr_model, "ner": ner_pipeline}):
+        first = app_client.post(
+            "/ingredients", json={"text": "Eggs 12\nFlour 1.99"}
+        )
+        second = app_client.post(
+            "/ingredients", json={"text": "Eggs   12\nFlour $1.99\n"}
+        )
+        empty = app_client.post("/ingredients", json={"text": "4.99"})
+
+    assert first.status_code == 200
+    assert first.json() == second.json() == {"ingredients": ["Eggs", "Flour"]}
+    assert empty.json() == {"ingredients": []}
+    ocr_model.assert_not_called()
+    ner_pipeline.assert_called_once()
+    assert (ner_cache.hits - hits, ner_cache.misses - misses) == (1, 1)
+
+
+def test_ingredients_rejects_long_text(app_client):
+    with patch("api.routers.ocr.MAX_TEXT_CHARS", 10):
+        response = app_client.post(
+            "/ingredients", json={"text": "Tomatoes and basil"}
+        )
+    assert response.status_code == 413
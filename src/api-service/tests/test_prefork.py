@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+import unittest
+import urllib.request
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.memory import child_pids, format_server_memory, \
+    process_memory, server_memory  # noqa: E402
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEIGHTS_BYTES = 64 * 1024 * 1024
+
+# A stand-in for api.service: the preload allocates "weights" in the
+# master, and every worker reports the memory of the whole server
+APP = textwrap.dedent(f"""
+    import os
+    from fastapi import FastAPI
+    from api.utils.memory import server_memory
+
+    app = FastAPI()
+    weights = None
+
+
+    def preload():
+        global weights
+        weights = b"w" * {WEIGHTS_BYTES}
+
+
+    @app.get("/memory")
+    def memory():
+        return {{
+            "pid": os.getpid(),
+            "weights": len(weights),
+            "server": server_memory(os.getppid()),
+        }}
+""")
+
+SERVER = textwrap.dedent("""
+    import prefork_app
+    from api.utils import prefork
+
+    prefork.MIN_WORKER_LIFETIME = 0
+    prefork.PreforkServer(
+        "prefork_app:app", host="127.0.0.1", port=0, workers=2,
+        preload=prefork_app.preload, log_level="warning",
+        memory_log_seconds=0,
+    ).serve()
+""")
+
+
+class TestMemory(unittest.TestCase):
+
+    def test_process_memory(self):
+        memory = process_memory()
+        self.assertGreater(memory["rss"], 0)
+        if "pss" in memory:
+            self.assertLessEqual(memory["pss"], memory["rss"])
+            self.assertEqual(
+                memory["private"] + memory["shared"], memory["rss"]
+            )
+        self.assertIsNone(process_memory(2 ** 22 + 1))
+
+    def test_server_memory(self):
+        child = subprocess.Popen([sys.executable, "-c", "input()"],
+                                 stdin=subprocess.PIPE)
+        try:
+            self.assertIn(child.pid, child_pids(os.getpid()))
+            report = server_memory(os.getpid())
+            self.assertIn(child.pid, report["workers"])
+            self.assertGreaterEqual(
+                report["total_rss"], report["workers"][child.pid]["rss"]
+            )
+            self.assertIn("worker", format_server_memory(report))
+        finally:
+            child.communicate(b"\n")
+
+
+class TestPreforkServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = os.path.join(SRC, "tests", "prefork_app.py")
+        with open(self.tmp, "w") as f:
+            f.write(APP)
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            [SRC, os.path.join(SRC, "tests")]
+        )
+        self.server = subprocess.Popen(
+            [sys.executable, "-c", SERVER],
+            env=env,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        line = self.server.stdout.readline()
+        self.port = int(line.split(":")[1].split()[0])
+
+    def tearDown(self):
+        if self.server.poll() is None:
+            self.server.kill()
+        self.server.wait()
+        self.server.stdout.close()
+        os.remove(self.tmp)
+
+    def get_memory(self, workers=2, timeout=20):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with urllib.request.urlopen(
+                    f"http://127.0.0.1:{self.port}/memory", timeout=5
+                ) as response:
+                    body = json.load(response)
+                if len(body["server"]["workers"]) == workers:
+                    return body
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                self.fail("Pre-fork server did not come up")
+            time.sleep(0.1)
+
+    def test_workers_share_preloaded_memory(self):
+        body = self.get_memory()
+        self.assertEqual(body["weights"], WEIGHTS_BYTES)
+        workers = body["server"]["workers"]
+        self.assertIn(str(body["pid"]), workers)
+        for memory in workers.values():
+            self.assertGreater(memory["rss"], WEIGHTS_BYTES)
+            # The weights are shared with the master, not copied
+            self.assertLess(memory["private"], WEIGHTS_BYTES / 2)
+        self.assertLess(
+            body["server"]["total_pss"], body["server"]["total_rss"]
+        )
+
+        # A worker that dies is replaced
+        os.kill(body["pid"], signal.SIGKILL)
+        deadline = time.monotonic() + 20
+        while str(body["pid"]) in self.get_memory()["server"]["workers"]:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.1)
+
+        self.server.send_signal(signal.SIGTERM)
+        self.assertEqual(self.server.wait(timeout=20), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
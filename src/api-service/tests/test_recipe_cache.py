@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import sys
+
+path_to_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+sys.path.insert(0, path_to_src)
+
+from api.utils.nutrition_cache import cache_food, nutrition_cache, \
+    record_stamps  # noqa: E402
+from api.utils.recipe_cache import etag_matches, recipe_cache, \
+    recipe_key  # noqa: E402
+from conftest import RECORDS, post, record  # noqa: E402
+
+
+def test_recipe_key_is_the_normalized_multiset():
+    assert recipe_key(["Rice", "beans", "Rice"]) == ("beans", "rice")
+    assert recipe_key(["Milk", " milk"]) == ("milk", "milk")
+
+
+def test_same_recipe_is_served_from_cache(lookups, client):
+    first = post(client, "rice", "Beans")
+    second = post(client, "beans ", "Rice")
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == {
+        "nutrition_data": {"Protein": {"value": 12.0, "unit": "G"}}
+    }
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert len(lookups) == 1
+
+
+def test_matching_etag_gets_not_modified(lookups, client):
+    etag = post(client, "rice").headers["etag"]
+
+    response = post(client, "rice", etag=etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert post(client, "rice", etag='"other"').status_code == 200
+    assert etag_matches(f'"other", W/{etag}', etag)
+
+
+def test_changed_ingredient_record_invalidates_recipes(lookups, client):
+    first = post(client, "rice", "beans")
+    # Re-caching an identical record keeps the entry
+    cache_food("Rice", record(3.0))
+    assert post(client, "rice", "beans").content == first.content
+    assert len(lookups) == 1
+
+    # USDA revised rice
+    RECORDS["rice"] = record(5.0)
+    cache_food("rice", RECORDS["rice"])
+    response = post(client, "rice", "beans", etag=first.headers["etag"])
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "nutrition_data": {"Protein": {"value": 14.0, "unit": "G"}}
+    }
+    assert response.headers["etag"] != first.headers["etag"]
+    assert len(lookups) == 2
+
+
+def test_records_read_back_from_disk_are_stamped(client):
+    # As after a restart: the record comes from the persistent tier and
+    # was never passed to cache_food in this process
+    nutrition_cache.set("rice", record(3.0))
+    record_stamps.delete("rice")
+    try:
+        response = post(client, "rice")
+    finally:
+        nutrition_cache.delete("rice")
+
+    assert response.status_code == 200
+    assert recipe_cache.get(("rice",)).etag == response.headers["etag"]
+
+
+def test_partial_results_are_not_cached(lookups, client):
+    first = post(client, "rice", "unknown")
+    second = post(client, "rice", "unknown")
+
+    assert first.json()["unresolved"] == ["unknown"]
+    assert "etag" not in first.headers
+    assert second.json() == first.json()
+    assert len(lookups) == 2
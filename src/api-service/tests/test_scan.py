@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import sys
+import os
+import json
+import pytest
+from unittest.mock import Mock, patch
+
+path_to_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+sys.path.insert(0, path_to_src)
+
+from api.utils.nutrition_utils import UNRESOLVED, \
+    NutritionResults  # noqa: E402
+from conftest import fake_ner, post_scan  # noqa: E402
+
+RECEIPT = "Milk 3.49\nBread 2.99\nMilk 3.49\nUnknown thing\nSalt 0.99"
+
+
+@pytest.fixture(autouse=True)
+def receipt_models():
+    """OCR reading RECEIPT from every photo, and the fake NER."""
+    from api.routers.ocr import ocr_cache
+    from api.utils.model_registry import registry
+
+    ocr = Mock()
+    ocr.return_value.render.return_value = RECEIPT
+    ocr_cache.clear()
+    with patch.dict(registry.models,
+                    {"ocr": ocr, "ner": Mock(side_effect=fake_ner)}):
+        yield
+
+
+def test_scan_returns_ingredients_and_nutrition(lookups, client):
+    response = post_scan(client)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "ingredients": ["Milk", "Bread", "Milk", "Unknown thing", "Salt"],
+        "nutrition_data": {"Protein": {"value": 12.0, "unit": "G"}},
+        "unresolved": ["Unknown thing"],
+    }
+
+
+def test_ingredients_are_looked_up_together(lookups, client):
+    post_scan(client)
+
+    assert lookups == [["Milk", "Bread", "Milk", "Unknown thing", "Salt"]]
+
+
+def test_scan_reuses_cached_ocr(lookups, client):
+    from api.utils.model_registry import registry
+
+    first = post_scan(client, color="orange")
+    second = post_scan(client, color="orange")
+
+    assert first.json() == second.json()
+    registry.models["ocr"].return_value.render.assert_called_once()
+    assert len(lookups) == 2
+
+
+def test_scan_streams_partial_results(lookups, client):
+    whole = post_scan(client).json()
+    response = post_scan(
+        client, headers={"Accept": "application/x-ndjson"}
+    )
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"ingredients": whole["ingredients"]}
+    assert lines[-1] == whole
+    partial = {line["ingredient"]: line for line in lines[1:-1]}
+    assert list(partial) == ["Milk", "Bread", "Unknown thing", "Salt"]
+    assert partial["Bread"]["nutrition_data"] == {
+        "Protein": {"value": 9.0, "unit": "G"}
+    }
+    assert partial["Unknown thing"] == {
+        "ingredient": "Unknown thing", "nutrition_data": {},
+        "unresolved": True,
+    }
+
+
+def test_scan_rejects_invalid_image(lookups, client):
+    response = client.post(
+        "/scan",
+        files={"file": ("receipt.jpg", b"not_an_image", "image/jpeg")},
+    )
+    assert response.status_code == 400
+    assert lookups == []
+
+
+def test_lines_are_sent_as_lookups_settle():
+    from api.routers import scan
+
+    release = asyncio.Event()
+
+    async def fetch_nutrition_info(ingredients, on_result):
+        on_result("Milk", None)
+        await release.wait()
+        on_result("Bread", UNRESOLVED)
+        return NutritionResults(unresolved=["Bread"])
+
+    async def run():
+        stream = scan.stream_scan(["Milk", "Bread"])
+        lines = [await anext(stream), await anext(stream)]
+        # Milk is sent while Bread is still being looked up
+        release.set()
+        lines += [line async for line in stream]
+        return [json.loads(line) for line in lines]
+
+    with patch.object(scan, "fetch_nutrition_info", fetch_nutrition_info):
+        lines = asyncio.run(run())
+
+    assert lines == [
+        {"ingredients": ["Milk", "Bread"]},
+        {"ingredient": "Milk", "nutrition_data": {}},
+        {"ingredient": "Bread", "nutrition_data": {}, "unresolved": True},
+        {"ingredients": ["Milk", "Bread"], "nutrition_data": {},
+         "unresolved": ["Bread"]},
+    ]
+
+
+def test_failed_lookup_ends_stream_with_error_line():
+    from api.routers import scan
+
+    async def fetch_nutrition_info(ingredients, on_result):
+        on_result("Milk", None)
+        raise RuntimeError("USDA is down")
+
+    async def run():
+        return [json.loads(line) async for line in scan.stream_scan(
+            ["Milk", "Bread"]
+        )]
+
+    with patch.object(scan, "fetch_nutrition_info", fetch_nutrition_info):
+        lines = asyncio.run(run())
+
+    assert lines[1] == {"ingredient": "Milk", "nutrition_data": {}}
+    assert lines[-1] == {"error": "USDA is down"}
@@ -10,7 +10,6 @@ import sys
 import os
 import pytest
 from fastapi.testclient import TestClient
-import numpy as np
 
 # disable SSL certificate verification which arises from doctr
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -19,6 +18,8 @@ path_to_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
 sys.path.insert(0, path_to_src)
 
 from api.service import app  # noqa: E402
+from api.utils.model_registry import registry  # noqa: E402
+from conftest import make_image_bytes  # noqa: E402
 
 client = TestClient(app)
 
@@ -26,24 +27,20 @@ client = TestClient(app)
 # mock dependencies
 @pytest.fixture
 def mock_dependencies():
-    with patch("doctr.io.DocumentFile.from_images") as mock_from_images, patch(
-        "doctr.models.ocr_predictor"
-    ) as mock_ocr_predictor, patch(
-        "api.routers.ocr.pipeline"
-    ) as mock_pipeline:
-        mock_from_images.return_value = [
-            np.zeros((100, 100, 3), dtype=np.uint8)
-        ]
-
-        mock_ocr_result = Mock()
-        mock_ocr_result.render.return_value = "ingredient1\ningredient2"
-        mock_ocr_predictor.return_value = mock_ocr_result
-
-        mock_pipeline.return_value = [
-            {"entity_group": "ingredient", "start": 0, "end": 11},
-            {"entity_group": "ingredient", "start": 12, "end": 23},
-        ]
+    mock_ocr_result = Mock()
+    mock_ocr_result.render.return_value = "ingredient1\ningredient2"
+    mock_ocr_model = Mock(return_value=mock_ocr_result)
+
+    entities = [
+        {"entity_group": "FOOD", "score": 0.999, "start": 0, "end": 10},
+        {"entity_group": "FOOD", "score": 0.999, "start": 12, "end": 22},
+    ]
+    mock_ner_pipeline = Mock(
+        side_effect=lambda texts, **kwargs: [entities for _ in texts]
+    )
 
+    with patch.dict(registry.models,
+                    {"ocr": mock_ocr_model, "ner": mock_ner_pipeline}):
         yield
 
 
@@ -53,7 +50,9 @@ def test_service_integration():
     # OCR endpoint
     ocr_response = client.post(
         "/api/ocr",
-        files={"file": ("test_image.jpg", b"valid_image_data", "image/jpeg")},
+        files={
+            "file": ("test_image.jpg", make_image_bytes("gray"), "image/jpeg")
+        },
     )
 
     print("OCR Response JSON:", ocr_response.json())
@@ -77,7 +76,7 @@ def test_system_end_to_end():
     """System test for the entire service: OCR -> Nutrition."""
 
     # Mocked file data
-    fake_image_data = b"fake_image_data"
+    fake_image_data = make_image_bytes()
 
     # Test OCR endpoint
     ocr_response = client.post(
@@ -99,3 +98,40 @@ def test_system_end_to_end():
     print("Nutrition Response JSON:", nutrition_response.json())
     assert nutrition_response.status_code == 200
     assert "nutrition_data" in nutrition_response.json()
+
+
+def test_health_and_readiness():
+    assert client.get("/health").json() == {"status": "ok"}
+
+    with patch.dict(registry.models, clear=True):
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+
+    with patch.dict(registry.models, {"ocr": Mock(), "ner": Mock()}):
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["models"]["ner"]["loaded"] is True
+        assert response.json()["import_seconds"] >= 0
+
+    # Without warm-up, models load on the first request
+    with patch.dict(registry.models, clear=True), \
+            patch("api.service.WARM_UP_ON_STARTUP", False):
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["ready"] is False
+        assert response.json()["warm_up"] is False
+
+
+@pytest.mark.usefixtures("mock_dependencies")
+def test_metrics_endpoint():
+    client.post(
+        "/api/ocr",
+        files={"file": ("m.jpg", make_image_bytes("purple"), "image/jpeg")},
+    )
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'ocr_stage_duration_seconds_count{stage="ner"}' in response.text
+    assert 'http_requests_total{path="/api/ocr",status="200"}' \
+        in response.text
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import unittest
+import httpx
+import sys
+import os
+from prometheus_client import REGISTRY
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.nutrition_cache import nutrition_cache  # noqa: E402
+from api.utils.nutrition_utils import fetch_nutrition_info  # noqa: E402
+from api.utils.single_flight import SingleFlight  # noqa: E402
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_task(self):
+        calls = []
+
+        async def work(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key.upper()
+
+        async def run():
+            flight = SingleFlight()
+            results = await asyncio.gather(
+                *(flight.do("a", work, "a") for _ in range(5)),
+                flight.do("b", work, "b"),
+            )
+            return flight, results
+
+        flight, results = asyncio.run(run())
+        self.assertEqual(results, ["A"] * 5 + ["B"])
+        self.assertEqual(sorted(calls), ["a", "b"])
+        self.assertEqual(flight.coalesced, 4)
+
+    def test_exceptions_reach_every_caller_and_are_not_kept(self):
+        calls = []
+
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        async def run():
+            flight = SingleFlight()
+            results = await asyncio.gather(
+                flight.do("a", fail), flight.do("a", fail),
+                return_exceptions=True,
+            )
+            self.assertEqual(flight.in_flight(), 0)
+            with self.assertRaises(ValueError):
+                await flight.do("a", fail)
+            return results
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(len(calls), 2)
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def run():
+            flight = SingleFlight()
+            first = asyncio.ensure_future(flight.do("a", work))
+            second = asyncio.ensure_future(flight.do("a", work))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(run()), "done")
+
+    def test_nutrition_lookups_are_coalesced(self):
+        nutrition_cache.clear()
+        queries = []
+
+        async def handler(request):
+            queries.append(request.url.params["query"])
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"foods": [{
+                "description": "Salt",
+                "dataType": "Survey (FNDDS)",
+                "foodNutrients": [],
+            }]})
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await asyncio.gather(*(
+                    fetch_nutrition_info([name], client=client)
+                    for name in ["salt", "Salt", " salt ", "salt"]
+                ))
+
+        before = REGISTRY.get_sample_value(
+            "nutrition_coalesced_lookups_total"
+        )
+        results = asyncio.run(run())
+        after = REGISTRY.get_sample_value("nutrition_coalesced_lookups_total")
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(after - before, 3)
+        self.assertTrue(all(len(result) == 1 for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
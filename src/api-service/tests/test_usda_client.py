@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+import httpx
+import sys
+import os
+from fastapi.testclient import TestClient
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.dirname(__file__))
+from api.routers.nutrition import router  # noqa: E402
+from api.utils.nutrition_cache import nutrition_cache  # noqa: E402
+from api.utils.nutrition_utils import NutritionResults, \
+    fetch_nutrition_info, get_nutrition_info  # noqa: E402
+from api.utils.usda_client import TokenBucket, backoff_delay  # noqa: E402
+from fake_usda import FakeUSDA, serve  # noqa: E402
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    @patch("api.utils.usda_client.time.monotonic")
+    def test_burst_then_rate(self, mock_monotonic):
+        mock_monotonic.return_value = 100.0
+        bucket = TokenBucket(rate=2, capacity=3)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+        # Queued callers wait for successive tokens
+        self.assertEqual(bucket.reserve(), 0.5)
+        self.assertEqual(bucket.reserve(), 1.0)
+        self.assertIsNone(bucket.reserve(max_wait=1.0))
+
+        mock_monotonic.return_value = 102.0
+        self.assertEqual(bucket.reserve(), 0)
+
+    def test_unlimited(self):
+        bucket = TokenBucket(rate=0, capacity=1)
+        self.assertTrue(all(bucket.reserve() == 0 for _ in range(100)))
+
+    def test_backoff_delay(self):
+        with patch("api.utils.usda_client.USDA_BACKOFF_BASE", 0.5), \
+                patch("api.utils.usda_client.USDA_BACKOFF_MAX", 3):
+            for attempt in range(6):
+                delay = backoff_delay(attempt)
+                self.assertTrue(0 <= delay <= min(3, 0.5 * 2 ** attempt))
+            self.assertGreaterEqual(backoff_delay(0, retry_after="2"), 2)
+            self.assertLessEqual(backoff_delay(0, retry_after="soon"), 0.5)
+
+
+class TestUSDAClient(unittest.TestCase):
+
+    def setUp(self):
+        nutrition_cache.clear()
+        self.fake = FakeUSDA()
+        self.server = serve(self.fake.app)
+        base_url = self.server.__enter__()
+        self.patches = [
+            patch(
+                "api.utils.nutrition_utils.USDA_SEARCH_URL",
+                f"{base_url}/fdc/v1/foods/search",
+            ),
+            patch("api.utils.usda_client.USDA_BACKOFF_BASE", 0.01),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.__exit__(None, None, None)
+
+    def fetch(self, ingredients):
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await fetch_nutrition_info(ingredients, client=client)
+
+        with patch("builtins.print"):
+            return asyncio.run(run())
+
+    def test_transient_errors_are_retried(self):
+        self.fake.fail_next(503, 429)
+        result = self.fetch(["salt"])
+        self.assertEqual(list(result), ["salt"])
+        self.assertEqual(result.unresolved, [])
+        self.assertEqual(self.fake.requests, 3)
+
+    def test_partial_results_are_reported(self):
+        self.fake.fail_queries["pepper"] = 500
+        result = self.fetch(["salt", "pepper", "unknown"])
+        self.assertEqual(list(result), ["salt"])
+        self.assertEqual(result.unresolved, ["pepper"])
+        # One try plus USDA_MAX_RETRIES retries, and nothing cached
+        self.assertEqual(self.fake.queries.count("pepper"), 4)
+        self.assertIsNone(nutrition_cache.get("pepper"))
+        self.assertEqual(nutrition_cache.get("unknown"), {})
+
+    def test_client_errors_are_not_retried(self):
+        self.fake.fail_queries["salt"] = 403
+        result = self.fetch(["salt"])
+        self.assertEqual(result.unresolved, ["salt"])
+        self.assertEqual(self.fake.requests, 1)
+
+    def test_latency_budget(self):
+        self.fake.latency = 0.5
+        start = time.monotonic()
+        with patch("api.utils.usda_client.USDA_LATENCY_BUDGET", 0.1):
+            result = self.fetch(["salt"])
+        self.assertLess(time.monotonic() - start, 0.45)
+        self.assertEqual(result.unresolved, ["salt"])
+
+    def test_rate_limit_waits_for_tokens(self):
+        bucket = TokenBucket(rate=20, capacity=2)
+        with patch("api.utils.usda_client.usda_bucket", bucket):
+            start = time.monotonic()
+            result = self.fetch([f"food {i}" for i in range(6)])
+            elapsed = time.monotonic() - start
+        self.assertEqual(len(result), 6)
+        # Two requests from the burst, then one every 50 ms
+        self.assertGreaterEqual(elapsed, 0.19)
+
+    def test_upstream_rate_limit_honours_retry_after(self):
+        self.fake.rate_limit = 1
+        with patch("api.utils.usda_client.USDA_LATENCY_BUDGET", 3):
+            start = time.monotonic()
+            result = self.fetch(["salt", "sugar"])
+            elapsed = time.monotonic() - start
+        self.assertEqual(sorted(result), ["salt", "sugar"])
+        self.assertGreaterEqual(elapsed, 1)
+
+    def test_sync_lookup(self):
+        self.fake.fail_next(502)
+        self.fake.fail_queries["pepper"] = 503
+        with patch("builtins.print"):
+            result = get_nutrition_info(["salt", "pepper"])
+        self.assertEqual(list(result), ["salt"])
+        self.assertEqual(result.unresolved, ["pepper"])
+
+    def test_endpoint_reports_unresolved(self):
+        client = TestClient(router)
+        with patch(
+            "api.routers.nutrition.fetch_nutrition_info",
+            return_value=NutritionResults(unresolved=["pepper"]),
+        ):
+            response = client.post(
+                "/nutrition", json={"ingredients": ["pepper"]}
+            )
+            batch = client.post("/nutrition/batch", json={"recipes": [
+                {"ingredients": ["pepper", "pepper"]}, {"ingredients": []},
+            ]})
+        self.assertEqual(
+            response.json(), {"nutrition_data": {}, "unresolved": ["pepper"]}
+        )
+        self.assertEqual(batch.json()["results"], [
+            {"nutrition_data": {}, "unresolved": ["pepper"]},
+            {"nutrition_data": {}},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import threading
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from api.utils.worker_pool import PoolSaturatedError, WorkerPool  # noqa: E402
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_runs_in_worker_thread(self):
+        pool = WorkerPool(kind="thread", max_workers=1, max_queue=0)
+        result = asyncio.run(pool.run(threading.current_thread))
+        pool.shutdown()
+        self.assertTrue(result.name.startswith("model-worker"))
+
+    def test_process_pool_is_not_supported(self):
+        with self.assertRaisesRegex(ValueError, "PREFORK_WORKERS"):
+            WorkerPool(kind="process")
+
+    def test_rejects_when_saturated(self):
+        pool = WorkerPool(kind="thread", max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        async def submit_three():
+            running = [
+                asyncio.ensure_future(pool.run(release.wait))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0)
+            with self.assertRaises(PoolSaturatedError):
+                await pool.run(release.wait)
+            self.assertEqual(pool.pending, 2)
+            release.set()
+            return await asyncio.gather(*running)
+
+        self.assertEqual(asyncio.run(submit_three()), [True, True])
+        self.assertEqual(pool.pending, 0)
+        pool.shutdown()
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            WorkerPool(kind="gpu")
+
+
+if __name__ == '__main__':
+    unittest.main()